@@ -1,125 +1,476 @@
+import asyncio
+import json
+import signal
 import sys
+from datetime import date, datetime
 from pathlib import Path
-from fastapi import FastAPI
-from pydantic import BaseModel
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, Field
 import numpy as np
 import pandas as pd
 
 # 🔹 Add inventory_forecasting to Python path
 sys.path.append(str(Path(__file__).resolve().parent.parent / "inventory_forecasting"))
 
-# 🔹 Import models from predict.py
-from predict import predicted_demand, anomaly_model, pricing_model
-from data_loader import load_data
+# 🔹 Lazily-loaded model handles from predict.py (artifacts are read on first use)
+from predict import (anomaly, pricing, demand, recommender, get_demand_forecasts, get_recommender, get_predictor,
+                     get_anomaly_encoders, DEFAULT_FORECAST_DAYS)
+from catalog import get_catalog
+from encoding import UNSEEN
+from feature_store import load_or_build_feature_store, MAX_USER_ID, MAX_PRODUCT_ID
+from fraud_scoring import FraudScores
+from inference_scheduler import MicroBatcher
+from recommender import DEFAULT_TOP_K
+from profit_cube import load_or_build_profit_cube, MEASURES, REVENUE, PROFIT
+from transaction_log import OnlineAggregates
+from admission import AdmissionController, AdmissionMiddleware, run_blocking
+import instrumentation
+import profiler
 
 app = FastAPI()
 
-# ✅ Load Data
-users, suppliers, warehouses, products, transactions = load_data()
+# ✅ Admission control: bounded in-flight requests, 503 + Retry-After once the wait queue is full
+admission = AdmissionController()
+app.add_middleware(AdmissionMiddleware, controller=admission)
+
+# ✅ Request latency histograms (INVENTORY_METRICS=0 disables the layer and /metrics)
+if instrumentation.ENABLED:
+    app.add_middleware(instrumentation.RequestMetricsMiddleware)
+
+# ✅ Opt-in profiling (INVENTORY_PROFILER=1): route-tagged samples and the event loop watchdog
+loop_watchdog = profiler.LoopWatchdog() if profiler.ENABLED else None
+if profiler.ENABLED:
+    app.add_middleware(profiler.RouteTaggingMiddleware)
+
+# ✅ Build the product/supplier/warehouse catalog once at startup (hot-reloaded by get_catalog)
+get_catalog()
+
+# ✅ Per-user / per-product aggregates for fraud features (restored from the last snapshot)
+feature_store = load_or_build_feature_store()
+
+# ✅ Revenue / cost / profit rollups for the /reports endpoints (restored from the last snapshot)
+profit_cube = load_or_build_profit_cube()
+
+# ✅ Both kept in step with the shared transaction journal, so every worker sees every recorded transaction
+online = OnlineAggregates(feature_store, profit_cube)
+
+# ✅ Precomputed fraud scores of recorded transactions (re-opened when fraud_scoring.py publishes new ones)
+fraud_scores = FraudScores()
 
 # ✅ Define request model
 class TransactionRequest(BaseModel):
     quantity: int
     product_id: int
     payment_method: str
+    user_id: Optional[int] = None
+    total_price: Optional[float] = None
+
+
+class TransactionRecord(BaseModel):
+    user_id: int = Field(ge=0, le=MAX_USER_ID)
+    product_id: int = Field(ge=0, le=MAX_PRODUCT_ID)
+    quantity: int
+    total_price: float
+    payment_method: str
+
 
+class PriceItem(BaseModel):
+    product_id: int
+    quantity: int
+
+
+class BatchPriceRequest(BaseModel):
+    items: List[PriceItem]
+
+
+# ✅ Largest batch /predict/price/batch accepts, and rows per streamed chunk
+MAX_PRICE_BATCH = 20000
+PRICE_STREAM_CHUNK = 1000
 
+# ✅ Largest k /recommend/ accepts
+MAX_RECOMMENDATIONS = 100
 
-# ✅ API Endpoint: Predict Future Demand
+# ✅ Rows /reports/products returns unless a limit is given
+DEFAULT_REPORT_LIMIT = 50
+
+# ✅ API Endpoint: Predict Future Demand (served from the precomputed per-product forecast)
 @app.get("/predict/demand/")
-async def get_predicted_demand():
-    return {"predicted_demand": predicted_demand.tolist()}
+async def get_predicted_demand(product_id: Optional[int] = None, horizon: int = DEFAULT_FORECAST_DAYS):
+    if not demand.available:
+        raise HTTPException(status_code=503, detail="Demand model has not been trained")
+    return await run_blocking(_predicted_demand, product_id, horizon)
+
+
+def _predicted_demand(product_id, horizon):
+    forecasts = get_demand_forecasts()
+    if horizon < 1 or horizon > forecasts.horizon:
+        raise HTTPException(status_code=400, detail=f"horizon must be between 1 and {forecasts.horizon}")
+
+    if product_id is None:
+        return {"horizon": horizon, "predicted_demand": forecasts.total(horizon).tolist()}
+
+    predicted = forecasts.for_product(product_id, horizon)
+    if predicted is None:
+        raise HTTPException(status_code=404, detail="No demand history for this product")
+    return {"product_id": product_id, "horizon": horizon, "predicted_demand": predicted.tolist()}
 
 # ✅ API Endpoint: Fraud Detection
 @app.post("/predict/fraud/")
 async def predict_fraud(transaction: TransactionRequest):
     try:
-        # Convert request data to DataFrame
-        input_data = pd.DataFrame([transaction.dict()])
-
-        # ✅ Ensure categorical features are encoded properly
-        if "payment_method" in input_data.columns:
-            input_data["payment_method"] = payment_method_encoder.transform([input_data["payment_method"][0]])[0]
+        catalog = get_catalog()
+        row = catalog.product_row(transaction.product_id)
+        encoders = get_anomaly_encoders()
 
-        # ✅ Ensure input_data contains all required features
-        trained_features = list(anomaly_model.feature_names_in_)
+        # ✅ Request fields (categorical values coded with the model's vocabularies, one dict lookup each)
+        features = {
+            "product_id": transaction.product_id,
+            "quantity": transaction.quantity,
+            "payment_method": encoders["payment_method"].code(transaction.payment_method),
+        }
 
-        # ✅ Handle missing columns
-        for feature in trained_features:
-            if feature not in input_data.columns:
-                input_data[feature] = 0  # Default value (adjust based on your model)
+        # ✅ Product attributes from the catalog
+        if row >= 0:
+            category_code = catalog.category_codes[row]
+            features.update({
+                "category": encoders["category"].code(catalog.categories[category_code]) if category_code >= 0 else UNSEEN,
+                "cost_per_unit": catalog.cost_per_unit[row],
+                "price_per_unit": catalog.price_per_unit[row],
+                "stock_level": catalog.stock_level[row],
+                "supplier_id": catalog.supplier_id[row],
+                "warehouse_id": catalog.warehouse_id[row],
+            })
+        # ✅ Order value: use the request's total when given, else quantity x list price
+        if transaction.total_price is not None:
+            features["total_price"] = transaction.total_price
+        elif row >= 0:
+            features["total_price"] = transaction.quantity * catalog.price_per_unit[row]
 
-        # ✅ Ensure columns are in correct order
-        input_data = input_data[trained_features]
+        # ✅ User history from the online feature store
+        if transaction.user_id is not None:
+            features["user_id"] = transaction.user_id
+            features.update(await run_blocking(_user_features, transaction.user_id))
 
-        # ✅ Convert data types to match model expectations
-        input_data = input_data.astype(float)
+        # ✅ Assemble the row in training order (features we still lack default to 0)
+        input_data = np.array([features.get(feature, 0.0) for feature in anomaly.feature_names], dtype=np.float64)
 
-        # ✅ Predict fraud
-        fraud_prediction = anomaly_model.predict(input_data)[0]
+        # ✅ Predict fraud (coalesced with concurrent requests, off the event loop)
+        fraud_prediction = await fraud_batcher.submit(input_data)
 
         return {"fraud_prediction": int(fraud_prediction)}
 
     except Exception as e:
         return {"error": str(e)}
 
-# ✅ API Endpoint: Optimize Pricing
-pricing_model, scaler = train_pricing_model(*load_data())
+# ✅ API Endpoint: precomputed fraud score of a recorded transaction
+@app.get("/fraud/scores/{transaction_id}")
+async def fraud_score(transaction_id: str):
+    prediction, probability, found = fraud_scores.lookup([transaction_id])
+    if not found[0]:
+        raise HTTPException(status_code=404, detail="Transaction not scored yet (run fraud_scoring.py)")
+    return {"transaction_id": transaction_id, "fraud_prediction": int(prediction[0]),
+            "fraud_probability": float(probability[0]), "model_version": fraud_scores.meta["model_version"]}
 
-@app.post("/predict/price/")
-async def predict_price(transaction: TransactionRequest):
-    try:
-        # ✅ Load fresh data
-        users, suppliers, warehouses, products, transactions = load_data()
+# ✅ Micro-batching schedulers: single-row requests are coalesced into one predict call
+def _predict_fraud_batch(matrix):
+    scaled = anomaly.get("scaler").transform(pd.DataFrame(matrix, columns=anomaly.feature_names))
+    return get_predictor(anomaly)(scaled)
 
-        # ✅ Convert product_id to INT for matching
-        products["product_id"] = products["product_id"].astype(int)
-        suppliers["supplier_id"] = suppliers["supplier_id"].astype(int)
-        transaction.product_id = int(transaction.product_id)
 
-        # ✅ Fetch Product Details
-        product_info = products[products["product_id"] == transaction.product_id]
+def _predict_price_batch(matrix):
+    scaled = pricing.get("scaler").transform(pd.DataFrame(matrix, columns=pricing.feature_names))
+    return get_predictor(pricing)(scaled)
 
-        if product_info.empty:
-            raise HTTPException(status_code=404, detail="Product not found")
 
-        product_info = product_info.iloc[0]  # Extract first row
+fraud_batcher = MicroBatcher("fraud", _predict_fraud_batch)
+price_batcher = MicroBatcher("price", _predict_price_batch)
 
-        # ✅ Fetch Supplier Details
-        supplier_info = suppliers[suppliers["supplier_id"] == product_info["supplier_id"]]
-        reliability_score = supplier_info["reliability_score"].iloc[0] if not supplier_info.empty else 0.5  # Default reliability
 
-        # ✅ Prepare Input Data for Prediction
-        input_data = np.array([[
-            transaction.quantity,  
-            product_info["product_id"],
-            product_info["cost_per_unit"],
-            product_info["price_per_unit"],
-            product_info["stock_level"],
-            reliability_score
-        ]])
+# ✅ Readiness: set once the schedulers run, cleared when shutdown begins
+service_state = {"started": False}
+
+
+@app.on_event("startup")
+async def start_batchers():
+    fraud_batcher.start()
+    price_batcher.start()
+    service_state["started"] = True
+    if profiler.ENABLED:
+        loop_watchdog.start()
+        # ✅ `kill -USR2 <pid>` captures a profile of the default window
+        try:
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGUSR2, lambda: asyncio.ensure_future(_capture_profile(profiler.DEFAULT_WINDOW_S)))
+        except (NotImplementedError, RuntimeError, ValueError, AttributeError):
+            pass
+
+
+@app.on_event("shutdown")
+async def stop_batchers():
+    service_state["started"] = False
+    await fraud_batcher.stop()
+    await price_batcher.stop()
+    if profiler.ENABLED:
+        await loop_watchdog.stop()
+    online.snapshot()
+
+
+# ✅ API Endpoint: Record a completed transaction in the online feature store
+@app.post("/transactions/")
+async def record_transaction(record: TransactionRecord):
+    # ✅ Only catalog products are aggregated (ids are array indices in the store and the cube)
+    if get_catalog().product_row(record.product_id) < 0:
+        raise HTTPException(status_code=404, detail="Product not found")
+    # ✅ Journal append and store fold off the event loop (OnlineAggregates serializes the fold)
+    features = await run_blocking(_record_transaction, record)
+    return {"recorded": True, "user_features": features}
+
+
+def _record_transaction(record):
+    online.record(record.user_id, record.product_id, record.quantity, record.total_price, datetime.now())
+    return feature_store.user_features(record.user_id)
+
+
+def _user_features(user_id):
+    online.sync()
+    return feature_store.user_features(user_id)
+
+
+@app.get("/metrics/inference")
+async def inference_metrics():
+    return {"schedulers": [fraud_batcher.metrics(), price_batcher.metrics()], "admission": admission.metrics()}
+
+
+# ✅ Liveness / readiness probes (never shed by admission control)
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+def _model_state(handle):
+    available = handle.available
+    return {"available": available, "loaded": handle.loaded, "version": handle.version if available else None}
+
 
-        # ✅ Scale the input data
-        input_data_scaled = scaler.transform(input_data)
+@app.get("/readyz")
+async def readyz():
+    models = {handle.name: _model_state(handle) for handle in (anomaly, pricing, demand, recommender)}
+    # ✅ Fraud and pricing back the core endpoints; demand and recommendations degrade to 404/503 on their own
+    ready = service_state["started"] and models["anomaly"]["available"] and models["pricing"]["available"]
+    body = {"ready": bool(ready), "models": models, "catalog_products": len(get_catalog()),
+            "admission": admission.metrics()}
+    return JSONResponse(body, status_code=200 if ready else 503)
 
-        # ✅ Predict Optimized Price
-        optimized_price = pricing_model.predict(input_data_scaled)[0]
+
+# ✅ Admin: sampling profiler capture and event loop stalls (only with INVENTORY_PROFILER=1)
+async def _capture_profile(seconds, interval_ms=profiler.DEFAULT_INTERVAL_MS):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, profiler.capture, seconds, interval_ms, loop)
+
+
+@app.post("/admin/profile")
+async def capture_profile(seconds: float = profiler.DEFAULT_WINDOW_S,
+                          interval_ms: float = profiler.DEFAULT_INTERVAL_MS):
+    if not profiler.ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled")
+    if not 0 < seconds <= profiler.MAX_WINDOW_S or interval_ms < 1:
+        raise HTTPException(status_code=400,
+                            detail=f"seconds must be in (0, {profiler.MAX_WINDOW_S}] and interval_ms >= 1")
+    result = await _capture_profile(seconds, interval_ms)
+    if result is None:
+        raise HTTPException(status_code=409, detail="A profile is already being captured")
+    return result
+
+
+@app.get("/admin/loop-blocks")
+async def loop_blocks():
+    if not profiler.ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled")
+    return {"threshold_ms": loop_watchdog.threshold * 1000, "blocks": list(loop_watchdog.blocks)}
+
+
+# ✅ Prometheus scrape endpoint: request latency, pipeline stages, inference counters, queue depths
+@app.get("/metrics")
+async def metrics():
+    if not instrumentation.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(instrumentation.render(), media_type="text/plain; version=0.0.4")
+
+
+# ✅ API Endpoint: Optimize Pricing
+@app.post("/predict/price/")
+async def predict_price(transaction: TransactionRequest):
+    # ✅ O(1) product lookup in the id-indexed catalog
+    catalog = get_catalog()
+    row = catalog.product_row(transaction.product_id)
+    if row < 0:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    try:
+        # ✅ Prepare Input Data for Prediction
+        input_data = catalog.pricing_features([row], [transaction.quantity])
+
+        # ✅ Scale and predict the optimized price (batched with concurrent requests)
+        optimized_price = await price_batcher.submit(input_data[0])
 
         return {
-            "product_id": int(product_info["product_id"]),
-            "product_name": product_info["product_name"],
-            "category": product_info["category"],
-            "cost_per_unit": float(product_info["cost_per_unit"]),
-            "price_per_unit": float(product_info["price_per_unit"]),
-            "stock_level": int(product_info["stock_level"]),
-            "supplier_id": int(product_info["supplier_id"]),
-            "reliability_score": float(reliability_score),
+            **catalog.describe(row),
             "optimized_price": round(float(optimized_price), 2)  # Rounded for better readability
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-# ✅ Run the FastAPI server
+
+
+def _price_batch_inputs(items):
+    """
+    Ids, quantities, catalog rows and pricing features of a batch (runs off the event loop).
+    """
+    catalog = get_catalog()
+    product_ids = np.fromiter((item.product_id for item in items), dtype=np.int64, count=len(items))
+    quantities = np.fromiter((item.quantity for item in items), dtype=np.float64, count=len(items))
+
+    # ✅ One vectorised gather for all known products, one transform/predict pass
+    rows = catalog.product_rows(product_ids)
+    found = rows >= 0
+    input_data = catalog.pricing_features(rows[found], quantities[found]) if found.any() else None
+    return product_ids, quantities, rows, input_data
+
+
+@app.post("/predict/price/batch")
+async def predict_price_batch(request: BatchPriceRequest):
+    if len(request.items) > MAX_PRICE_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_PRICE_BATCH} items per batch")
+
+    product_ids, quantities, rows, input_data = await run_blocking(_price_batch_inputs, request.items)
+    found = rows >= 0
+    optimized = np.full(len(rows), np.nan)
+    if found.any():
+        try:
+            optimized[found] = await price_batcher.run_batch(input_data)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    optimized = np.round(optimized, 2).tolist()
+    product_ids, quantities, found = product_ids.tolist(), quantities.astype(np.int64).tolist(), found.tolist()
+
+    def stream_results():
+        # ✅ Newline-delimited JSON, one chunk of rows at a time
+        for start in range(0, len(rows), PRICE_STREAM_CHUNK):
+            lines = []
+            for i in range(start, min(start + PRICE_STREAM_CHUNK, len(rows))):
+                if found[i]:
+                    result = {"product_id": product_ids[i], "quantity": quantities[i],
+                              "optimized_price": optimized[i]}
+                else:
+                    result = {"product_id": product_ids[i], "error": "Product not found"}
+                lines.append(json.dumps(result))
+            yield "\n".join(lines) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+# ✅ API Endpoint: Top-K product recommendations (IVF search over the product embeddings)
+@app.get("/recommend/{user_id}")
+async def recommend(user_id: int, k: int = DEFAULT_TOP_K):
+    if k < 1 or k > MAX_RECOMMENDATIONS:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {MAX_RECOMMENDATIONS}")
+    if not recommender.available:
+        raise HTTPException(status_code=503, detail="Recommendation model has not been trained")
+    return await run_blocking(_recommend, user_id, k)
+
+
+def _recommend(user_id, k):
+    result = get_recommender().recommend(user_id, k)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No recommendations for this user")
+
+    catalog = get_catalog()
+    product_ids, scores = result
+    rows = catalog.product_rows(product_ids)
+    recommendations = []
+    for product_id, row, score in zip(product_ids.tolist(), rows.tolist(), scores.tolist()):
+        item = {"product_id": product_id, "score": round(score, 4)}
+        if row >= 0:
+            item.update({"product_name": str(catalog.product_name[row]),
+                         "category": catalog.category(row)})
+        recommendations.append(item)
+    return {"user_id": user_id, "recommendations": recommendations}
+
+# ✅ API Endpoints: Profitability reports (read from the pre-aggregated profit cube, no scans)
+def _report_rows(key, keys, totals):
+    rows = []
+    for value, measures in zip(keys, totals.tolist()):
+        row = {key: value, **{name: round(measure, 2) for name, measure in zip(MEASURES, measures)}}
+        row["profitability"] = measures[PROFIT] / measures[REVENUE] if measures[REVENUE] else 0.0
+        rows.append(row)
+    return rows
+
+
+def _cube_report(key, query, *args, format_key=None):
+    """
+    Run one profit cube query and format its rows (off the event loop, through run_blocking).
+    """
+    online.sync()
+    keys, totals = query(*args)
+    keys = [format_key(value) for value in keys] if format_key else np.asarray(keys).tolist()
+    return _report_rows(key, keys, totals)
+
+
+@app.get("/reports/warehouses")
+async def warehouse_report(start_date: Optional[date] = None, end_date: Optional[date] = None,
+                           category: Optional[str] = None):
+    rows = await run_blocking(_cube_report, "warehouse_id", profit_cube.by_warehouse, start_date, end_date, category)
+    return {"warehouses": rows}
+
+
+@app.get("/reports/categories")
+async def category_report(start_date: Optional[date] = None, end_date: Optional[date] = None,
+                          warehouse_id: Optional[int] = None):
+    rows = await run_blocking(_cube_report, "category", profit_cube.by_category, start_date, end_date, warehouse_id)
+    return {"categories": rows}
+
+
+@app.get("/reports/products")
+async def product_report(start_date: Optional[date] = None, end_date: Optional[date] = None,
+                         warehouse_id: Optional[int] = None, category: Optional[str] = None,
+                         sort_by: str = "profit", limit: int = DEFAULT_REPORT_LIMIT):
+    if sort_by not in MEASURES:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of {MEASURES}")
+    return await run_blocking(_product_report, start_date, end_date, warehouse_id, category, sort_by, limit)
+
+
+def _product_report(start_date, end_date, warehouse_id, category, sort_by, limit):
+    online.sync()
+    product_ids, totals = profit_cube.by_product(start_date, end_date, warehouse_id, category)
+
+    # ✅ Top `limit` products by the requested measure
+    limit = max(0, min(limit, len(product_ids)))
+    column = totals[:, MEASURES.index(sort_by)]
+    top = np.argpartition(column, -limit)[-limit:] if limit else np.zeros(0, dtype=np.int64)
+    top = top[np.argsort(column[top])[::-1]]
+    return {"products": _report_rows("product_id", product_ids[top].tolist(), totals[top])}
+
+
+@app.get("/reports/daily")
+async def daily_report(start_date: Optional[date] = None, end_date: Optional[date] = None,
+                       warehouse_id: Optional[int] = None, category: Optional[str] = None):
+    rows = await run_blocking(_cube_report, "date", profit_cube.daily, start_date, end_date, warehouse_id, category,
+                              format_key=str)
+    return {"days": rows}
+
+
+@app.post("/reports/export")
+async def export_reports():
+    await run_blocking(_export_reports)
+    return {"exported": True}
+
+
+def _export_reports():
+    online.sync()
+    profit_cube.export_reports()
+
+# ✅ Run the FastAPI server (development; for multi-worker serving use api/serve.py)
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8000, reload=True)
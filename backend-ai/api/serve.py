@@ -0,0 +1,221 @@
+"""
+Production serving mode: one parent process loads the models and the catalog, N forked uvicorn
+workers share them.
+
+The parent imports the app (catalog, feature store, profit cube), loads every model artifact the
+endpoints use and warms the predictors before it forks, then calls gc.freeze() so the collector
+never writes into the inherited objects. Array artifacts are memory-mapped from the registry
+(shared page cache) and everything else is shared copy-on-write, so an extra worker costs little
+more than its own interpreter. All workers accept on one listening socket opened by the parent.
+
+    python api/serve.py --workers 4 --port 8000
+
+Signals to the parent:
+    SIGHUP           hot-swap: reload the latest model versions and the catalog in the parent,
+                     then replace the workers one at a time (each finishes its in-flight requests)
+    SIGTERM / SIGINT graceful shutdown of all workers
+
+/transactions/ appends to the shared transaction journal (transaction_log.py), and every worker
+folds in the journal before it reads its feature store or profit cube, so all workers answer from
+the same aggregates. Workers forked by a hot-swap replay what was recorded since the parent loaded
+them; shutdown snapshots carry the journal offset they include, so no recorded transaction is lost.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent))
+
+import uvicorn
+
+log = logging.getLogger("inventory.serve")
+
+# ✅ Seconds a worker gets to finish its requests before it is killed
+GRACEFUL_TIMEOUT = 30.0
+
+
+def preload():
+    """
+    Load everything the endpoints read on their first request, so workers inherit it warm.
+    """
+    from app import online
+    from catalog import reload_catalog
+    from predict import anomaly, pricing, demand, recommender, get_predictor, get_demand_forecasts, get_recommender
+
+    reload_catalog()
+    # ✅ Catch up with the journal, so new workers start from (nearly) current aggregates
+    online.sync()
+    for handle in (anomaly, pricing):
+        if handle.available:
+            handle.get("scaler")
+            get_predictor(handle)
+    if demand.available:
+        get_demand_forecasts()
+    if recommender.available:
+        get_recommender()
+
+
+def reload_models():
+    """
+    Switch the parent to the latest version of every model (new workers are forked from it).
+    """
+    from predict import anomaly, pricing, demand, recommender
+
+    for handle in (anomaly, pricing, demand, recommender):
+        if handle.available:
+            handle.reload()
+    preload()
+
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    """
+    Forks the workers, replaces the ones that die and performs the SIGHUP rolling restart.
+    """
+
+    def __init__(self, app, sock, workers, log_level="info"):
+        self.app = app
+        self.sock = sock
+        self.n_workers = workers
+        self.log_level = log_level
+        self.workers = {}  # pid -> model generation it was forked with
+        self.generation = 0
+        self._reload = False
+        self._stop = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            # ✅ Worker: default signal handling (uvicorn installs its own), then serve on the shared socket
+            for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                signal.signal(signum, signal.SIG_DFL)
+            config = uvicorn.Config(self.app, log_level=self.log_level, timeout_graceful_shutdown=GRACEFUL_TIMEOUT)
+            try:
+                uvicorn.Server(config).run(sockets=[self.sock])
+            finally:
+                os._exit(0)
+        self.workers[pid] = self.generation
+        log.info("worker %d started (generation %d)", pid, self.generation)
+        return pid
+
+    def stop_worker(self, pid, timeout=GRACEFUL_TIMEOUT):
+        """
+        SIGTERM one worker and wait for it to drain (SIGKILL after `timeout`).
+        """
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if done:
+                break
+            time.sleep(0.05)
+        else:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            log.warning("worker %d did not stop within %.0fs, killed", pid, timeout)
+        self.workers.pop(pid, None)
+
+    def rolling_restart(self):
+        """
+        Reload in the parent, then replace old-generation workers one at a time; the listening
+        socket stays open throughout, so new connections queue instead of being refused.
+        """
+        started = time.perf_counter()
+        try:
+            reload_models()
+        except Exception:
+            log.exception("model reload failed; keeping the running workers")
+            return
+        gc.freeze()
+        self.generation += 1
+        for pid in [pid for pid, generation in self.workers.items() if generation < self.generation]:
+            self.stop_worker(pid)
+            if not self._stop:
+                self.spawn()
+        log.info("hot-swap to generation %d done in %.1fs", self.generation, time.perf_counter() - started)
+
+    def reap(self):
+        """
+        Collect exited workers and replace them (unless shutting down).
+        """
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if self.workers.pop(pid, None) is not None and not self._stop:
+                log.warning("worker %d exited (status %d), restarting", pid, status)
+                self.spawn()
+
+    def run(self):
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "_reload", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "_stop", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "_stop", True))
+
+        for _ in range(self.n_workers):
+            self.spawn()
+        while not self._stop:
+            if self._reload:
+                self._reload = False
+                self.rolling_restart()
+            self.reap()
+            time.sleep(0.2)
+
+        for pid in list(self.workers):
+            os.kill(pid, signal.SIGTERM)
+        for pid in list(self.workers):
+            self.stop_worker(pid)
+        self.sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the API from N forked workers sharing preloaded models")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [serve %(process)d] %(message)s")
+
+    from app import app
+
+    if not hasattr(os, "fork"):
+        # 🔹 No fork (Windows): a single process
+        uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level)
+        return
+
+    started = time.perf_counter()
+    preload()
+    # ✅ Move everything loaded so far out of the collector's reach: no copy-on-write from gc passes
+    gc.collect()
+    gc.freeze()
+    log.info("preloaded in %.1fs, forking %d workers on %s:%d", time.perf_counter() - started, args.workers,
+             args.host, args.port)
+
+    Supervisor(app, bind_socket(args.host, args.port), args.workers, args.log_level).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+In-process load test of the FastAPI app (api/app.py) for the benchmark suite.
+
+Requests go through httpx's ASGI transport straight into the app (no sockets, no server), from
+`concurrency` client coroutines per endpoint. Latency is measured per request; the report has
+p50/p95/p99 and the throughput of every endpoint. Small fraud and pricing forests are fitted into
+INVENTORY_MODELS_DIR first when no model is registered there.
+
+    python benchmarks/api_load.py result.json --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "inventory_forecasting"))
+sys.path.append(str(Path(__file__).resolve().parent.parent / "api"))
+
+# ✅ Fixture models: trees and training rows (serving cost, not model quality, is measured)
+FIXTURE_TREES = 100
+FIXTURE_ROWS = 20_000
+# ✅ Items per /predict/price/batch request
+BATCH_ITEMS = 100
+PAYMENT_METHODS = ["Credit Card", "PayPal", "Debit Card", "Crypto"]
+
+
+def ensure_models(n_estimators=FIXTURE_TREES, rows=FIXTURE_ROWS):
+    """
+    Register quick anomaly / pricing forests (same features and scalers as train.py) if missing.
+    """
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+    from sklearn.preprocessing import RobustScaler, StandardScaler
+    from data_loader import load_data
+    from model_registry import latest_version
+    from train import save_forest
+    from train_anomaly import preprocess_transactions
+    from train_pricing import build_pricing_frame, PRICING_FEATURES
+
+    if latest_version("anomaly") is not None and latest_version("pricing") is not None:
+        return
+    users, suppliers, warehouses, products, transactions = load_data(nrows=rows)
+
+    if latest_version("anomaly") is None:
+        X = preprocess_transactions(transactions, users, products).select_dtypes(include=["number"])
+        y = (transactions["quantity"] > transactions["quantity"].quantile(0.99)).astype(int)
+        scaler = StandardScaler().fit(X)
+        model = RandomForestClassifier(n_estimators, random_state=42, n_jobs=-1).fit(scaler.transform(X), y)
+        save_forest("anomaly", model, scaler, list(scaler.feature_names_in_), None)
+
+    if latest_version("pricing") is None:
+        X, y = build_pricing_frame(transactions, products, suppliers, warehouses)
+        scaler = RobustScaler().fit(X)
+        model = RandomForestRegressor(n_estimators, random_state=42, n_jobs=-1).fit(scaler.transform(X), y)
+        save_forest("pricing", model, scaler, PRICING_FEATURES, None)
+
+
+def request_factories(rng):
+    """
+    name -> function returning (method, url, kwargs) of one randomised request to that endpoint.
+    """
+    from data_loader import load_arrays
+
+    product_ids = np.asarray(load_arrays("products", ["product_id"])["product_id"])
+    user_ids = np.asarray(load_arrays("users", ["user_id"])["user_id"])
+
+    def transaction():
+        return {"product_id": int(rng.choice(product_ids)), "quantity": int(rng.integers(1, 10)),
+                "payment_method": PAYMENT_METHODS[rng.integers(len(PAYMENT_METHODS))],
+                "user_id": int(rng.choice(user_ids))}
+
+    def record():
+        body = transaction()
+        body["total_price"] = round(float(rng.uniform(5, 500)), 2)
+        return body
+
+    return {
+        "predict_fraud": lambda: ("POST", "/predict/fraud/", {"json": transaction()}),
+        "predict_price": lambda: ("POST", "/predict/price/", {"json": transaction()}),
+        "predict_price_batch": lambda: ("POST", "/predict/price/batch", {"json": {"items": [
+            {"product_id": int(product_id), "quantity": int(quantity)}
+            for product_id, quantity in zip(rng.choice(product_ids, BATCH_ITEMS), rng.integers(1, 10, BATCH_ITEMS))
+        ]}}),
+        "transactions": lambda: ("POST", "/transactions/", {"json": record()}),
+        "reports_products": lambda: ("GET", "/reports/products", {"params": {"limit": 20}}),
+        "reports_daily": lambda: ("GET", "/reports/daily", {}),
+    }
+
+
+def summarize(latencies, statuses, elapsed):
+    latencies_ms = np.asarray(latencies) * 1000
+    ok = sum(count for status, count in statuses.items() if 200 <= int(status) < 300)
+    return {
+        "requests": len(latencies),
+        "ok": ok,
+        "statuses": statuses,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+    }
+
+
+async def load_endpoint(client, factory, requests, concurrency, warmup):
+    """
+    Send `warmup` unmeasured requests, then `requests` measured ones from `concurrency` clients.
+    """
+    for _ in range(warmup):
+        method, url, kwargs = factory()
+        await client.request(method, url, **kwargs)
+
+    latencies, statuses = [], {}
+    remaining = iter(range(requests))
+
+    async def client_loop():
+        for _ in remaining:
+            method, url, kwargs = factory()
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - start)
+
+
+async def run_load(endpoints=None, requests=1000, concurrency=16, warmup=50, seed=42):
+    """
+    {endpoint: latency / throughput summary} for the selected endpoints (default: all).
+    """
+    import httpx
+    from app import app
+
+    factories = request_factories(np.random.default_rng(seed))
+    results = {}
+    # ✅ Run the app's startup / shutdown handlers (micro-batchers) around the load
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for name in endpoints or list(factories):
+                results[name] = await load_endpoint(client, factories[name], requests, concurrency, warmup)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="In-process API load test")
+    parser.add_argument("output", help="JSON file the results are written to")
+    parser.add_argument("--endpoints", nargs="+", help="endpoints to load (default: all)")
+    parser.add_argument("--requests", type=int, default=1000, help="measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    ensure_models()
+    results = asyncio.run(run_load(args.endpoints, args.requests, args.concurrency, args.warmup))
+    Path(args.output).write_text(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+End-to-end benchmark suite: pipeline stages and API latency at several data scales.
+
+For every scale a synthetic dataset is generated once (scripts/data.py) into the work directory.
+Each pipeline stage (benchmarks/stages.py) then runs in a fresh process for wall time and peak
+RSS, and again under tracemalloc for allocations. Finally the API is load-tested in-process
+(benchmarks/api_load.py). Results are written as JSON and can be compared with a stored baseline;
+the exit status is 1 when any measurement regressed by more than the threshold.
+
+    python benchmarks/run.py                                                    # 10k, 100k and 1m rows
+    python benchmarks/run.py --scales 10k --baseline benchmarks/baseline.json   # fail on regressions
+    python benchmarks/run.py --scales 10k --output benchmarks/baseline.json     # (re)record the baseline
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from stages import STAGES
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCHMARKS_DIR.parent
+
+DEFAULT_SCALES = ["10k", "100k", "1m"]
+# ✅ Relative slowdown / growth tolerated before a measurement counts as a regression
+DEFAULT_THRESHOLD = 0.2
+# ✅ metric -> (direction, absolute noise floor): "lower" metrics regress when they grow
+COMPARED_METRICS = {
+    "wall_s": ("lower", 0.05),
+    "peak_rss_mb": ("lower", 10.0),
+    "alloc_peak_mb": ("lower", 5.0),
+    "p50_ms": ("lower", 0.5),
+    "p95_ms": ("lower", 1.0),
+    "p99_ms": ("lower", 2.0),
+    "throughput_rps": ("higher", 5.0),
+}
+
+
+def parse_scale(scale):
+    """
+    "10k" -> 10000, "1m" -> 1000000, "2500" -> 2500.
+    """
+    multiplier = {"k": 10 ** 3, "m": 10 ** 6}.get(scale[-1].lower(), 1)
+    return int(float(scale.rstrip("kKmM")) * multiplier)
+
+
+def _run(args, env, label):
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, *map(str, args)], env=env, cwd=BACKEND_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if completed.returncode:
+        raise RuntimeError(f"{label} failed:\n{completed.stderr[-2000:]}")
+    return time.perf_counter() - start
+
+
+def scale_env(work_dir, scale):
+    """
+    Environment pointing the data, models and reports of the project at this scale's directory.
+    """
+    scale_dir = Path(work_dir) / scale
+    return {
+        **os.environ,
+        "INVENTORY_DATA_DIR": str(scale_dir / "data"),
+        "INVENTORY_MODELS_DIR": str(scale_dir / "models"),
+        "INVENTORY_REPORTS_DIR": str(scale_dir / "reports"),
+    }
+
+
+def generate(env, rows, seed, regenerate=False):
+    """
+    Generate the dataset of one scale unless it already exists; returns the generation time or None.
+    """
+    if not regenerate and (Path(env["INVENTORY_DATA_DIR"]) / ".columnar" / "transactions" / "_meta.json").exists():
+        return None
+    return _run([BACKEND_DIR / "scripts" / "data.py", "--transactions", rows, "--seed", seed,
+                 "--data-dir", env["INVENTORY_DATA_DIR"]], env, "data generation")
+
+
+def run_stage(name, env, trace):
+    """
+    Run one stage in a fresh process. Each run gets an empty tuning cache, so training stages always
+    do their full hyperparameter search instead of replaying scores cached by an earlier run.
+    """
+    with tempfile.NamedTemporaryFile(suffix=".json") as output, tempfile.TemporaryDirectory() as tuning_cache:
+        args = [BENCHMARKS_DIR / "stages.py", name, output.name] + (["--trace"] if trace else [])
+        _run(args, {**env, "INVENTORY_TUNING_CACHE": tuning_cache}, f"stage {name}")
+        return json.loads(Path(output.name).read_text())
+
+
+def run_stages(env, rows, stages, repeat=1, allocations=True):
+    """
+    {stage: measurements}; the fastest of `repeat` runs is kept, allocations come from one traced run.
+    """
+    results = {}
+    for name in stages:
+        max_rows = STAGES[name][2]
+        if max_rows is not None and rows > max_rows:
+            results[name] = {"skipped": f"runs up to {max_rows:,} rows"}
+            continue
+        result = min((run_stage(name, env, trace=False) for _ in range(repeat)), key=lambda r: r["wall_s"])
+        if allocations:
+            traced = run_stage(name, env, trace=True)
+            result.update({key: traced[key] for key in ("alloc_peak_mb", "alloc_retained_mb")})
+        results[name] = result
+        print(f"  {name:<20} {result['wall_s']:>9.3f}s  {result['peak_rss_mb']:>8.1f} MB RSS")
+    return results
+
+
+def run_api(env, requests, concurrency, endpoints=None):
+    with tempfile.NamedTemporaryFile(suffix=".json") as output:
+        args = [BENCHMARKS_DIR / "api_load.py", output.name, "--requests", requests, "--concurrency", concurrency]
+        if endpoints:
+            args += ["--endpoints", *endpoints]
+        _run(args, env, "API load test")
+        results = json.loads(Path(output.name).read_text())
+    for name, result in results.items():
+        print(f"  {name:<20} p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+              f"p99 {result['p99_ms']:>8.2f}ms  {result['throughput_rps']:>8.1f} req/s  ({result['ok']} ok)")
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Regressions of `results` against `baseline`, as (scale, section, name, metric, baseline, current).
+    Only measurements present in both are compared; changes within the noise floor are ignored.
+    """
+    regressions = []
+    for scale, sections in results["scales"].items():
+        for section, entries in sections.items():
+            for name, current in entries.items():
+                previous = baseline.get("scales", {}).get(scale, {}).get(section, {}).get(name, {})
+                for metric, (direction, floor) in COMPARED_METRICS.items():
+                    if metric not in current or metric not in previous:
+                        continue
+                    old, new = previous[metric], current[metric]
+                    if direction == "lower":
+                        regressed = new > old * (1 + threshold) and new - old > floor
+                    else:
+                        regressed = new < old / (1 + threshold) and old - new > floor
+                    if regressed:
+                        regressions.append((scale, section, name, metric, old, new))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages and the API")
+    parser.add_argument("--scales", nargs="+", default=DEFAULT_SCALES, help="transaction counts, e.g. 10k 100k 1m")
+    parser.add_argument("--stages", nargs="*", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--endpoints", nargs="*", help="API endpoints to load (default: all)")
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--requests", type=int, default=1000, help="measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent API clients")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per stage (the fastest is kept)")
+    parser.add_argument("--no-allocations", action="store_true", help="skip the tracemalloc runs")
+    parser.add_argument("--work-dir", default=Path(tempfile.gettempdir()) / "inventory-benchmarks",
+                        help="where the generated datasets and fixture models are kept between runs")
+    parser.add_argument("--regenerate", action="store_true", help="regenerate the datasets")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=BENCHMARKS_DIR / "results.json")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative change that counts as a regression")
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "scales": {},
+    }
+    for scale in args.scales:
+        rows = parse_scale(scale)
+        env = scale_env(args.work_dir, scale)
+        print(f"📦 {scale} ({rows:,} transactions)")
+        generated = generate(env, rows, args.seed, args.regenerate)
+        if generated is not None:
+            print(f"  generated in {generated:.1f}s")
+
+        section = {"stages": run_stages(env, rows, args.stages, args.repeat, not args.no_allocations)}
+        if not args.skip_api:
+            section["api"] = run_api(env, args.requests, args.concurrency, args.endpoints)
+        results["scales"][scale] = section
+
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    print(f"✅ Results written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.threshold)
+        for scale, section, name, metric, old, new in regressions:
+            print(f"❌ {scale} {section}/{name} {metric}: {old} -> {new}")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ No regressions against {args.baseline} (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
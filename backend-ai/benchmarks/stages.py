@@ -0,0 +1,117 @@
+"""
+Pipeline stages measured by the benchmark suite (benchmarks/run.py).
+
+Every stage runs in its own process against the data directory in INVENTORY_DATA_DIR, so peak RSS
+is per stage. A stage is a setup function (loading its inputs, not measured) and the measured body.
+
+    python benchmarks/stages.py preprocess_demand result.json             # wall time + peak RSS
+    python benchmarks/stages.py preprocess_demand result.json --trace     # + tracemalloc allocations
+"""
+import argparse
+import gc
+import json
+import resource
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "inventory_forecasting"))
+
+# ✅ Imported up front so that import time is not measured as part of the first stage
+from data_loader import load_data
+from feature_engineering import preprocess_data, build_demand_series
+from train_anomaly import preprocess_transactions
+from train_pricing import build_pricing_frame, train_pricing_model
+
+# ✅ Stages that fit models are only run up to this many transactions
+TRAIN_MAX_ROWS = 100_000
+
+
+def _load_all():
+    return load_data(nrows=None)
+
+
+def _run_load_data(_):
+    _load_all()
+
+
+def _run_preprocess_demand(data):
+    preprocess_data(data[4])
+
+
+def _run_demand_series(_):
+    build_demand_series()
+
+
+def _run_preprocess_anomaly(data):
+    users, _, _, products, transactions = data
+    preprocess_transactions(transactions, users, products)
+
+
+def _run_pricing_features(data):
+    _, suppliers, warehouses, products, transactions = data
+    build_pricing_frame(transactions, products, suppliers, warehouses)
+
+
+def _run_train_pricing(data):
+    _, suppliers, warehouses, products, transactions = data
+    train_pricing_model(transactions, products, suppliers, warehouses)
+
+
+# ✅ name -> (setup, measured body, largest scale it runs at or None)
+STAGES = {
+    "load_data": (lambda: None, _run_load_data, None),
+    "preprocess_demand": (_load_all, _run_preprocess_demand, None),
+    "demand_series": (lambda: None, _run_demand_series, None),
+    "preprocess_anomaly": (_load_all, _run_preprocess_anomaly, None),
+    "pricing_features": (_load_all, _run_pricing_features, None),
+    "train_pricing": (_load_all, _run_train_pricing, TRAIN_MAX_ROWS),
+}
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far (ru_maxrss is KiB on Linux, bytes on macOS).
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def measure(name, trace=False):
+    """
+    Run one stage in this process: wall time, peak RSS (after setup and overall) and, with
+    `trace`, the peak and retained Python allocations (tracemalloc) of the measured body.
+    """
+    setup, body, _ = STAGES[name]
+    state = setup()
+    gc.collect()
+    result = {"setup_rss_mb": round(peak_rss_mb(), 1)}
+
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    body(state)
+    result["wall_s"] = round(time.perf_counter() - start, 4)
+    if trace:
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["alloc_peak_mb"] = round(peak / 2 ** 20, 1)
+        result["alloc_retained_mb"] = round(retained / 2 ** 20, 1)
+    result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure one pipeline stage")
+    parser.add_argument("stage", choices=list(STAGES))
+    parser.add_argument("output", help="JSON file the measurements are written to")
+    parser.add_argument("--trace", action="store_true", help="also trace allocations (slower)")
+    args = parser.parse_args(argv)
+
+    result = measure(args.stage, trace=args.trace)
+    Path(args.output).write_text(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Admission control and a bounded executor for the API's CPU work.
+
+At most `max_in_flight` requests are handled at once; up to `max_queued` more wait for a slot for
+at most `queue_timeout_ms`. Anything beyond that is answered straight away with 503 and a
+Retry-After header, so under overload latency stays bounded (excess requests are shed) instead of
+every request queueing behind a stalled event loop.
+
+Handlers hand their blocking work (pandas, NumPy, model calls, file IO) to run_blocking(), which
+runs it on a fixed-size thread pool; together with the admission limit that pool's queue can never
+grow without bound.
+
+    INVENTORY_MAX_IN_FLIGHT=64 INVENTORY_MAX_QUEUED=256 INVENTORY_QUEUE_TIMEOUT_MS=1000
+    INVENTORY_RETRY_AFTER_S=1 INVENTORY_CPU_THREADS=4
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import Counter as MetricCounter, Gauge, Histogram
+
+# ✅ Defaults, overridable through the environment
+MAX_IN_FLIGHT = int(os.environ.get("INVENTORY_MAX_IN_FLIGHT", 64))
+MAX_QUEUED = int(os.environ.get("INVENTORY_MAX_QUEUED", 256))
+QUEUE_TIMEOUT_MS = float(os.environ.get("INVENTORY_QUEUE_TIMEOUT_MS", 1000.0))
+RETRY_AFTER_S = float(os.environ.get("INVENTORY_RETRY_AFTER_S", 1.0))
+CPU_THREADS = int(os.environ.get("INVENTORY_CPU_THREADS", min(4, os.cpu_count() or 1)))
+
+# ✅ Never shed: probes, scrapes and admin endpoints must answer while the service is saturated
+EXEMPT_PATHS = ("/healthz", "/readyz", "/metrics", "/admin/")
+
+ADMISSION_REJECTED = MetricCounter("admission_rejected_total", "Requests answered with 503 by admission control",
+                                   ["reason"])
+ADMISSION_WAIT_SECONDS = Histogram("admission_wait_seconds", "Time admitted requests waited for a slot")
+
+_executor = None
+
+
+def get_cpu_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=CPU_THREADS, thread_name_prefix="api-cpu")
+    return _executor
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Run a blocking call on the bounded CPU pool and await its result (exceptions propagate).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_executor(), lambda: fn(*args, **kwargs))
+
+
+class Overloaded(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Service overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Counts requests in flight and waiting; acquire() hands out a slot or raises Overloaded.
+    """
+
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT, max_queued=MAX_QUEUED, queue_timeout_ms=QUEUE_TIMEOUT_MS,
+                 retry_after=RETRY_AFTER_S):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout_ms / 1000.0
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._semaphore = None
+
+    async def acquire(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        if self._semaphore.locked():
+            if self.queued >= self.max_queued:
+                self._reject("queue_full")
+            self.queued += 1
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject("queue_timeout")
+            finally:
+                self.queued -= 1
+            ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - started)
+        else:
+            await self._semaphore.acquire()
+            ADMISSION_WAIT_SECONDS.observe(0.0)
+        self.in_flight += 1
+        self.admitted += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def _reject(self, reason):
+        self.rejected += 1
+        ADMISSION_REJECTED.inc(reason=reason)
+        raise Overloaded(reason, self.retry_after)
+
+    def metrics(self):
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queued": self.max_queued,
+            "queue_timeout_ms": self.queue_timeout * 1000,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+# ✅ Admission state of this process, for the gauges below
+_controllers = []
+
+ADMISSION_IN_FLIGHT = Gauge("admission_in_flight", "Requests holding an admission slot",
+                            collect=lambda: {(): sum(c.in_flight for c in _controllers)})
+ADMISSION_QUEUED = Gauge("admission_queued", "Requests waiting for an admission slot",
+                         collect=lambda: {(): sum(c.queued for c in _controllers)})
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware holding an admission slot for the whole request (including a streamed body);
+    rejected requests get 503 with Retry-After without reaching the app.
+    """
+
+    def __init__(self, app, controller=None):
+        self.app = app
+        self.controller = controller or AdmissionController()
+        _controllers.append(self.controller)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PATHS):
+            return await self.app(scope, receive, send)
+        try:
+            await self.controller.acquire()
+        except Overloaded as e:
+            return await _send_overloaded(send, e)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+
+async def _send_overloaded(send, error):
+    body = json.dumps({"detail": str(error), "retry_after": error.retry_after}).encode()
+    await send({"type": "http.response.start", "status": 503, "headers": [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"retry-after", str(max(1, math.ceil(error.retry_after))).encode()),
+    ]})
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,118 @@
+import numpy as np
+
+# ✅ Partitions scanned per query; higher is more exact and slower
+DEFAULT_N_PROBE = 8
+
+# ✅ Vectors used to fit the partition centroids
+KMEANS_SAMPLE_SIZE = 100_000
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _assign(vectors, centroids, block_size=65536):
+    """
+    Index of the centroid with the largest inner product for every vector, computed in blocks.
+    """
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block_size):
+        labels[start:start + block_size] = np.argmax(vectors[start:start + block_size] @ centroids.T, axis=1)
+    return labels
+
+
+def spherical_kmeans(vectors, n_clusters, n_iter=10, seed=42):
+    """
+    Unit-norm centroids that partition `vectors` by inner product (Lloyd iterations).
+    Empty clusters are re-seeded from random vectors.
+    """
+    rng = np.random.default_rng(seed)
+    unit = _normalize(vectors)
+    centroids = unit[rng.choice(len(unit), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = _assign(unit, centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        present = counts > 0
+        # ✅ Per-cluster sums with one reduceat over the vectors sorted by cluster
+        sums[present] = np.add.reduceat(unit[order], np.concatenate([[0], np.cumsum(counts)[:-1]])[present])
+        empty = ~present
+        sums[empty] = unit[rng.choice(len(unit), int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """
+    Inverted-file index for maximum inner product search over a fixed set of vectors.
+
+    Vectors are grouped into partitions around spherical k-means centroids and stored contiguously
+    by partition (offsets[p]:offsets[p + 1] is partition p). A query scores the centroids, scans only
+    the `n_probe` best partitions with one matrix-vector product, and returns the top k of those.
+    """
+
+    def __init__(self, centroids, vectors, ids, offsets):
+        self.centroids = centroids
+        self.vectors = vectors
+        self.ids = ids
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, vectors, ids, n_lists=None, n_iter=10, sample_size=KMEANS_SAMPLE_SIZE, seed=42):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = np.asarray(ids, dtype=np.int64)
+        n_lists = n_lists or max(1, int(np.sqrt(len(vectors))))
+        n_lists = min(n_lists, len(vectors))
+
+        rng = np.random.default_rng(seed)
+        sample = vectors if len(vectors) <= sample_size else vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = spherical_kmeans(sample, n_lists, n_iter=n_iter, seed=seed)
+
+        labels = _assign(_normalize(vectors), centroids)
+        order = np.argsort(labels, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_lists))])
+        return cls(centroids, vectors[order], ids[order], offsets)
+
+    def _candidates(self, query, n_probe):
+        if n_probe >= self.n_lists:
+            return slice(None)
+        probe = np.argpartition(self.centroids @ query, -n_probe)[-n_probe:]
+        return np.concatenate([np.arange(self.offsets[p], self.offsets[p + 1]) for p in probe])
+
+    def search(self, query, k=10, n_probe=DEFAULT_N_PROBE, exclude=None):
+        """
+        (ids, scores) of the (approximately) k vectors with the largest inner product with `query`,
+        best first. Ids in `exclude` are never returned.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        candidates = self._candidates(query, n_probe)
+        ids = self.ids[candidates]
+        scores = self.vectors[candidates] @ query
+        if exclude is not None and len(exclude):
+            scores = np.where(np.isin(ids, exclude), -np.inf, scores)
+
+        k = min(k, len(scores))
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        top = top[np.isfinite(scores[top])]
+        return ids[top], scores[top]
+
+    def search_exact(self, query, k=10, exclude=None):
+        return self.search(query, k, n_probe=self.n_lists, exclude=exclude)
+
+    def to_arrays(self, prefix="index_"):
+        return {f"{prefix}centroids": self.centroids, f"{prefix}vectors": self.vectors,
+                f"{prefix}ids": self.ids, f"{prefix}offsets": self.offsets}
+
+    @classmethod
+    def from_arrays(cls, get, prefix="index_"):
+        """
+        Rebuild from saved arrays; `get(key)` returns one array (e.g. LazyModel.get, memory-mapped).
+        """
+        return cls(get(f"{prefix}centroids"), get(f"{prefix}vectors"), get(f"{prefix}ids"), get(f"{prefix}offsets"))
@@ -0,0 +1,202 @@
+import threading
+import time
+
+import numpy as np
+
+from data_loader import load_arrays, source_fingerprint
+
+CATALOG_TABLES = ["products", "suppliers", "warehouses"]
+
+# ✅ Used when a product's supplier is unknown (same default the API always used)
+DEFAULT_RELIABILITY = 0.5
+
+# ✅ How often get_catalog() checks whether the source data changed
+RELOAD_CHECK_INTERVAL = 5.0
+
+
+def _build_index(ids):
+    """
+    Dense id -> row lookup table: index[id] is the row of `id`, or -1 if there is none.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    index = np.full(int(ids.max()) + 1 if len(ids) else 1, -1, dtype=np.int32)
+    index[ids] = np.arange(len(ids), dtype=np.int32)
+    return index
+
+
+def _gather_rows(index, keys):
+    """
+    Vectorised _lookup: rows for every key in `keys`, -1 where a key is unknown.
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    in_range = (keys >= 0) & (keys < len(index))
+    rows = np.full(len(keys), -1, dtype=np.int32)
+    rows[in_range] = index[keys[in_range]]
+    return rows
+
+
+def _join(index, keys, values, default):
+    """
+    values[row of key] for every key in `keys` (may hold NaN), `default` where a key is missing or unknown.
+    """
+    keys = np.asarray(keys, dtype=np.float64)
+    known = ~np.isnan(keys)
+    rows = np.full(len(keys), -1, dtype=np.int32)
+    rows[known] = _gather_rows(index, keys[known])
+    return np.where(rows >= 0, values[rows], default) if len(values) else np.full(len(keys), default)
+
+
+def _lookup(index, key):
+    key = int(key)
+    if key < 0 or key >= len(index):
+        return -1
+    return int(index[key])
+
+
+class Catalog:
+    """
+    Immutable, id-indexed view of products joined with their supplier and warehouse.
+    Every attribute is a contiguous NumPy array aligned on product rows, so a lookup is
+    one index read plus array reads, with no DataFrame scans.
+    With impute=False (training matrices) missing attributes, suppliers and warehouses stay NaN
+    instead of taking the serving defaults, so the caller can impute them over its own rows.
+    """
+
+    def __init__(self, products, suppliers, warehouses, fingerprint=None, impute=True):
+        self.fingerprint = fingerprint
+        self.loaded_at = time.time()
+
+        self.product_id = np.ascontiguousarray(products["product_id"], dtype=np.int32)
+        self.product_name = np.ascontiguousarray(products["product_name"])
+        self.category_codes = np.ascontiguousarray(products["category"].codes, dtype=np.int16)
+        self.categories = np.asarray(products["category"].categories, dtype=object)
+        self.cost_per_unit = np.ascontiguousarray(products["cost_per_unit"], dtype=np.float64)
+        self.price_per_unit = np.ascontiguousarray(products["price_per_unit"], dtype=np.float64)
+        id_dtype = np.int32 if impute else np.float64
+        self.stock_level = np.ascontiguousarray(products["stock_level"], dtype=id_dtype)
+        self.supplier_id = np.ascontiguousarray(products["supplier_id"], dtype=id_dtype)
+        self.warehouse_id = np.ascontiguousarray(products["warehouse_id"], dtype=id_dtype)
+        self.product_index = _build_index(self.product_id)
+
+        # ✅ Pre-join supplier reliability onto product rows
+        self.supplier_index = _build_index(suppliers["supplier_id"])
+        supplier_reliability = np.asarray(suppliers["reliability_score"], dtype=np.float64)
+        self.reliability_score = _join(self.supplier_index, self.supplier_id, supplier_reliability,
+                                       DEFAULT_RELIABILITY if impute else np.nan)
+
+        # ✅ Pre-join warehouse capacity onto product rows (median when the warehouse is unknown)
+        self.warehouse_index = _build_index(warehouses["warehouse_id"])
+        warehouse_capacity = np.asarray(warehouses["capacity"], dtype=np.float64)
+        self.capacity = _join(self.warehouse_index, self.warehouse_id, warehouse_capacity,
+                              np.median(warehouse_capacity) if impute else np.nan)
+
+    def __len__(self):
+        return len(self.product_id)
+
+    def product_row(self, product_id):
+        """
+        Row of `product_id` in the catalog arrays, or -1 if the product is unknown.
+        """
+        return _lookup(self.product_index, product_id)
+
+    def category(self, row):
+        """
+        Category name of a catalog row, or None when the product has no category (code -1).
+        """
+        code = self.category_codes[row]
+        return str(self.categories[code]) if code >= 0 else None
+
+    def describe(self, row):
+        """
+        Product details for one catalog row, as plain Python values.
+        """
+        return {
+            "product_id": int(self.product_id[row]),
+            "product_name": str(self.product_name[row]),
+            "category": self.category(row),
+            "cost_per_unit": float(self.cost_per_unit[row]),
+            "price_per_unit": float(self.price_per_unit[row]),
+            "stock_level": int(self.stock_level[row]),
+            "supplier_id": int(self.supplier_id[row]),
+            "reliability_score": float(self.reliability_score[row]),
+        }
+
+    def product_rows(self, product_ids):
+        """
+        Vectorised product_row: catalog rows for an array of product ids, -1 where unknown.
+        """
+        return _gather_rows(self.product_index, product_ids)
+
+    def pricing_features(self, rows, quantities, order="C"):
+        """
+        Pricing-model input matrix (train_pricing.PRICING_FEATURES order) for catalog rows,
+        assembled with one gather per column instead of a Python loop per row.
+        order="F" keeps every column contiguous (faster to fill for large training matrices).
+        """
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.intp))
+        features = np.empty((len(rows), 10), dtype=np.float64, order=order)
+        features[:, 0] = np.atleast_1d(np.asarray(quantities, dtype=np.float64))
+        features[:, 1] = self.product_id[rows]
+        features[:, 2] = self.cost_per_unit[rows]
+        features[:, 3] = self.price_per_unit[rows]
+        features[:, 4] = self.stock_level[rows]
+        features[:, 5] = self.reliability_score[rows]
+        features[:, 6] = self.capacity[rows]
+        return derive_pricing_features(features)
+
+
+def derive_pricing_features(features):
+    """
+    Fill the derived pricing columns (cost_reliability, price_stock_ratio, warehouse_utilization)
+    of a PRICING_FEATURES matrix from its base columns, in place; returns the matrix.
+    """
+    features[:, 7] = features[:, 2] * features[:, 5]
+    features[:, 8] = features[:, 3] / (features[:, 4] + 1)
+    features[:, 9] = features[:, 0] / (features[:, 6] + 1)
+    return features
+
+
+def build_catalog():
+    """
+    Build a Catalog from the columnar cache of products, suppliers and warehouses.
+    """
+    fingerprint = source_fingerprint(CATALOG_TABLES)
+    products = load_arrays("products", ["product_id", "product_name", "category", "cost_per_unit",
+                                        "price_per_unit", "stock_level", "supplier_id", "warehouse_id"])
+    suppliers = load_arrays("suppliers", ["supplier_id", "reliability_score"])
+    warehouses = load_arrays("warehouses", ["warehouse_id", "capacity"])
+    return Catalog(products, suppliers, warehouses, fingerprint=fingerprint)
+
+
+_catalog = None
+_last_check = 0.0
+_reload_lock = threading.Lock()
+
+
+def get_catalog():
+    """
+    Return the current catalog, rebuilding it when the underlying data changed.
+    The new catalog is built off to the side and swapped in with a single assignment,
+    so concurrent readers always see either the old or the new catalog, never a mix.
+    """
+    global _catalog, _last_check
+    now = time.monotonic()
+    if _catalog is not None and now - _last_check < RELOAD_CHECK_INTERVAL:
+        return _catalog
+
+    with _reload_lock:
+        if _catalog is None or source_fingerprint(CATALOG_TABLES) != _catalog.fingerprint:
+            _catalog = build_catalog()
+        _last_check = now
+    return _catalog
+
+
+def reload_catalog():
+    """
+    Force a rebuild of the catalog (e.g. after new data was ingested).
+    """
+    global _catalog, _last_check
+    with _reload_lock:
+        _catalog = build_catalog()
+        _last_check = time.monotonic()
+    return _catalog
@@ -0,0 +1,222 @@
+import numpy as np
+
+from data_loader import load_arrays, table_meta
+from encoding import Encoders, table_vocabulary
+from catalog import build_catalog
+from train_pricing import PRICING_FEATURES
+
+# ✅ Transactions processed per chunk; memory use is bounded by this, not by the table size
+DEFAULT_CHUNK_SIZE = 100_000
+
+# ✅ Fraud label: quantity above this quantile (same rule as train_anomaly_model)
+FRAUD_QUANTILE = 0.99
+
+# ✅ Features produced by train_anomaly.preprocess_transactions, in order
+ANOMALY_FEATURES = ["user_id", "product_id", "quantity", "total_price", "payment_method", "category",
+                    "cost_per_unit", "price_per_unit", "stock_level", "supplier_id", "warehouse_id",
+                    "user_total_transactions", "user_total_spent", "avg_spent_per_transaction", "user_credibility"]
+# ✅ Transaction columns the anomaly features are built from
+ANOMALY_COLUMNS = ["user_id", "product_id", "quantity", "total_price", "payment_method"]
+
+
+class UserAggregates:
+    """
+    Per-user running totals (transaction count and amount spent) held in arrays indexed by user_id.
+    update() folds in one chunk at a time with np.bincount, growing the arrays as new ids appear.
+    """
+
+    def __init__(self, size=0):
+        self.count = np.zeros(size, dtype=np.int64)
+        self.spent = np.zeros(size, dtype=np.float64)
+
+    def _grow(self, size):
+        if size > len(self.count):
+            size = max(size, int(len(self.count) * 1.5))
+            self.count = np.concatenate([self.count, np.zeros(size - len(self.count), dtype=np.int64)])
+            self.spent = np.concatenate([self.spent, np.zeros(size - len(self.spent), dtype=np.float64)])
+
+    def update(self, user_ids, amounts):
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        if not len(user_ids):
+            return
+        size = int(user_ids.max()) + 1
+        self._grow(size)
+        self.count[:size] += np.bincount(user_ids, minlength=size)
+        self.spent[:size] += np.bincount(user_ids, weights=np.asarray(amounts, dtype=np.float64), minlength=size)
+
+    def add(self, user_id, amount):
+        """
+        Fold in a single transaction in O(1). Negative ids would wrap around to another user's slot.
+        """
+        if user_id < 0:
+            raise ValueError(f"user_id must be >= 0, got {user_id}")
+        self._grow(user_id + 1)
+        self.count[user_id] += 1
+        self.spent[user_id] += amount
+
+    def features(self, user_ids):
+        """
+        (user_total_transactions, user_total_spent, avg_spent_per_transaction, user_credibility)
+        for every id in `user_ids`; unknown users get zeros.
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        known = (user_ids >= 0) & (user_ids < len(self.count))
+        count = np.zeros(len(user_ids), dtype=np.float64)
+        spent = np.zeros(len(user_ids), dtype=np.float64)
+        count[known] = self.count[user_ids[known]]
+        spent[known] = self.spent[user_ids[known]]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            avg = np.where(count > 0, spent / count, 0.0)
+            credibility = np.where(spent > 0, count / spent, 0.0)
+        return count, spent, avg, credibility
+
+
+def anomaly_encoders():
+    """
+    Encoders of the coded anomaly features, with the vocabularies the columnar cache assigned;
+    saved with the anomaly model so later scoring can remap codes.
+    """
+    return Encoders({
+        "payment_method": table_vocabulary("transactions", "payment_method"),
+        "category": table_vocabulary("products", "category"),
+    })
+
+
+def _quantile_from_counts(counts, q):
+    """
+    np.quantile (linear interpolation) of integer values given as a histogram `counts[value]`.
+    """
+    cumulative = np.cumsum(counts)
+    n = cumulative[-1]
+    position = (n - 1) * q
+    lower = int(np.searchsorted(cumulative, np.floor(position), side="right"))
+    upper = int(np.searchsorted(cumulative, np.ceil(position), side="right"))
+    return lower + (upper - lower) * (position - np.floor(position))
+
+
+def iter_transaction_chunks(columns, chunk_size=DEFAULT_CHUNK_SIZE, nrows=None):
+    """
+    Yield (start, {column: array}) for consecutive slices of the memory-mapped transactions.
+    Categorical columns are returned as their integer codes.
+    """
+    arrays = load_arrays("transactions", columns, nrows=nrows, decode=False)
+    total = len(next(iter(arrays.values())))
+    for start in range(0, total, chunk_size):
+        stop = min(start + chunk_size, total)
+        yield start, {column: np.asarray(values[start:stop]) for column, values in arrays.items()}
+
+
+def scan_transactions(chunk_size=DEFAULT_CHUNK_SIZE, nrows=None):
+    """
+    First pass over the transactions: per-user aggregates, the quantity histogram and the row count.
+    """
+    aggregates = UserAggregates()
+    quantity_counts = np.zeros(1, dtype=np.int64)
+    rows = 0
+    for _, chunk in iter_transaction_chunks(["user_id", "quantity", "total_price"], chunk_size, nrows):
+        aggregates.update(chunk["user_id"], chunk["total_price"])
+        chunk_counts = np.bincount(np.clip(chunk["quantity"], 0, None))
+        if len(chunk_counts) > len(quantity_counts):
+            quantity_counts = np.pad(quantity_counts, (0, len(chunk_counts) - len(quantity_counts)))
+        quantity_counts[:len(chunk_counts)] += chunk_counts
+        rows += len(chunk["user_id"])
+    return aggregates, quantity_counts, rows
+
+
+def iter_anomaly_blocks(chunk_size=DEFAULT_CHUNK_SIZE, nrows=None, catalog=None, aggregates=None, fraud_threshold=None):
+    """
+    Yield (X, y) float32/int8 blocks with the ANOMALY_FEATURES columns for the fraud model.
+    Each chunk is joined against the id-indexed product catalog and the per-user aggregates,
+    so nothing larger than one chunk is ever materialised.
+    """
+    if aggregates is None or fraud_threshold is None:
+        aggregates, quantity_counts, _ = scan_transactions(chunk_size, nrows)
+        fraud_threshold = _quantile_from_counts(quantity_counts, FRAUD_QUANTILE)
+    catalog = catalog or build_catalog()
+
+    for _, chunk in iter_transaction_chunks(ANOMALY_COLUMNS, chunk_size, nrows):
+        X = anomaly_features(chunk, catalog, aggregates)
+        y = (chunk["quantity"] > fraud_threshold).astype(np.int8)
+        yield X, y
+
+
+def anomaly_features(chunk, catalog, aggregates):
+    """
+    float32 ANOMALY_FEATURES matrix for one chunk of ANOMALY_COLUMNS (payment_method as its code);
+    product columns of unknown products are NaN.
+    """
+    rows = catalog.product_rows(chunk["product_id"])
+    known = rows >= 0
+    safe_rows = np.where(known, rows, 0)
+
+    X = np.zeros((len(rows), len(ANOMALY_FEATURES)), dtype=np.float32)
+    X[:, 0] = chunk["user_id"]
+    X[:, 1] = chunk["product_id"]
+    X[:, 2] = chunk["quantity"]
+    X[:, 3] = chunk["total_price"]
+    X[:, 4] = chunk["payment_method"]
+    X[:, 5] = np.where(known, catalog.category_codes[safe_rows], -1)
+    X[:, 6] = np.where(known, catalog.cost_per_unit[safe_rows], np.nan)
+    X[:, 7] = np.where(known, catalog.price_per_unit[safe_rows], np.nan)
+    X[:, 8] = np.where(known, catalog.stock_level[safe_rows], np.nan)
+    X[:, 9] = np.where(known, catalog.supplier_id[safe_rows], np.nan)
+    X[:, 10] = np.where(known, catalog.warehouse_id[safe_rows], np.nan)
+    X[:, 11], X[:, 12], X[:, 13], X[:, 14] = aggregates.features(chunk["user_id"])
+    return X
+
+
+def iter_pricing_blocks(chunk_size=DEFAULT_CHUNK_SIZE, nrows=None, catalog=None):
+    """
+    Yield (X, y) float32 blocks with the PRICING_FEATURES columns and the log1p(total_price) target.
+    Transactions whose product is not in the catalog are skipped.
+    """
+    catalog = catalog or build_catalog()
+    for _, chunk in iter_transaction_chunks(["product_id", "quantity", "total_price"], chunk_size, nrows):
+        rows = catalog.product_rows(chunk["product_id"])
+        known = rows >= 0
+        X = catalog.pricing_features(rows[known], chunk["quantity"][known]).astype(np.float32)
+        y = np.log1p(chunk["total_price"][known]).astype(np.float32)
+        yield X, y
+
+
+def collect_blocks(blocks, n_rows, n_features, target_dtype=np.float32):
+    """
+    Fill one preallocated float32 matrix (and target vector) from a block generator.
+    """
+    X = np.empty((n_rows, n_features), dtype=np.float32)
+    y = np.empty(n_rows, dtype=target_dtype)
+    filled = 0
+    for X_block, y_block in blocks:
+        X[filled:filled + len(X_block)] = X_block
+        y[filled:filled + len(y_block)] = y_block
+        filled += len(X_block)
+    return X[:filled], y[:filled]
+
+
+def build_anomaly_matrix(chunk_size=DEFAULT_CHUNK_SIZE, nrows=None):
+    """
+    Model-ready (X, y) for the fraud model over all (or the first `nrows`) transactions. The user
+    totals always cover every transaction, like those the scorer and the API's feature store use.
+    """
+    aggregates, quantity_counts, rows = scan_transactions(chunk_size, nrows)
+    if nrows is not None:
+        aggregates = scan_transactions(chunk_size)[0]
+    fraud_threshold = _quantile_from_counts(quantity_counts, FRAUD_QUANTILE)
+    blocks = iter_anomaly_blocks(chunk_size, nrows, aggregates=aggregates, fraud_threshold=fraud_threshold)
+    X, y = collect_blocks(blocks, rows, len(ANOMALY_FEATURES), target_dtype=np.int8)
+
+    # ✅ Transactions of unknown products: fill their product columns with the column median
+    missing = np.isnan(X)
+    if missing.any():
+        medians = np.nanmedian(X, axis=0)
+        X[missing] = np.take(medians, np.nonzero(missing)[1])
+    return X, y
+
+
+def build_pricing_matrix(chunk_size=DEFAULT_CHUNK_SIZE, nrows=None):
+    """
+    Model-ready (X, y) for the pricing model over all (or the first `nrows`) transactions.
+    """
+    rows = table_meta("transactions")["rows"]
+    rows = rows if nrows is None else min(rows, nrows)
+    return collect_blocks(iter_pricing_blocks(chunk_size, nrows), rows, len(PRICING_FEATURES))
@@ -0,0 +1,267 @@
+"""
+Compiled inference for the fitted RandomForest models.
+
+A forest is flattened into struct-of-arrays node tables (int32 feature / left / right, float32
+threshold and leaf values) that are saved as .npy artifacts next to the sklearn model and
+memory-mapped when served. Leaves point at themselves, and evaluation advances every (row, tree)
+walk one level per vectorised gather step, with no per-node Python.
+
+    python compiled_forest.py                    # compile the latest anomaly and pricing models
+    python compiled_forest.py --models pricing
+"""
+import argparse
+import os
+
+import numpy as np
+
+# ✅ Artifact keys of the node tables in the model registry
+FOREST_ARRAYS = ["feature", "threshold", "left", "right", "value", "roots"]
+FOREST_PREFIX = "forest_"
+
+# ✅ rows x trees evaluated per block (bounds the temporary node-index matrix)
+BLOCK_CELLS = 1 << 20
+
+# ✅ Largest batch served from the node tables; the level-by-level walk costs O(rows x trees x depth)
+# gathers, so above this sklearn's per-tree C loops (or treelite) are faster
+COMPILED_MAX_ROWS = int(os.environ.get("INFERENCE_COMPILED_MAX_ROWS", 256))
+
+
+def _float32_threshold(threshold):
+    """
+    Largest float32 <= the float64 threshold, so `x32 <= t32` decides exactly like sklearn's
+    `float32(x) <= t64`.
+    """
+    t32 = threshold.astype(np.float32)
+    rounded_up = t32.astype(np.float64) > threshold
+    t32[rounded_up] = np.nextafter(t32[rounded_up], np.float32(-np.inf))
+    return t32
+
+
+class CompiledForest:
+    """
+    Node tables of a whole forest. Node ids are global; roots[t] is the root of tree t.
+    value[node] holds the leaf output: the regression value, or the class probabilities.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes=None, max_depth=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes = None if classes is None else np.asarray(classes)
+        self.max_depth = int(max_depth) if max_depth is not None else self._depth()
+        self.is_leaf = np.asarray(left) == np.arange(len(left), dtype=np.int32)
+
+    @property
+    def is_classifier(self):
+        return self.classes is not None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in FOREST_ARRAYS)
+
+    def _depth(self):
+        depth, node = 0, np.asarray(self.roots, dtype=np.int64)
+        while True:
+            children = np.concatenate([self.left[node], self.right[node]])
+            children = np.unique(children[children != np.tile(node, 2)])
+            if not len(children):
+                return depth
+            node, depth = children, depth + 1
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """
+        Flatten a fitted RandomForest / ExtraTrees (classifier or regressor) into node tables.
+        """
+        estimators = model.estimators_
+        sizes = [est.tree_.node_count for est in estimators]
+        offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        is_classifier = hasattr(model, "classes_")
+
+        feature, threshold, left, right, value = [], [], [], [], []
+        for offset, est in zip(offsets, estimators):
+            tree = est.tree_
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left < 0
+            # ✅ Leaves loop onto themselves and test feature 0 (the outcome is ignored)
+            feature.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+            threshold.append(np.where(leaf, 0.0, tree.threshold))
+            left.append((np.where(leaf, nodes, tree.children_left) + offset).astype(np.int32))
+            right.append((np.where(leaf, nodes, tree.children_right) + offset).astype(np.int32))
+            node_value = tree.value[:, 0, :]
+            if is_classifier:
+                node_value = node_value / np.maximum(node_value.sum(axis=1, keepdims=True), 1e-12)
+            value.append(node_value.astype(np.float32))
+
+        return cls(
+            np.concatenate(feature),
+            _float32_threshold(np.concatenate(threshold)),
+            np.concatenate(left),
+            np.concatenate(right),
+            np.concatenate(value),
+            offsets[:-1].astype(np.int32),
+            classes=model.classes_ if is_classifier else None,
+            max_depth=max(est.tree_.max_depth for est in estimators),
+        )
+
+    def leaves(self, X):
+        """
+        (rows, trees) leaf node reached by every row in every tree.
+        All (row, tree) walks advance one level per step; walks that reached a leaf are dropped,
+        so the work is the total path length rather than rows x trees x max_depth.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_trees = len(X), self.n_trees
+        flat_X = X.ravel()
+        leaves = np.empty(n_trees * n_rows, dtype=np.int32)
+        active = np.arange(n_trees * n_rows, dtype=np.int64)
+        # ✅ Tree-major order: consecutive walks read nearby nodes of the same tree
+        node = np.repeat(self.roots, n_rows)
+        row_offset = np.tile(np.arange(n_rows, dtype=np.int64) * X.shape[1], n_trees)
+        while active.size:
+            at_leaf = self.is_leaf[node]
+            if at_leaf.any():
+                leaves[active[at_leaf]] = node[at_leaf]
+                keep = ~at_leaf
+                active, node, row_offset = active[keep], node[keep], row_offset[keep]
+            go_left = flat_X[row_offset + self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return leaves.reshape(n_trees, n_rows).T
+
+    def _mean_value(self, X):
+        X = np.asarray(X)
+        out = np.empty((len(X), self.value.shape[1]), dtype=np.float64)
+        block = max(1, BLOCK_CELLS // self.n_trees)
+        for start in range(0, len(X), block):
+            leaves = self.leaves(X[start:start + block])
+            out[start:start + block] = self.value[leaves].mean(axis=1, dtype=np.float64)
+        return out
+
+    def predict_proba(self, X):
+        return self._mean_value(X)
+
+    def predict(self, X):
+        values = self._mean_value(X)
+        if self.is_classifier:
+            return self.classes[np.argmax(values, axis=1)]
+        return values[:, 0]
+
+    def to_arrays(self, prefix=FOREST_PREFIX):
+        return {f"{prefix}{name}": getattr(self, name) for name in FOREST_ARRAYS}
+
+    def params(self):
+        return {"forest_classes": None if self.classes is None else self.classes.tolist(),
+                "forest_max_depth": self.max_depth}
+
+    @classmethod
+    def from_arrays(cls, get, params, prefix=FOREST_PREFIX):
+        """
+        Rebuild from saved arrays; `get(key)` returns one array (e.g. LazyModel.get, memory-mapped).
+        """
+        arrays = {name: get(f"{prefix}{name}") for name in FOREST_ARRAYS}
+        return cls(**arrays, classes=params.get("forest_classes"), max_depth=params.get("forest_max_depth"))
+
+
+def treelite_backend(model):
+    """
+    Optional treelite predictor for a fitted sklearn forest, or None when treelite is not installed.
+    Returns a callable X -> predictions.
+    """
+    try:
+        import treelite
+        import treelite.gtil
+    except ImportError:
+        return None
+    tl_model = treelite.sklearn.import_model(model)
+    is_classifier = hasattr(model, "classes_")
+
+    def predict(X):
+        output = np.asarray(treelite.gtil.predict(tl_model, np.ascontiguousarray(X, dtype=np.float32)))
+        output = output.reshape(len(X), -1)
+        if is_classifier:
+            return model.classes_[np.argmax(output, axis=1)] if output.shape[1] > 1 else \
+                model.classes_[(output[:, 0] > 0.5).astype(int)]
+        return output[:, 0]
+    return predict
+
+
+def _by_batch_size(small, large, max_rows=COMPILED_MAX_ROWS):
+    """
+    Callable sending batches of up to `max_rows` rows to `small` and larger ones to `large`.
+    """
+    def predict(X):
+        return small(X) if len(X) <= max_rows else large(X)
+    return predict
+
+
+def load_predictor(handle, backend=None):
+    """
+    Fastest available predict function for a registered model (a LazyModel handle). Small batches
+    use the compiled node tables when the model has them; larger ones (and models without them)
+    use treelite when requested and installed, else sklearn. Versions with node tables but no sklearn
+    model (compressed ones) and backend="compiled" use the node tables for every batch.
+    """
+    compiled = None
+    if backend in (None, "compiled", "treelite") and f"{FOREST_PREFIX}feature" in handle.manifest["artifacts"]:
+        compiled = CompiledForest.from_arrays(handle.get, handle.manifest["params"]).predict
+        # ✅ Compressed versions ship the node tables only: they serve every batch size
+        if backend == "compiled" or "model" not in handle.manifest["artifacts"]:
+            return compiled
+    large = treelite_backend(handle.get("model")) if backend == "treelite" else None
+    large = large or handle.get("model").predict
+    return _by_batch_size(compiled, large) if compiled is not None else large
+
+
+def load_proba(handle):
+    """
+    (predict_proba, classes) of a registered classifier: the compiled node tables for small
+    batches when present (for every batch when the version has no sklearn model), sklearn otherwise.
+    """
+    artifacts = handle.manifest["artifacts"]
+    if f"{FOREST_PREFIX}feature" in artifacts:
+        forest = CompiledForest.from_arrays(handle.get, handle.manifest["params"])
+        if "model" not in artifacts:
+            return forest.predict_proba, forest.classes
+        return _by_batch_size(forest.predict_proba, handle.get("model").predict_proba), forest.classes
+    model = handle.get("model")
+    return model.predict_proba, model.classes_
+
+
+def compile_model(name):
+    """
+    Add compiled node tables to the latest version of model `name` as a new registry version.
+    """
+    from model_registry import LazyModel, save_artifacts
+
+    handle = LazyModel(name)
+    manifest = handle.manifest
+    forest = CompiledForest.from_sklearn(handle.get("model"))
+    artifacts = {key: handle.get(key) for key in manifest["artifacts"] if not key.startswith(FOREST_PREFIX)}
+    return save_artifacts(
+        name,
+        {**artifacts, **forest.to_arrays()},
+        feature_names=manifest["feature_names"],
+        fingerprint=manifest["data_fingerprint"],
+        metrics=manifest["metrics"],
+        params={**manifest["params"], **forest.params()},
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile registered forests into node tables")
+    parser.add_argument("--models", nargs="+", choices=["anomaly", "pricing"], default=["anomaly", "pricing"])
+    args = parser.parse_args(argv)
+    for name in args.models:
+        version = compile_model(name)
+        print(f"✅ Compiled {name} model v{version:04d}")
+
+
+if __name__ == "__main__":
+    main()
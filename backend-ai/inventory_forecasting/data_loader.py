@@ -1,11 +1,276 @@
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 
-def load_data():
-    users = pd.read_csv("/Users/loveprLovepreeteet/assignment/backend-ai/data/users.csv")
-    suppliers = pd.read_csv("/Users/loveprLovepreeteet/assignment/backend-ai/data/suppliers.csv")
-    warehouses = pd.read_csv("/Users/loveprLovepreeteet/assignment/backend-ai/data/warehouses.csv")
-    products = pd.read_csv("/Users/loveprLovepreeteet/assignment/backend-ai/data/products.csv")
-    transactions = pd.read_csv("/Users/loveprLovepreeteet/assignment/backend-ai/data/transactions.csv").head(10000)
+from instrumentation import span
+
+# ✅ Source CSVs live in backend-ai/data, the columnar cache next to them
+DATA_DIR = Path(os.environ.get("INVENTORY_DATA_DIR", Path(__file__).resolve().parent.parent / "data"))
+CACHE_DIR = Path(os.environ.get("INVENTORY_CACHE_DIR", DATA_DIR / ".columnar"))
+CACHE_VERSION = 1
+
+TABLES = ["users", "suppliers", "warehouses", "products", "transactions"]
+
+# ✅ Rows of transactions returned by load_data() unless a limit is given
+TRANSACTIONS_ROW_LIMIT = 10000
+
+# ✅ Age after which a superseded table or snapshot version is deleted (readers may still be opening it)
+VERSION_GRACE_S = 60
+
+# ✅ Column types used when ingesting a CSV (columns not listed here are inferred)
+SCHEMAS = {
+    "users": {"user_id": "int32", "user_name": "str", "email": "str", "location": "str"},
+    "suppliers": {"supplier_id": "int32", "supplier_name": "str", "contact_email": "str",
+                  "reliability_score": "float64"},
+    "warehouses": {"warehouse_id": "int32", "warehouse_name": "str", "location": "str",
+                   "capacity": "int32", "supplier_id": "int32"},
+    "products": {"product_id": "int32", "product_name": "str", "category": "category",
+                 "cost_per_unit": "float64", "price_per_unit": "float64", "stock_level": "int32",
+                 "supplier_id": "int32", "warehouse_id": "int32"},
+    "transactions": {"transaction_id": "str", "user_id": "int32", "product_id": "int32",
+                     "quantity": "int32", "total_price": "float64", "payment_method": "category",
+                     "transaction_date": "datetime64[ns]"},
+}
+
+
+def _source_path(table):
+    return DATA_DIR / f"{table}.csv"
+
+
+def _table_dir(table):
+    return CACHE_DIR / table
+
+
+def _read_meta(table, table_dir=None):
+    meta_path = (table_dir or _table_dir(table)) / "_meta.json"
+    if not meta_path.exists():
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def _is_stale(table, meta):
+    """
+    A cache is stale when it is missing, was written by another cache version,
+    or its source CSV changed (mtime or size) since it was ingested.
+    Tables written straight to the columnar format have no source and never go stale.
+    """
+    if meta is None or meta.get("version") != CACHE_VERSION:
+        return True
+    source = _source_path(table)
+    if meta.get("source") is None or not source.exists():
+        return False
+    stat = source.stat()
+    return stat.st_mtime_ns != meta["mtime_ns"] or stat.st_size != meta["size"]
+
+
+def _encode_column(series, dtype):
+    """
+    Turn one pandas column into (array, column-meta) for the cache.
+    """
+    if dtype == "category":
+        categorical = pd.Categorical(series)
+        codes = categorical.codes.astype(np.int16 if len(categorical.categories) < 2 ** 15 else np.int32)
+        return codes, {"kind": "category", "categories": [str(c) for c in categorical.categories]}
+
+    if dtype == "datetime64[ns]":
+        values = pd.to_datetime(series).to_numpy(dtype="datetime64[ns]")
+        return values, {"kind": "datetime"}
+
+    if dtype == "str" or (dtype is None and not pd.api.types.is_numeric_dtype(series)):
+        values = np.asarray(series.fillna("").astype(str).to_numpy(), dtype=np.str_)
+        return values, {"kind": "str"}
+
+    values = series.to_numpy()
+    if dtype is not None:
+        # ✅ Integer columns with missing values fall back to float64
+        if np.issubdtype(np.dtype(dtype), np.integer) and series.isna().any():
+            dtype = "float64"
+        values = values.astype(dtype)
+    return np.ascontiguousarray(values), {"kind": "numeric"}
+
+
+def write_table(table, df, source=None):
+    """
+    Write a DataFrame as one .npy file per column plus a _meta.json manifest.
+    The new cache is built in a temporary directory and swapped in, so readers
+    never see a half-written table.
+    """
+    schema = SCHEMAS.get(table, {})
+    tmp_dir = staging_dir(table)
+
+    meta = {"version": CACHE_VERSION, "table": table, "rows": int(len(df)), "columns": {}, "source": None}
+    if source is not None:
+        stat = Path(source).stat()
+        meta.update({"source": str(source), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size})
+
+    for column in df.columns:
+        values, column_meta = _encode_column(df[column], schema.get(column))
+        np.save(tmp_dir / f"{column}.npy", values, allow_pickle=False)
+        column_meta["dtype"] = str(values.dtype)
+        meta["columns"][column] = column_meta
 
-    transactions["transaction_date"] = pd.to_datetime(transactions["transaction_date"]).head(10000)
+    return publish_table(table, tmp_dir, meta)
+
+
+def staging_dir(table):
+    """
+    Fresh temporary directory in which a new version of `table` is written column by column.
+    """
+    tmp_dir = CACHE_DIR / f".{table}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    return tmp_dir
+
+
+def swap_in(path, staged_dir):
+    """
+    Publish the fully written `staged_dir` as `path`. Every version lives in its own hidden sibling
+    directory (.<name>.v<time>-<pid>) and `path` is a symlink to the current one, replaced by a single
+    rename: `path` always resolves to a complete version, and concurrent publishers never fail (the
+    last one wins). Superseded versions are removed once they are VERSION_GRACE_S old, so readers
+    that resolved them just before the swap can still open their files.
+    """
+    path = Path(path)
+    version_dir = path.parent / f".{path.name}.v{time.time_ns()}-{os.getpid()}"
+    os.replace(staged_dir, version_dir)
+    link = path.parent / f".{path.name}.link-{os.getpid()}"
+    if link.is_symlink():
+        link.unlink()
+    os.symlink(version_dir.name, link)
+    if path.is_dir() and not path.is_symlink():
+        # ✅ A table written before versioned directories: moved aside once (the only non-atomic step)
+        os.replace(path, path.parent / f".{path.name}.v0-{os.getpid()}")
+    os.replace(link, path)
+
+    current = os.readlink(path)
+    for old in path.parent.glob(f".{path.name}.v*"):
+        age = time.time() - old.stat().st_mtime if old.exists() else 0
+        if old.name not in (current, version_dir.name) and age > VERSION_GRACE_S:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def publish_table(table, tmp_dir, meta):
+    """
+    Write the manifest into a staging directory and atomically swap it in as the table's cache.
+    """
+    with open(Path(tmp_dir) / "_meta.json", "w") as f:
+        json.dump(meta, f)
+    swap_in(_table_dir(table), tmp_dir)
+    return meta
+
+
+def ingest(tables=None, force=False):
+    """
+    One-time conversion of data/*.csv into the typed columnar cache.
+    Only tables whose CSV changed since the last ingest are rebuilt.
+    """
+    rebuilt = []
+    for table in tables or TABLES:
+        meta = _read_meta(table)
+        if not force and not _is_stale(table, meta):
+            continue
+        source = _source_path(table)
+        if not source.exists():
+            if meta is None:
+                raise FileNotFoundError(f"No CSV or columnar cache for table '{table}' in {DATA_DIR}")
+            continue
+        schema = SCHEMAS.get(table, {})
+        read_dtypes = {c: t for c, t in schema.items() if t in ("str", "category")}
+        df = pd.read_csv(source, dtype={c: "string" if t == "str" else t for c, t in read_dtypes.items()})
+        write_table(table, df, source=source)
+        rebuilt.append(table)
+    return rebuilt
+
+
+def table_meta(table):
+    """
+    Return the manifest of a table, (re)building its cache first if the CSV changed.
+    """
+    meta = _read_meta(table)
+    if _is_stale(table, meta):
+        ingest([table])
+        meta = _read_meta(table)
+    return meta
+
+
+def source_fingerprint(tables=None):
+    """
+    Cheap identity of the data behind `tables`: the CSV's (mtime, size) when there is one,
+    otherwise the cache manifest's. Changes whenever the underlying data changes.
+    """
+    fingerprint = {}
+    for table in tables or TABLES:
+        path = _source_path(table)
+        # ✅ A table written straight to the columnar format is identified by its manifest, even if a CSV exists
+        if not path.exists() or (_read_meta(table) or {}).get("source", "") is None:
+            path = _table_dir(table) / "_meta.json"
+        stat = path.stat() if path.exists() else None
+        fingerprint[table] = (stat.st_mtime_ns, stat.st_size) if stat else None
+    return fingerprint
+
+
+def load_arrays(table, columns=None, nrows=None, decode=True):
+    """
+    Memory-map the requested columns of a table and return {column: array}.
+    Only the first `nrows` rows are exposed; pages outside that slice are never read.
+    Categorical columns come back as pd.Categorical (or as their raw integer codes when
+    `decode` is False), everything else as a (read-only) ndarray.
+    """
+    table_meta(table)
+    # ✅ Resolve the current version once, so a concurrent publish cannot mix files of two versions
+    table_dir = _table_dir(table).resolve()
+    meta = _read_meta(table, table_dir)
+    columns = list(meta["columns"]) if columns is None else list(columns)
+
+    missing = set(columns) - set(meta["columns"])
+    if missing:
+        raise ValueError(f"Unknown columns for table '{table}': {missing}")
+
+    arrays = {}
+    for column in columns:
+        values = np.load(table_dir / f"{column}.npy", mmap_mode="r")
+        if nrows is not None:
+            values = values[:nrows]
+        column_meta = meta["columns"][column]
+        if column_meta["kind"] == "category" and decode:
+            values = pd.Categorical.from_codes(np.asarray(values), categories=column_meta["categories"])
+        arrays[column] = values
+    return arrays
+
+
+def load_table(table, columns=None, nrows=None):
+    """
+    Load a table as a DataFrame, pushing the column projection and row limit down to the reader.
+    """
+    arrays = load_arrays(table, columns=columns, nrows=nrows)
+    return pd.DataFrame({column: np.asarray(values) if isinstance(values, np.memmap) else values
+                         for column, values in arrays.items()})
+
+
+def load_data(columns=None, nrows=TRANSACTIONS_ROW_LIMIT):
+    """
+    Load users, suppliers, warehouses, products and transactions from the columnar cache.
+    `columns` optionally maps a table name to the columns to read; `nrows` limits the
+    transactions read (None reads all of them).
+    """
+    columns = columns or {}
+    with span("load_data") as stage:
+        users = load_table("users", columns.get("users"))
+        suppliers = load_table("suppliers", columns.get("suppliers"))
+        warehouses = load_table("warehouses", columns.get("warehouses"))
+        products = load_table("products", columns.get("products"))
+        transactions = load_table("transactions", columns.get("transactions"), nrows=nrows)
+        stage.rows_out = len(transactions)
     return users, suppliers, warehouses, products, transactions
+
+
+if __name__ == "__main__":
+    rebuilt = ingest(force="--force" in sys.argv)
+    print(f"✅ Columnar cache up to date in {CACHE_DIR} (rebuilt: {', '.join(rebuilt) or 'none'})")
@@ -0,0 +1,119 @@
+"""
+Categorical encoding shared by training, batch scoring and the API.
+
+A Vocabulary is an ordered list of categories; a value's code is its position, and values outside
+the vocabulary get the reserved code UNSEEN (-1, the same code pandas and the columnar cache use
+for missing values). Vocabularies are fitted once (normally taken from the columnar cache, which
+assigned the codes at ingest time) and persisted in the model manifest's params, so training and
+serving always agree on the codes.
+
+    encoders = Encoders.from_params(model.manifest["params"]["encoders"])
+    df = encoders.transform(df)                               # whole columns, vectorised
+    code = encoders["payment_method"].code("PayPal")          # one value, a dict lookup
+"""
+import numpy as np
+import pandas as pd
+
+# ✅ Code of values outside the vocabulary (and of missing values)
+UNSEEN = -1
+
+
+class Vocabulary:
+    """
+    Ordered categories of one column with vectorised and single-value encoding.
+    """
+
+    def __init__(self, categories):
+        self.categories = list(categories)
+        self._index = pd.Index(self.categories)
+        self._codes = {value: code for code, value in enumerate(self.categories)}
+
+    @classmethod
+    def fit(cls, values):
+        """
+        Vocabulary of the distinct non-missing values, sorted (the order LabelEncoder used).
+        """
+        return cls(pd.Categorical(values).categories)
+
+    def __len__(self):
+        return len(self.categories)
+
+    def code(self, value):
+        """
+        Code of a single value (per-request fast path).
+        """
+        return self._codes.get(value, UNSEEN)
+
+    def remap(self, categories):
+        """
+        Array translating codes of another vocabulary (`categories`) into codes of this one.
+        Index it with the other codes; the extra last entry sends their UNSEEN (-1) to UNSEEN.
+        """
+        return np.append(self._index.get_indexer(pd.Index(list(categories))), UNSEEN).astype(np.int32)
+
+    def encode(self, values):
+        """
+        Codes (int32) of a column: a hash lookup per distinct value, no string conversion. Categorical
+        input is translated code-to-code, which is free when it already uses this vocabulary.
+        """
+        values = values.array if isinstance(values, pd.Series) else values
+        if isinstance(values, pd.Categorical):
+            if list(values.categories) == self.categories:
+                return values.codes.astype(np.int32)
+            return self.remap(values.categories)[values.codes]
+        return self._index.get_indexer(pd.Index(values)).astype(np.int32)
+
+
+class Encoders:
+    """
+    {column: Vocabulary} for the coded columns of a model.
+    """
+
+    def __init__(self, vocabularies=None):
+        self.vocabularies = dict(vocabularies or {})
+
+    def __getitem__(self, column):
+        return self.vocabularies[column]
+
+    def __contains__(self, column):
+        return column in self.vocabularies
+
+    def __iter__(self):
+        return iter(self.vocabularies)
+
+    def __len__(self):
+        return len(self.vocabularies)
+
+    @classmethod
+    def fit(cls, df, columns):
+        return cls({column: Vocabulary.fit(df[column]) for column in columns if column in df.columns})
+
+    def transform(self, df):
+        """
+        Copy of `df` with every known column replaced by its codes.
+        """
+        df = df.copy()
+        for column, vocabulary in self.vocabularies.items():
+            if column in df.columns:
+                df[column] = vocabulary.encode(df[column])
+        return df
+
+    def to_params(self):
+        """
+        JSON-serialisable form, stored in the model manifest's params under "encoders".
+        """
+        return {column: [str(value) for value in vocabulary.categories]
+                for column, vocabulary in self.vocabularies.items()}
+
+    @classmethod
+    def from_params(cls, params):
+        return cls({column: Vocabulary(categories) for column, categories in (params or {}).items()})
+
+
+def table_vocabulary(table, column):
+    """
+    Vocabulary the columnar cache assigned to a categorical column at ingest time.
+    """
+    from data_loader import table_meta
+
+    return Vocabulary(table_meta(table)["columns"][column]["categories"])
@@ -1,9 +1,190 @@
 from sklearn.preprocessing import MinMaxScaler
+import numpy as np
 import pandas as pd
 
-def preprocess_data(transactions):
+
+# ✅ Stride between products in the (product, day) sort key
+_DAY_STRIDE = np.int64(1 << 32)
+
+
+class DemandSeries:
+    """
+    Daily quantity per product stored sparsely (CSR): for product row i, days[indptr[i]:indptr[i + 1]]
+    are the time_idx values with sales and quantity[...] the units sold on those days.
+    Memory is O(number of (product, day) pairs with sales), never O(products x days).
+    """
+
+    def __init__(self, product_ids, indptr, days, quantity, start_date):
+        self.product_ids = np.asarray(product_ids, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.days = np.asarray(days, dtype=np.int32)
+        self.quantity = np.asarray(quantity, dtype=np.float32)
+        self.start_date = pd.Timestamp(start_date)
+
+    @property
+    def nnz(self):
+        return len(self.days)
+
+    @property
+    def n_days(self):
+        return int(self.days.max()) + 1 if self.nnz else 0
+
+    @classmethod
+    def from_arrays(cls, product_ids, dates, quantities, start_date=None):
+        """
+        Aggregate raw (product_id, date, quantity) rows into daily totals per product.
+        """
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        start_date = np.datetime64(pd.Timestamp(start_date).date()) if start_date is not None else dates.min()
+        days = (dates - start_date).astype(np.int64)
+        if len(days) and days.min() < 0:
+            raise ValueError("Transactions before the series start date cannot be appended.")
+
+        unique_products, product_rows = np.unique(np.asarray(product_ids, dtype=np.int64), return_inverse=True)
+        keys, key_rows = np.unique(product_rows.astype(np.int64) * _DAY_STRIDE + days, return_inverse=True)
+        quantity = np.bincount(key_rows, weights=np.asarray(quantities, dtype=np.float64), minlength=len(keys))
+
+        key_products = keys // _DAY_STRIDE
+        indptr = np.searchsorted(key_products, np.arange(len(unique_products) + 1))
+        return cls(unique_products, indptr, keys % _DAY_STRIDE, quantity, pd.Timestamp(start_date))
+
+    @classmethod
+    def from_transactions(cls, transactions, start_date=None):
+        return cls.from_arrays(transactions["product_id"].to_numpy(),
+                               pd.to_datetime(transactions["transaction_date"]).to_numpy(),
+                               transactions["quantity"].to_numpy(), start_date=start_date)
+
+    def _keys(self, product_ids):
+        """
+        (product rank in `product_ids`, day) sort keys of every stored entry.
+        """
+        ranks = np.searchsorted(product_ids, self.product_ids)
+        counts = np.diff(self.indptr)
+        return np.repeat(ranks.astype(np.int64), counts) * _DAY_STRIDE + self.days
+
+    @classmethod
+    def merge(cls, parts, start_date=None):
+        """
+        One series summing several series with the same start date (e.g. per-chunk aggregates):
+        their entries are concatenated, sorted once (each part is already a sorted run) and equal
+        (product, day) keys are summed with np.add.reduceat, so the cost is linear in the entries.
+        """
+        start_date = parts[0].start_date if start_date is None else pd.Timestamp(start_date)
+        product_ids = np.unique(np.concatenate([part.product_ids for part in parts]))
+        keys = np.concatenate([part._keys(product_ids) for part in parts])
+        quantity = np.concatenate([part.quantity for part in parts]).astype(np.float64)
+        if len(keys):
+            order = np.argsort(keys, kind="stable")
+            keys, quantity = keys[order], quantity[order]
+            starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+            keys, quantity = keys[starts], np.add.reduceat(quantity, starts)
+
+        indptr = np.searchsorted(keys // _DAY_STRIDE, np.arange(len(product_ids) + 1))
+        return cls(product_ids, indptr, keys % _DAY_STRIDE, quantity, start_date)
+
+    def append(self, transactions=None, product_ids=None, dates=None, quantities=None):
+        """
+        Fold new transactions into the series in place. Only the new rows are aggregated, then merged
+        with the history in one pass; to fold in many chunks, merge() their series once instead.
+        """
+        if transactions is not None:
+            other = DemandSeries.from_transactions(transactions, start_date=self.start_date)
+        else:
+            other = DemandSeries.from_arrays(product_ids, dates, quantities, start_date=self.start_date)
+
+        merged = DemandSeries.merge([self, other], self.start_date)
+        self.product_ids, self.indptr, self.days, self.quantity = (merged.product_ids, merged.indptr, merged.days,
+                                                                   merged.quantity)
+        return self
+
+    def series(self, product_id, fill="zero", end_day=None):
+        """
+        Gap-filled daily series of one product from its first sale to `end_day` (default: its last sale).
+        fill="zero" treats days without sales as 0 units; fill="ffill" carries the last value forward
+        (within this product only).
+        """
+        row = np.searchsorted(self.product_ids, product_id)
+        if row >= len(self.product_ids) or self.product_ids[row] != product_id:
+            raise KeyError(f"No demand history for product {product_id}")
+        days = self.days[self.indptr[row]:self.indptr[row + 1]]
+        quantity = self.quantity[self.indptr[row]:self.indptr[row + 1]]
+        first_day = int(days[0])
+        end_day = int(days[-1]) if end_day is None else end_day
+
+        values = np.zeros(end_day - first_day + 1, dtype=np.float32)
+        values[days - first_day] = quantity
+        if fill == "ffill":
+            filled_from = np.zeros(len(values), dtype=np.int64)
+            filled_from[days - first_day] = days - first_day
+            values = values[np.maximum.accumulate(filled_from)]
+        return first_day, values
+
+    def to_dense(self, last_days=None):
+        """
+        (product x day) matrix with zero-filled gaps; `last_days` keeps only the most recent days,
+        so e.g. a forecasting window costs O(products x window) rather than the whole history.
+        """
+        n_days = self.n_days
+        first_day = 0 if last_days is None else max(0, n_days - last_days)
+        width = n_days - first_day
+        rows = np.repeat(np.arange(len(self.product_ids)), np.diff(self.indptr))
+        keep = self.days >= first_day
+        dense = np.zeros((len(self.product_ids), width), dtype=np.float32)
+        dense[rows[keep], self.days[keep] - first_day] = self.quantity[keep]
+        return dense
+
+    def to_frame(self, fill="zero"):
+        """
+        Long (time_idx, transaction_date, product_id, quantity) frame with each product's gaps filled
+        between its first sale and the last day of the data.
+        """
+        n_days = self.n_days
+        counts = np.diff(self.indptr)
+        has_sales = counts > 0
+        first_days = np.zeros(len(self.product_ids), dtype=np.int64)
+        first_days[has_sales] = self.days[self.indptr[:-1][has_sales]]
+        lengths = np.where(has_sales, n_days - first_days, 0)
+
+        rows = np.repeat(np.arange(len(self.product_ids)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        time_idx = np.repeat(first_days, lengths) + offsets
+
+        quantity = np.zeros(len(time_idx), dtype=np.float32)
+        entry_rows = np.repeat(np.arange(len(self.product_ids)), counts)
+        positions = (np.cumsum(lengths) - lengths)[entry_rows] + (self.days - first_days[entry_rows])
+        quantity[positions] = self.quantity
+        if fill == "ffill":
+            filled_from = np.full(len(quantity), -1, dtype=np.int64)
+            filled_from[positions] = positions
+            # ✅ Every series starts on a sale, so the running max never reaches into the previous product
+            quantity = quantity[np.maximum.accumulate(filled_from)]
+
+        return pd.DataFrame({
+            "time_idx": time_idx,
+            "transaction_date": self.start_date + pd.to_timedelta(time_idx, unit="D"),
+            "product_id": self.product_ids[rows].astype(str),
+            "quantity": quantity,
+        })
+
+    def save(self, path):
+        np.savez(path, product_ids=self.product_ids, indptr=self.indptr, days=self.days,
+                 quantity=self.quantity, start_date=np.datetime64(self.start_date.date()))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            return cls(saved["product_ids"], saved["indptr"], saved["days"], saved["quantity"],
+                       pd.Timestamp(saved["start_date"][()]))
+
+
+def preprocess_data(transactions, fill="zero"):
+    """
+    Daily (time_idx, transaction_date, product_id, quantity) series for every product.
+    Quantities are summed per product and day into a DemandSeries, and each product's gaps are
+    filled within its own series only (fill="zero" or "ffill"); the input frame is not modified.
+    """
     # Ensure all column names are stripped of extra spaces
-    transactions.columns = transactions.columns.str.strip()
+    transactions = transactions.rename(columns=lambda column: column.strip())
 
     # ✅ Check required columns
     required_columns = {"transaction_date", "product_id", "quantity"}
@@ -12,27 +193,14 @@ def preprocess_data(transactions):
         raise ValueError(f"Missing required columns: {missing_columns}")
 
     # ✅ Convert transaction_date to datetime
-    transactions["transaction_date"] = pd.to_datetime(transactions["transaction_date"], errors='coerce')
-    if transactions["transaction_date"].isna().any():
+    dates = pd.to_datetime(transactions["transaction_date"], errors='coerce')
+    if dates.isna().any():
         raise ValueError("Some transaction_date values could not be parsed.")
 
-    # ✅ Ensure product_id is treated as a string
-    transactions["product_id"] = transactions["product_id"].astype(str)
-
-    # ✅ Assign a numerical time index (important for TFT)
-    transactions = transactions.sort_values(by=["product_id", "transaction_date"])  # Ensure proper sorting
-    transactions["time_idx"] = (transactions["transaction_date"] - transactions["transaction_date"].min()).dt.days
-
-    # ✅ Ensure continuous time_idx sequence (prevents TFT errors)
-    full_time_idx = pd.DataFrame({"time_idx": range(transactions["time_idx"].min(), transactions["time_idx"].max() + 1)})
-    transactions = full_time_idx.merge(transactions, on="time_idx", how="left")
-
-    # ✅ Fill missing values using forward fill and backfill
-    transactions["product_id"] = transactions["product_id"].ffill().bfill()
-    transactions["quantity"] = transactions["quantity"].ffill().bfill()
-
-    # ✅ Keep necessary columns
-    time_series_data = transactions[["time_idx", "transaction_date", "product_id", "quantity"]]
+    # ✅ Aggregate straight into the sparse per-product series (O(nnz), no full-range merge)
+    series = DemandSeries.from_arrays(pd.to_numeric(transactions["product_id"]).to_numpy(),
+                                      dates.to_numpy(), transactions["quantity"].to_numpy())
+    time_series_data = series.to_frame(fill=fill)
 
     # ✅ Normalize `quantity` using MinMaxScaler
     scaler = MinMaxScaler()
@@ -41,3 +209,31 @@ def preprocess_data(transactions):
 
     # ✅ Return three values
     return time_series_data, time_series_scaled, scaler
+
+
+def build_demand_series(chunk_size=None, nrows=None):
+    """
+    DemandSeries over the transactions in the columnar cache: each chunk is aggregated on its own
+    and the chunk series are merged once at the end (linear in the number of entries).
+    """
+    from data_loader import load_arrays
+    from chunked_pipeline import iter_transaction_chunks, DEFAULT_CHUNK_SIZE
+
+    # ✅ Transactions are not date-ordered, so fix the day origin before the first chunk
+    start_date = load_arrays("transactions", ["transaction_date"], nrows=nrows)["transaction_date"].min()
+    parts = [DemandSeries(np.zeros(0), np.zeros(1), np.zeros(0), np.zeros(0), start_date)]
+    columns = ["product_id", "transaction_date", "quantity"]
+    for _, chunk in iter_transaction_chunks(columns, chunk_size or DEFAULT_CHUNK_SIZE, nrows):
+        parts.append(DemandSeries.from_arrays(chunk["product_id"], chunk["transaction_date"], chunk["quantity"],
+                                              start_date=start_date))
+    return DemandSeries.merge(parts, start_date)
+
+
+def build_demand_tensor(transactions):
+    """
+    Dense (product x day) matrix of units sold, on the same day-based time_idx as preprocess_data.
+    Returns (product_ids, start_date, demand) where demand[i, t] is the quantity of product_ids[i]
+    sold on day start_date + t; days without sales are 0. Accepts a transactions frame or a DemandSeries.
+    """
+    series = transactions if isinstance(transactions, DemandSeries) else DemandSeries.from_transactions(transactions)
+    return series.product_ids, series.start_date, series.to_dense()
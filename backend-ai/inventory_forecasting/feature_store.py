@@ -0,0 +1,208 @@
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from data_loader import CACHE_DIR, source_fingerprint, swap_in
+from chunked_pipeline import UserAggregates, iter_transaction_chunks, DEFAULT_CHUNK_SIZE
+
+# ✅ Snapshot location (derived data, lives next to the columnar cache)
+SNAPSHOT_DIR = CACHE_DIR / "feature_store"
+
+# ✅ Write a snapshot after this many online updates (0 disables)
+SNAPSHOT_EVERY = int(os.environ.get("FEATURE_STORE_SNAPSHOT_EVERY", 10000))
+
+# ✅ Largest user_id / product_id record() accepts: the arrays grow to the largest id seen
+MAX_USER_ID = int(os.environ.get("FEATURE_STORE_MAX_USER_ID", 10_000_000))
+MAX_PRODUCT_ID = int(os.environ.get("FEATURE_STORE_MAX_PRODUCT_ID", 10_000_000))
+
+USER_FEATURES = ["user_total_transactions", "user_total_spent", "avg_spent_per_transaction", "user_credibility"]
+PRODUCT_FEATURES = ["product_total_transactions", "product_total_quantity"]
+
+
+class FeatureStore:
+    """
+    Online aggregates for fraud features, held as arrays indexed by user_id / product_id.
+    record() folds in one transaction in O(1); lookups are a couple of array reads.
+    """
+
+    def __init__(self, users=None, product_count=None, product_quantity=None, fingerprint=None, updates=0,
+                 log_offset=0):
+        self.users = users or UserAggregates()
+        self.product_count = product_count if product_count is not None else np.zeros(0, dtype=np.int64)
+        self.product_quantity = product_quantity if product_quantity is not None else np.zeros(0, dtype=np.int64)
+        self.fingerprint = fingerprint
+        self.updates = updates
+        # ✅ Position in the transaction journal (transaction_log.py) these aggregates include
+        self.log_offset = log_offset
+        self._lock = threading.Lock()
+
+    def _grow_products(self, size):
+        if size > len(self.product_count):
+            size = max(size, int(len(self.product_count) * 1.5))
+            pad = size - len(self.product_count)
+            self.product_count = np.concatenate([self.product_count, np.zeros(pad, dtype=np.int64)])
+            self.product_quantity = np.concatenate([self.product_quantity, np.zeros(pad, dtype=np.int64)])
+
+    def update_batch(self, user_ids, product_ids, quantities, amounts):
+        """
+        Fold in a batch of transactions (vectorised with bincount).
+        """
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        with self._lock:
+            self.users.update(user_ids, amounts)
+            if len(product_ids):
+                size = int(product_ids.max()) + 1
+                self._grow_products(size)
+                self.product_count[:size] += np.bincount(product_ids, minlength=size)
+                self.product_quantity[:size] += np.bincount(
+                    product_ids, weights=np.asarray(quantities, dtype=np.float64), minlength=size
+                ).astype(np.int64)
+
+    def record(self, user_id, product_id, quantity, amount):
+        """
+        Fold in a single new transaction in O(1). Ids outside [0, MAX_*_ID] raise ValueError
+        (a negative id would index another entity's slot, a huge one allocate without bound).
+        """
+        user_id, product_id = int(user_id), int(product_id)
+        if not 0 <= user_id <= MAX_USER_ID:
+            raise ValueError(f"user_id must be between 0 and {MAX_USER_ID}, got {user_id}")
+        if not 0 <= product_id <= MAX_PRODUCT_ID:
+            raise ValueError(f"product_id must be between 0 and {MAX_PRODUCT_ID}, got {product_id}")
+        with self._lock:
+            self.users.add(user_id, float(amount))
+            self._grow_products(product_id + 1)
+            self.product_count[product_id] += 1
+            self.product_quantity[product_id] += int(quantity)
+            self.updates += 1
+        if SNAPSHOT_EVERY and self.updates % SNAPSHOT_EVERY == 0:
+            self.snapshot()
+
+    def user_features(self, user_id):
+        """
+        {feature: value} for USER_FEATURES; zeros for a user with no history.
+        """
+        user_id = int(user_id)
+        if user_id < 0 or user_id >= len(self.users.count):
+            count, spent = 0.0, 0.0
+        else:
+            count, spent = float(self.users.count[user_id]), float(self.users.spent[user_id])
+        return {
+            "user_total_transactions": count,
+            "user_total_spent": spent,
+            "avg_spent_per_transaction": spent / count if count else 0.0,
+            "user_credibility": count / spent if spent else 0.0,
+        }
+
+    def product_features(self, product_id):
+        product_id = int(product_id)
+        if product_id < 0 or product_id >= len(self.product_count):
+            return {"product_total_transactions": 0.0, "product_total_quantity": 0.0}
+        return {
+            "product_total_transactions": float(self.product_count[product_id]),
+            "product_total_quantity": float(self.product_quantity[product_id]),
+        }
+
+    def snapshot(self, path=SNAPSHOT_DIR):
+        """
+        Write the arrays as .npy files (swapped in atomically) for a fast restart.
+        """
+        with self._lock:
+            arrays = {
+                "user_count": self.users.count.copy(),
+                "user_spent": self.users.spent.copy(),
+                "product_count": self.product_count.copy(),
+                "product_quantity": self.product_quantity.copy(),
+            }
+            meta = {"fingerprint": self.fingerprint, "updates": self.updates, "log_offset": self.log_offset}
+        write_snapshot(path, arrays, meta)
+
+    @classmethod
+    def load(cls, path=SNAPSHOT_DIR):
+        arrays, meta = read_snapshot(path)
+        users = UserAggregates()
+        users.count = arrays["user_count"]
+        users.spent = arrays["user_spent"]
+        return cls(
+            users=users,
+            product_count=arrays["product_count"],
+            product_quantity=arrays["product_quantity"],
+            fingerprint=meta["fingerprint"],
+            updates=meta["updates"],
+            log_offset=meta.get("log_offset", 0),
+        )
+
+
+def write_snapshot(path, arrays, meta):
+    """
+    Write {name: array} as .npy files plus a _meta.json into `path`, swapped in atomically.
+    """
+    path = os.fspath(path)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), values)
+    with open(os.path.join(tmp_path, "_meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    # ✅ Several processes (api/serve.py workers) may publish at once: the last writer wins
+    swap_in(path, tmp_path)
+
+
+def read_snapshot(path):
+    """
+    ({name: array}, meta) written by write_snapshot.
+    """
+    # ✅ One version throughout, even if a new snapshot is swapped in meanwhile
+    path = os.path.realpath(path)
+    with open(os.path.join(path, "_meta.json")) as f:
+        meta = json.load(f)
+    arrays = {name[:-4]: np.load(os.path.join(path, name)) for name in os.listdir(path) if name.endswith(".npy")}
+    return arrays, meta
+
+
+def read_snapshot_meta(path):
+    """
+    The _meta.json of the snapshot in `path` ({} if there is none).
+    """
+    meta_path = os.path.join(path, "_meta.json")
+    if not os.path.exists(meta_path):
+        return {}
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def snapshot_matches(path, fingerprint):
+    """
+    True if `path` holds a snapshot built from the data identified by `fingerprint`.
+    """
+    meta = read_snapshot_meta(path)
+    if not meta:
+        return False
+    # ✅ JSON turns the (mtime, size) tuples into lists
+    return json.loads(json.dumps(fingerprint)) == meta.get("fingerprint")
+
+
+def build_feature_store(chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Build the store from every transaction in the columnar cache, one chunk at a time.
+    """
+    store = FeatureStore(fingerprint=source_fingerprint(["transactions"]))
+    columns = ["user_id", "product_id", "quantity", "total_price"]
+    for _, chunk in iter_transaction_chunks(columns, chunk_size):
+        store.update_batch(chunk["user_id"], chunk["product_id"], chunk["quantity"], chunk["total_price"])
+    return store
+
+
+def load_or_build_feature_store(path=SNAPSHOT_DIR):
+    """
+    Restore the last snapshot if it was built from the current transactions, otherwise rebuild it.
+    """
+    if snapshot_matches(path, source_fingerprint(["transactions"])):
+        return FeatureStore.load(path)
+    store = build_feature_store()
+    store.snapshot(path)
+    return store
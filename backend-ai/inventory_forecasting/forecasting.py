@@ -0,0 +1,65 @@
+import numpy as np
+
+# ✅ Days of history fed to the model and days forecast in one shot
+DEFAULT_WINDOW = 30
+DEFAULT_HORIZON = 14
+
+# ✅ Products forecast per model call
+FORECAST_BATCH_SIZE = 4096
+
+
+def product_scale(demand):
+    """
+    Per-product scale (mean daily demand) so one model can be shared across products of any volume.
+    """
+    return np.maximum(demand.mean(axis=1), 1e-3).astype(np.float32)
+
+
+def last_window(demand, window):
+    """
+    The last `window` days of every series, left-padded with zeros when history is shorter.
+    """
+    if demand.shape[1] >= window:
+        return demand[:, -window:]
+    return np.pad(demand, ((0, 0), (window - demand.shape[1], 0)))
+
+
+def forecast_all(model, demand, window=DEFAULT_WINDOW, horizon=DEFAULT_HORIZON, batch_size=FORECAST_BATCH_SIZE):
+    """
+    Forecast the next `horizon` days for every product at once.
+    The model maps a (products, window, 1) batch of scaled history directly to (products, horizon),
+    so this is a handful of batched calls instead of one call per product per day.
+    """
+    scale = product_scale(demand)
+    inputs = (last_window(demand, window) / scale[:, None])[..., np.newaxis].astype(np.float32)
+    outputs = model.predict(inputs, batch_size=batch_size, verbose=0)
+    return np.clip(outputs[:, :horizon] * scale[:, None], 0, None).astype(np.float32)
+
+
+class DemandForecasts:
+    """
+    Precomputed (product x horizon) forecasts with an id -> row index for O(1) lookups.
+    """
+
+    def __init__(self, product_ids, forecast, version=None):
+        self.version = version
+        self.product_ids = np.asarray(product_ids, dtype=np.int64)
+        self.forecast = forecast
+        self.horizon = forecast.shape[1]
+        self.index = np.full(int(self.product_ids.max()) + 1 if len(self.product_ids) else 1, -1, dtype=np.int64)
+        self.index[self.product_ids] = np.arange(len(self.product_ids))
+        self._total = np.asarray(forecast.sum(axis=0))
+
+    def for_product(self, product_id, horizon):
+        """
+        Forecast of one product for the next `horizon` days, or None if it has no history.
+        """
+        if product_id < 0 or product_id >= len(self.index) or self.index[product_id] < 0:
+            return None
+        return np.asarray(self.forecast[self.index[product_id], :horizon])
+
+    def total(self, horizon):
+        """
+        Forecast summed over all products for the next `horizon` days.
+        """
+        return self._total[:horizon]
@@ -0,0 +1,304 @@
+"""
+Post-training compression of the pricing forest.
+
+Candidates are built from the compiled node tables (compiled_forest.CompiledForest):
+greedy tree selection by validation MAE, a depth cap and merging of sibling leaves with
+near-equal values, plus optional distillation of the forest into a HistGradientBoosting
+model or a small MLP. Every candidate is scored on held-out rows for MAE, size and
+latency, and the smallest one within the MAE tolerance is registered as the new
+"pricing" version.
+
+    python forest_compression.py                      # compress the latest pricing model
+    python forest_compression.py --distill hgb mlp --tolerance 0.02
+"""
+import argparse
+import pickle
+import time
+
+import numpy as np
+
+from compiled_forest import CompiledForest, FOREST_PREFIX
+from model_registry import save_artifacts
+
+# ✅ Accepted MAE increase over the full forest (relative), when picking the variant to serve
+DEFAULT_TOLERANCE = 0.01
+# ✅ Depth caps tried on the selected trees
+DEPTH_CAPS = (16, 12, 8)
+# ✅ Sibling leaves whose values differ by at most this much (log price) are merged
+LEAF_MERGE_TOLERANCE = 0.01
+# ✅ Validation rows used for selection and scoring / training rows used for distillation
+MAX_VALIDATION_ROWS = 20_000
+MAX_DISTILL_ROWS = 200_000
+# ✅ Rows per request in the batch latency measurement
+LATENCY_BATCH = 256
+DISTILLERS = ["hgb", "mlp"]
+
+
+def tree_predictions(forest, X):
+    """
+    (trees, rows) prediction of every tree of a regression forest.
+    """
+    return forest.value[forest.leaves(X), 0].T.astype(np.float32)
+
+
+def select_trees(forest, X, y, max_trees=None, tolerance=0.0):
+    """
+    Greedy forward selection: repeatedly add the tree that lowers the MAE of the running mean
+    the most, until the subset is within `tolerance` of the full forest's MAE (or max_trees).
+    Returns the selected tree indices (in selection order) and the MAE after each addition.
+    """
+    y = np.asarray(y, dtype=np.float32)
+    predictions = tree_predictions(forest, X)
+    target = np.abs(predictions.mean(axis=0) - y).mean() * (1 + tolerance)
+    max_trees = min(max_trees or forest.n_trees, forest.n_trees)
+
+    chosen, history = [], []
+    available = np.ones(forest.n_trees, dtype=bool)
+    total = np.zeros(len(y), dtype=np.float32)
+    for size in range(1, max_trees + 1):
+        mae = np.abs((total + predictions) / size - y).mean(axis=1)
+        mae[~available] = np.inf
+        best = int(np.argmin(mae))
+        chosen.append(best)
+        history.append(float(mae[best]))
+        available[best] = False
+        total += predictions[best]
+        if mae[best] <= target:
+            break
+    return np.array(chosen), np.array(history)
+
+
+def _prune(forest, left, right, roots):
+    """
+    New forest with only the nodes reachable from `roots`, renumbered in their original order
+    (a tree's nodes stay contiguous).
+    """
+    reachable = np.zeros(len(left), dtype=bool)
+    frontier = np.unique(roots)
+    while frontier.size:
+        reachable[frontier] = True
+        children = np.concatenate([left[frontier], right[frontier]])
+        frontier = np.unique(children[~reachable[children]])
+
+    keep = np.flatnonzero(reachable)
+    new_id = np.full(len(left), -1, dtype=np.int32)
+    new_id[keep] = np.arange(len(keep), dtype=np.int32)
+    is_leaf = left[keep] == keep
+    return CompiledForest(
+        np.where(is_leaf, 0, forest.feature[keep]).astype(np.int32),
+        np.where(is_leaf, 0, forest.threshold[keep]).astype(np.float32),
+        new_id[left[keep]],
+        new_id[right[keep]],
+        np.ascontiguousarray(forest.value[keep]),
+        np.sort(new_id[roots]),
+        classes=forest.classes,
+    )
+
+
+def subset_trees(forest, trees):
+    """
+    Forest made of the given trees only.
+    """
+    return _prune(forest, np.asarray(forest.left), np.asarray(forest.right), np.asarray(forest.roots)[np.sort(trees)])
+
+
+def node_depths(forest):
+    """
+    Depth of every node below its tree's root (unreachable nodes: -1).
+    """
+    left, right = np.asarray(forest.left), np.asarray(forest.right)
+    depth = np.full(len(left), -1, dtype=np.int32)
+    frontier, level = np.asarray(forest.roots, dtype=np.int64), 0
+    while frontier.size:
+        depth[frontier] = level
+        children = np.concatenate([left[frontier], right[frontier]])
+        frontier = np.unique(children[depth[children] < 0])
+        level += 1
+    return depth
+
+
+def cap_depth(forest, max_depth):
+    """
+    Turn every node at `max_depth` into a leaf. Internal nodes already hold the mean of the
+    training rows that reach them, so they predict exactly what a shallower tree would.
+    """
+    left, right = np.array(forest.left), np.array(forest.right)
+    cut = np.flatnonzero(node_depths(forest) >= max_depth)
+    left[cut] = cut
+    right[cut] = cut
+    return _prune(forest, left, right, np.asarray(forest.roots))
+
+
+def merge_leaves(forest, tolerance=LEAF_MERGE_TOLERANCE):
+    """
+    Collapse splits whose two children are leaves with values within `tolerance`, bottom-up until
+    no such split is left.
+    """
+    left, right = np.array(forest.left), np.array(forest.right)
+    nodes = np.arange(len(left))
+    value = np.asarray(forest.value)
+    while True:
+        is_leaf = left == nodes
+        mergeable = ~is_leaf & is_leaf[left] & is_leaf[right]
+        mergeable &= np.abs(value[left] - value[right]).max(axis=1) <= tolerance
+        if not mergeable.any():
+            break
+        left[mergeable] = nodes[mergeable]
+        right[mergeable] = nodes[mergeable]
+    return _prune(forest, left, right, np.asarray(forest.roots))
+
+
+def distill(predict, X, kind="hgb", seed=42):
+    """
+    Fit a small student model on the forest's own predictions of the training rows.
+    """
+    if kind == "hgb":
+        from sklearn.ensemble import HistGradientBoostingRegressor
+
+        student = HistGradientBoostingRegressor(max_iter=300, learning_rate=0.1, early_stopping=True, random_state=seed)
+    elif kind == "mlp":
+        from sklearn.neural_network import MLPRegressor
+
+        student = MLPRegressor(hidden_layer_sizes=(64, 32), early_stopping=True, max_iter=200, random_state=seed)
+    else:
+        raise ValueError(f"Unknown distillation model: {kind}")
+    return student.fit(X, predict(X))
+
+
+def _latency_ms(predict, X, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def measure(predict, size_bytes, X, y, repeats=20):
+    """
+    Held-out MAE, size and latency (one row / LATENCY_BATCH rows per call) of one variant.
+    """
+    return {
+        "mae": float(np.abs(predict(X) - np.asarray(y)).mean()),
+        "size_mb": round(size_bytes / 2 ** 20, 3),
+        "latency_row_ms": round(_latency_ms(predict, X[:1], repeats), 3),
+        "latency_batch_ms": round(_latency_ms(predict, X[:LATENCY_BATCH], max(repeats // 4, 1)), 3),
+    }
+
+
+def _sample(X, y, n, rng):
+    if len(X) <= n:
+        return X, y
+    rows = np.sort(rng.choice(len(X), n, replace=False))
+    return X[rows], np.asarray(y)[rows]
+
+
+def build_variants(forest, X_train, X_val, y_val, tolerance=DEFAULT_TOLERANCE, distill_kinds=(), seed=42):
+    """
+    Compressed candidates of `forest` with their measurements, as (name, variant, report) tuples.
+    The validation rows are halved: trees are selected on one half and every variant is scored
+    on the other, so the reported MAE is not biased by the selection.
+    """
+    rng = np.random.default_rng(seed)
+    X_val, y_val = _sample(np.asarray(X_val, dtype=np.float64), y_val, MAX_VALIDATION_ROWS, rng)
+    X_select, y_select, X_score, y_score = X_val[::2], y_val[::2], X_val[1::2], y_val[1::2]
+
+    forests = {"forest": forest}
+    trees, history = select_trees(forest, X_select, y_select, tolerance=tolerance)
+    selected = subset_trees(forest, trees)
+    print(f"🌲 Selected {len(trees)} of {forest.n_trees} trees (selection MAE {history[-1]:.4f})")
+    forests[f"select{len(trees)}"] = selected
+    forests[f"select{len(trees)}_merge"] = merge_leaves(selected)
+    for depth in DEPTH_CAPS:
+        if depth < selected.max_depth:
+            forests[f"select{len(trees)}_depth{depth}_merge"] = merge_leaves(cap_depth(selected, depth))
+
+    variants = [(name, variant, measure(variant.predict, variant.nbytes, X_score, y_score))
+                for name, variant in forests.items()]
+
+    X_distill, _ = _sample(np.asarray(X_train, dtype=np.float64), np.zeros(len(X_train)), MAX_DISTILL_ROWS, rng)
+    for kind in distill_kinds:
+        student = distill(forest.predict, X_distill, kind, seed=seed)
+        variants.append((f"distill_{kind}", student,
+                         measure(student.predict, len(pickle.dumps(student, protocol=5)), X_score, y_score)))
+    return variants
+
+
+def choose_variant(variants, tolerance=DEFAULT_TOLERANCE):
+    """
+    Smallest variant whose held-out MAE is within `tolerance` of the full forest (variants[0]).
+    """
+    limit = variants[0][2]["mae"] * (1 + tolerance)
+    eligible = [variant for variant in variants if variant[2]["mae"] <= limit]
+    return min(eligible, key=lambda variant: variant[2]["size_mb"])
+
+
+def print_report(variants, chosen=None):
+    print(f"{'variant':<28}{'MAE':>10}{'size MB':>10}{'row ms':>10}{f'{LATENCY_BATCH} rows ms':>14}")
+    for name, _, report in variants:
+        marker = "  ⬅" if name == chosen else ""
+        print(f"{name:<28}{report['mae']:>10.4f}{report['size_mb']:>10.2f}{report['latency_row_ms']:>10.2f}"
+              f"{report['latency_batch_ms']:>14.2f}{marker}")
+
+
+def compress_pricing(model, scaler, X, y, fingerprint=None, tolerance=DEFAULT_TOLERANCE, distill_kinds=()):
+    """
+    Compress a fitted pricing forest and register the chosen variant as the new "pricing" version;
+    returns its version, or None when no compressed variant is within the tolerance (nothing is
+    registered then). `model` is the sklearn forest or an already compiled CompiledForest; X, y are
+    the unscaled pricing features and target the model was fitted on (the training split is re-created).
+    """
+    from train_pricing import split_pricing, PRICING_FEATURES
+
+    forest = model if isinstance(model, CompiledForest) else CompiledForest.from_sklearn(model)
+    X_train, X_val, _, y_val = split_pricing(scaler.transform(X), np.asarray(y))
+    variants = build_variants(forest, X_train, X_val, y_val, tolerance=tolerance, distill_kinds=distill_kinds)
+    name, variant, report = choose_variant(variants, tolerance=tolerance)
+    print_report(variants, chosen=name)
+    if name == "forest":
+        print("⚠️ No compression accepted: every compressed variant exceeds the MAE tolerance")
+        return None
+
+    metrics = {"test_mae": report["mae"], "compression": {name: report for name, _, report in variants}}
+    params = {"variant": name}
+    if isinstance(variant, CompiledForest):
+        # ✅ Compiled variants are served from the node tables alone (compiled_forest.load_predictor)
+        artifacts = {"scaler": scaler, **variant.to_arrays()}
+        params.update(variant.params())
+    else:
+        artifacts = {"model": variant, "scaler": scaler}
+    return save_artifacts("pricing", artifacts, feature_names=PRICING_FEATURES, fingerprint=fingerprint,
+                          metrics=metrics, params=params)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compress the latest pricing model")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="accepted relative MAE increase over the full forest")
+    parser.add_argument("--distill", nargs="*", choices=DISTILLERS, default=[],
+                        help="also distill the forest into these student models")
+    parser.add_argument("--rows", type=int, default=None, help="transactions to score on (0 = all)")
+    args = parser.parse_args(argv)
+
+    from data_loader import load_data, TRANSACTIONS_ROW_LIMIT
+    from model_registry import LazyModel
+    from train_pricing import build_pricing_frame
+
+    handle = LazyModel("pricing")
+    if f"{FOREST_PREFIX}feature" in handle.manifest["artifacts"]:
+        model = CompiledForest.from_arrays(handle.get, handle.manifest["params"])
+    else:
+        model = handle.get("model")
+    rows = TRANSACTIONS_ROW_LIMIT if args.rows is None else args.rows or None
+    users, suppliers, warehouses, products, transactions = load_data(nrows=rows)
+    X, y = build_pricing_frame(transactions, products, suppliers, warehouses)
+    version = compress_pricing(model, handle.get("scaler"), X, y, fingerprint=handle.manifest["data_fingerprint"],
+                               tolerance=args.tolerance, distill_kinds=args.distill)
+    if version is None:
+        print(f"✅ Kept pricing model v{handle.version:04d}")
+    else:
+        print(f"✅ Saved compressed pricing model v{version:04d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Batch fraud scoring job with a persistent result cache.
+
+Transactions are scored in chunks across a process pool with the registered anomaly model: its
+scaler, its sklearn forest and the vocabularies its coded columns were trained with. Scores are
+written as a columnar table ("fraud_scores": transaction_id, fraud_prediction, fraud_probability,
+sorted by transaction_id) next to the data cache, so lookups are a binary search over a
+memory-mapped array. Later runs only score transactions that are not in the table yet; a new
+anomaly model version rescores everything.
+
+    python fraud_scoring.py                 # score new transactions
+    python fraud_scoring.py --full          # rescore everything
+    python fraud_scoring.py --workers 4 --chunk-size 50000
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CACHE_VERSION, load_arrays, table_meta, staging_dir, publish_table
+from chunked_pipeline import (ANOMALY_COLUMNS, ANOMALY_FEATURES, DEFAULT_CHUNK_SIZE, UserAggregates, anomaly_encoders,
+                              anomaly_features, scan_transactions)
+from encoding import Encoders, UNSEEN
+from instrumentation import span
+
+SCORES_TABLE = "fraud_scores"
+
+
+def read_scores():
+    """
+    {column: memory-mapped array} of the score table, or None before the first run.
+    """
+    try:
+        meta = table_meta(SCORES_TABLE)
+    except FileNotFoundError:
+        return None
+    return {**load_arrays(SCORES_TABLE), "meta": meta}
+
+
+def lookup(scores, transaction_ids):
+    """
+    (prediction, probability, found) for every id; rows that are not scored get -1 / NaN.
+    """
+    transaction_ids = np.asarray(transaction_ids).astype(str)
+    prediction = np.full(len(transaction_ids), -1, dtype=np.int8)
+    probability = np.full(len(transaction_ids), np.nan, dtype=np.float32)
+    if scores is None or not len(scores["transaction_id"]):
+        return prediction, probability, np.zeros(len(transaction_ids), dtype=bool)
+
+    ids = scores["transaction_id"]
+    positions = np.minimum(np.searchsorted(ids, transaction_ids), len(ids) - 1)
+    found = ids[positions] == transaction_ids
+    prediction[found] = scores["fraud_prediction"][positions[found]]
+    probability[found] = scores["fraud_probability"][positions[found]]
+    return prediction, probability, found
+
+
+class FraudScores:
+    """
+    Cached view of the score table for the API, re-opened when a scoring run published a new one.
+    """
+
+    def __init__(self):
+        self._scores = None
+        self._stamp = None
+
+    def _current(self):
+        from data_loader import CACHE_DIR
+
+        meta_path = CACHE_DIR / SCORES_TABLE / "_meta.json"
+        stamp = meta_path.stat().st_mtime_ns if meta_path.exists() else None
+        if stamp != self._stamp:
+            self._scores, self._stamp = (read_scores() if stamp is not None else None), stamp
+        return self._scores
+
+    @property
+    def meta(self):
+        scores = self._current()
+        return scores["meta"] if scores is not None else None
+
+    def lookup(self, transaction_ids):
+        return lookup(self._current(), transaction_ids)
+
+
+# ✅ Per-process scoring state, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(user_count, user_spent):
+    from catalog import build_catalog
+    from model_registry import LazyModel
+
+    handle = LazyModel("anomaly")
+    feature_names = handle.feature_names
+    # ✅ Models saved before their vocabularies were recorded were trained on the cache's codes
+    current = anomaly_encoders()
+    trained = Encoders.from_params(handle.manifest["params"].get("encoders")) or current
+
+    aggregates = UserAggregates()
+    aggregates.count, aggregates.spent = user_count, user_spent
+    # ✅ sklearn's predict_proba: at chunk sizes its per-tree C loops beat the compiled node tables
+    model = handle.get("model")
+    scaler = handle.get("scaler")
+    _worker.update({
+        "catalog": build_catalog(),
+        "aggregates": aggregates,
+        "feature_names": feature_names,
+        # ✅ Model feature order, as positions in ANOMALY_FEATURES (-1: not produced, filled with 0)
+        "positions": [ANOMALY_FEATURES.index(name) if name in ANOMALY_FEATURES else -1 for name in feature_names],
+        "remaps": {column: trained[column].remap(current[column].categories) for column in current if column in trained},
+        "scaler": scaler,
+        # ✅ Unknown products (NaN features) get the training mean, i.e. 0 after scaling
+        "fill": getattr(scaler, "mean_", getattr(scaler, "center_", np.zeros(len(feature_names)))),
+        "predict_proba": model.predict_proba,
+        "positive": int(np.flatnonzero(model.classes_ == 1)[0]) if 1 in list(model.classes_) else None,
+        "classes": np.asarray(model.classes_),
+    })
+
+
+def _score_rows(rows):
+    """
+    Score the transactions at the given row positions (runs in a pool worker).
+    """
+    arrays = load_arrays("transactions", ["transaction_id"] + ANOMALY_COLUMNS, decode=False)
+    chunk = {column: np.asarray(values[rows]) for column, values in arrays.items()}
+    X = anomaly_features(chunk, _worker["catalog"], _worker["aggregates"])
+
+    # ✅ Translate today's codes into the codes the model was trained with
+    for column, remap in _worker["remaps"].items():
+        index = ANOMALY_FEATURES.index(column)
+        codes = X[:, index]
+        X[:, index] = np.where(np.isnan(codes), np.nan, remap[np.nan_to_num(codes, nan=UNSEEN).astype(np.int64)])
+
+    matrix = np.zeros((len(rows), len(_worker["positions"])), dtype=np.float64)
+    for target, source in enumerate(_worker["positions"]):
+        if source >= 0:
+            matrix[:, target] = X[:, source]
+    missing = np.isnan(matrix)
+    if missing.any():
+        matrix[missing] = np.take(_worker["fill"], np.nonzero(missing)[1])
+
+    scaled = _worker["scaler"].transform(pd.DataFrame(matrix, columns=_worker["feature_names"]))
+    proba = _worker["predict_proba"](scaled)
+    prediction = _worker["classes"][np.argmax(proba, axis=1)].astype(np.int8)
+    positive = _worker["positive"]
+    probability = proba[:, positive] if positive is not None else np.zeros(len(rows))
+    return chunk["transaction_id"], prediction, probability.astype(np.float32)
+
+
+def write_scores(transaction_ids, prediction, probability, model_version):
+    """
+    Publish the score table (sorted by transaction_id) atomically, like any cached table.
+    """
+    order = np.argsort(transaction_ids, kind="stable")
+    columns = {"transaction_id": transaction_ids[order], "fraud_prediction": prediction[order],
+               "fraud_probability": probability[order]}
+    tmp_dir = staging_dir(SCORES_TABLE)
+    meta = {"version": CACHE_VERSION, "table": SCORES_TABLE, "rows": int(len(order)), "columns": {}, "source": None,
+            "model": "anomaly", "model_version": model_version, "scored_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    for column, values in columns.items():
+        np.save(tmp_dir / f"{column}.npy", values, allow_pickle=False)
+        meta["columns"][column] = {"kind": "str" if values.dtype.kind == "U" else "numeric", "dtype": str(values.dtype)}
+    return publish_table(SCORES_TABLE, tmp_dir, meta)
+
+
+def score_transactions(full=False, chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    """
+    Score every transaction that is not in the score table yet (all of them with `full`, or when
+    the anomaly model changed since the last run). Returns the number of transactions scored.
+    """
+    from model_registry import LazyModel
+
+    model_version = LazyModel("anomaly").version
+    previous = read_scores()
+    if previous is not None and previous["meta"].get("model_version") != model_version:
+        print(f"🔁 Anomaly model changed (v{previous['meta'].get('model_version')} -> v{model_version}), rescoring all")
+        full = True
+
+    transaction_ids = np.asarray(load_arrays("transactions", ["transaction_id"])["transaction_id"])
+    if full or previous is None:
+        previous = None
+        new_rows = np.arange(len(transaction_ids))
+    else:
+        _, _, found = lookup(previous, transaction_ids)
+        new_rows = np.flatnonzero(~found)
+    if not len(new_rows):
+        print("✅ No new transactions to score")
+        return 0
+
+    # ✅ User totals over all transactions; train.py trains the anomaly model on these full-data totals
+    # (whatever --rows it samples), and the API's feature store holds the same ones
+    with span("fraud_scoring.aggregates"):
+        aggregates, _, _ = scan_transactions(chunk_size)
+
+    tasks = [new_rows[start:start + chunk_size] for start in range(0, len(new_rows), chunk_size)]
+    with span("fraud_scoring.score", rows_in=len(new_rows)) as stage:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(aggregates.count, aggregates.spent)) as pool:
+            results = list(pool.map(_score_rows, tasks))
+        stage.rows_out = len(new_rows)
+
+    ids = np.concatenate([ids for ids, _, _ in results])
+    prediction = np.concatenate([prediction for _, prediction, _ in results])
+    probability = np.concatenate([probability for _, _, probability in results])
+    if previous is not None:
+        ids = np.concatenate([np.asarray(previous["transaction_id"]), ids])
+        prediction = np.concatenate([np.asarray(previous["fraud_prediction"]), prediction])
+        probability = np.concatenate([np.asarray(previous["fraud_probability"]), probability])
+    write_scores(ids, prediction, probability, model_version)
+    return len(new_rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score transactions with the anomaly model into the score cache")
+    parser.add_argument("--full", action="store_true", help="rescore every transaction")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    scored = score_transactions(full=args.full, chunk_size=args.chunk_size, workers=args.workers)
+    print(f"✅ Scored {scored:,} transactions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import asyncio
+import os
+import time
+import weakref
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from instrumentation import Counter as MetricCounter, Gauge, Histogram
+
+# ✅ Defaults, overridable through the environment
+MAX_BATCH_SIZE = int(os.environ.get("INFERENCE_MAX_BATCH_SIZE", 256))
+MAX_WAIT_MS = float(os.environ.get("INFERENCE_MAX_WAIT_MS", 2.0))
+WORKER_THREADS = int(os.environ.get("INFERENCE_WORKER_THREADS", min(4, os.cpu_count() or 1)))
+
+# ✅ One pool shared by every scheduler; tree ensembles release the GIL while predicting
+_executor = None
+
+# ✅ Live schedulers, for the queue depth gauge
+_schedulers = weakref.WeakSet()
+
+INFERENCE_SECONDS = Histogram("inference_batch_seconds", "Duration of one model predict call", ["model"])
+INFERENCE_ROWS = MetricCounter("inference_rows_total", "Rows scored by the model", ["model"])
+INFERENCE_BATCHES = MetricCounter("inference_batches_total", "Predict calls made", ["model"])
+INFERENCE_ERRORS = MetricCounter("inference_errors_total", "Predict calls that raised", ["model"])
+QUEUE_DEPTH = Gauge("inference_queue_depth", "Rows waiting for a micro-batch", ["model"],
+                    collect=lambda: {(scheduler.name,): scheduler.queue_depth for scheduler in list(_schedulers)})
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="inference")
+    return _executor
+
+
+class MicroBatcher:
+    """
+    Coalesces single-row inference requests into batches.
+
+    Callers `await submit(row)`; rows are queued and a background task drains the queue
+    into one matrix once `max_batch_size` rows are waiting or `max_wait_ms` has passed
+    since the first row arrived. `predict_fn(matrix)` runs in a worker pool so the event
+    loop stays free, and each caller's future is resolved with its own row of the result.
+    Up to `max_concurrency` batches (default: one per pool thread) run at once; the next
+    batch is collected while they do.
+    """
+
+    def __init__(self, name, predict_fn, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, executor=None,
+                 max_concurrency=None):
+        self.name = name
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = executor
+        self.max_concurrency = max_concurrency or getattr(executor, "_max_workers", None) or WORKER_THREADS
+        self._queue = None
+        self._task = None
+        self._slots = None
+        self._in_flight = set()
+        _schedulers.add(self)
+
+        # ✅ Metrics
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_batch_size = 0
+        self.batch_sizes = Counter()
+        self.busy_seconds = 0.0
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, row):
+        """
+        Queue one feature row and wait for its prediction.
+        """
+        if self._task is None:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        self.requests += 1
+        await self._queue.put((np.asarray(row, dtype=np.float64).ravel(), future))
+        return await future
+
+    async def run_batch(self, matrix):
+        """
+        Run an already-assembled matrix through the same worker pool, bypassing the queue.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor or get_executor(), self._predict, matrix)
+
+    def _predict(self, matrix):
+        """
+        predict_fn with the inference metrics (runs in the worker pool).
+        """
+        started = time.perf_counter()
+        try:
+            results = self.predict_fn(matrix)
+        except Exception:
+            INFERENCE_ERRORS.inc(model=self.name)
+            raise
+        INFERENCE_SECONDS.observe(time.perf_counter() - started, model=self.name)
+        INFERENCE_BATCHES.inc(model=self.name)
+        INFERENCE_ROWS.inc(len(matrix), model=self.name)
+        return results
+
+    async def _collect(self):
+        row, future = await self._queue.get()
+        batch = [(row, future)]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # ✅ Take whatever is already queued without waiting
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            remaining = deadline - time.monotonic()
+            if len(batch) >= self.max_batch_size or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            # ✅ Wait for a free pool slot first, so rows queued meanwhile join the next batch
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            # ✅ Drop callers that went away while queued
+            batch = [(row, future) for row, future in batch if not future.done()]
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, batch):
+        """
+        Run one batch in the worker pool and resolve its callers' futures (holds one slot).
+        """
+        try:
+            matrix = np.vstack([row for row, _ in batch])
+            self.batches += 1
+            self.last_batch_size = len(batch)
+            self.batch_sizes[len(batch)] += 1
+
+            started = time.perf_counter()
+            try:
+                results = await asyncio.get_running_loop().run_in_executor(
+                    self.executor or get_executor(), self._predict, matrix)
+            except Exception as e:
+                self.errors += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            finally:
+                self.busy_seconds += time.perf_counter() - started
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def metrics(self):
+        return {
+            "name": self.name,
+            "queue_depth": self.queue_depth,
+            "batches_in_flight": len(self._in_flight),
+            "max_concurrency": self.max_concurrency,
+            "requests": self.requests,
+            "batches": self.batches,
+            "errors": self.errors,
+            "last_batch_size": self.last_batch_size,
+            "mean_batch_size": (sum(size * n for size, n in self.batch_sizes.items()) / self.batches
+                                if self.batches else 0.0),
+            "batch_size_histogram": {str(size): n for size, n in sorted(self.batch_sizes.items())},
+            "busy_seconds": round(self.busy_seconds, 6),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
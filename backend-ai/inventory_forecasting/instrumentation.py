@@ -0,0 +1,267 @@
+"""
+Lightweight instrumentation: span timers for pipeline stages and Prometheus-style metrics.
+
+    with span("pricing.merge", rows_in=len(transactions)) as s:
+        transactions = transactions.merge(...)
+        s.rows_out = len(transactions)
+
+Every span records its duration, rows in / out and the change in resident memory, logs one
+structured line (logger "inventory.spans") and feeds the pipeline_stage_* metrics. Counters,
+gauges and histograms are rendered in the Prometheus text format by render() (served on /metrics).
+
+INVENTORY_METRICS=0 turns everything into no-ops (span() returns a shared null span and metric
+updates return immediately); INVENTORY_SPAN_LOG=0 keeps the metrics but silences the span log.
+"""
+import bisect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+ENABLED = os.environ.get("INVENTORY_METRICS", "1") != "0"
+SPAN_LOG = ENABLED and os.environ.get("INVENTORY_SPAN_LOG", "1") != "0"
+
+# ✅ Latency buckets in seconds (upper bounds; +Inf is implicit)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+                   60.0, 300.0)
+
+log = logging.getLogger("inventory.spans")
+if SPAN_LOG and not log.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("⏱️ %(message)s"))
+    log.addHandler(_handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+
+_registry = []
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _label_text(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key)) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def samples(self):
+        with self._lock:
+            return [(f"{self.name}{self._label_text(key)}", value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name} {_number(value)}" for name, value in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """
+    Gauge set directly, or read from `collect()` ({label values tuple: value}) at render time.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), collect=None):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def set(self, value, **labels):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        if self.collect is None:
+            return super().samples()
+        return [(f"{self.name}{self._label_text(tuple(map(str, key)))}", value)
+                for key, value in sorted(self.collect().items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += count
+                    samples.append((f"{self.name}_bucket{self._label_text(key, ('le', _number(bound)))}", cumulative))
+                samples.append((f"{self.name}_sum{self._label_text(key)}", total))
+                samples.append((f"{self.name}_count{self._label_text(key)}", cumulative))
+        return samples
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) and not float(value).is_integer() else str(int(value))
+
+
+def render():
+    """
+    Every registered metric in the Prometheus text exposition format.
+    """
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# ✅ Pipeline stage metrics, fed by span()
+STAGE_SECONDS = Histogram("pipeline_stage_seconds", "Duration of instrumented pipeline stages", ["stage"])
+STAGE_ROWS = Counter("pipeline_stage_rows_total", "Rows produced by instrumented pipeline stages", ["stage"])
+
+
+def current_rss_bytes():
+    """
+    Current resident set size (Linux /proc; elsewhere the peak RSS is the closest cheap proxy).
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Span:
+    """
+    Timer for one stage; set `rows_out` (and optionally `rows_in`) inside the block.
+    """
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.seconds = None
+
+    def __enter__(self):
+        self._rss = current_rss_bytes()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._start
+        memory_delta = current_rss_bytes() - self._rss
+        STAGE_SECONDS.observe(self.seconds, stage=self.name)
+        if self.rows_out is not None:
+            STAGE_ROWS.inc(self.rows_out, stage=self.name)
+        if SPAN_LOG:
+            record = {"span": self.name, "seconds": round(self.seconds, 4), "rows_in": self.rows_in,
+                      "rows_out": self.rows_out, "memory_delta_mb": round(memory_delta / 2 ** 20, 2)}
+            if exc_type is not None:
+                record["error"] = exc_type.__name__
+            log.info(json.dumps(record))
+        return False
+
+
+class _NullSpan:
+    rows_in = rows_out = seconds = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, rows_in=None):
+    """
+    Context manager timing one stage (a shared no-op when instrumentation is disabled).
+    """
+    if not ENABLED:
+        return _NULL_SPAN
+    return Span(name, rows_in)
+
+
+# ✅ HTTP request metrics, fed by RequestMetricsMiddleware
+REQUEST_SECONDS = Histogram("http_request_seconds", "Latency of HTTP requests", ["method", "route", "status"])
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled")
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording the latency of every HTTP request by method, route template and
+    status (the response is passed through untouched).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        self.in_flight += 1
+        REQUESTS_IN_FLIGHT.set(self.in_flight)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.in_flight -= 1
+            REQUESTS_IN_FLIGHT.set(self.in_flight)
+            # ✅ Route template (e.g. /recommend/{user_id}) keeps the label set bounded
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(time.perf_counter() - started, method=scope["method"],
+                                    route=getattr(route, "path", "unmatched"), status=status)
@@ -1,6 +1,6 @@
-from predict import predicted_demand
+from predict import get_predicted_demand
 from visualize import plot_predictions
 from data_loader import load_data
 
 users, suppliers, warehouses, products, transactions = load_data()
-plot_predictions(predicted_demand, transactions)
+plot_predictions(get_predicted_demand(), transactions)
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import platform
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from data_loader import source_fingerprint
+
+# ✅ Versioned artifacts live in backend-ai/models/<name>/v0001, v0002, ...
+MODELS_DIR = Path(os.environ.get("INVENTORY_MODELS_DIR", Path(__file__).resolve().parent.parent / "models"))
+
+# ✅ joblib mmap_mode used when serving ("r" to memory-map large arrays, "" to load into RAM)
+MMAP_MODE = os.environ.get("INVENTORY_MODEL_MMAP", "r") or None
+
+
+def data_fingerprint(tables=None, **params):
+    """
+    Short hash identifying the training data (source files + any parameters such as a row limit).
+    """
+    payload = json.dumps({"sources": source_fingerprint(tables), "params": params}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def _model_dir(name):
+    return MODELS_DIR / name
+
+
+def _version_dir(name, version):
+    return _model_dir(name) / f"v{version:04d}"
+
+
+def latest_version(name):
+    """
+    Version number the LATEST pointer of `name` refers to, or None if nothing was saved yet.
+    """
+    pointer = _model_dir(name) / "LATEST"
+    if not pointer.exists():
+        return None
+    return int(pointer.read_text().strip())
+
+
+def _is_keras_model(obj):
+    return type(obj).__module__.startswith(("keras", "tensorflow")) and hasattr(obj, "save")
+
+
+def save_artifacts(name, artifacts, feature_names=None, fingerprint=None, metrics=None, params=None):
+    """
+    Write a new version of model `name` and point LATEST at it.
+
+    `artifacts` maps an artifact key to the object to store: NumPy arrays are saved as .npy
+    (so they can be memory-mapped), Keras models in the native .keras format and everything
+    else (estimators, scalers, encoders) with joblib. The manifest records the feature names
+    the model expects and the fingerprint of the data it was trained on.
+    """
+    import joblib
+
+    model_dir = _model_dir(name)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    version = (latest_version(name) or 0) + 1
+    while _version_dir(name, version).exists():
+        version += 1
+
+    tmp_dir = model_dir / f".v{version:04d}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir()
+
+    manifest = {
+        "name": name,
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "feature_names": list(feature_names) if feature_names is not None else None,
+        "data_fingerprint": fingerprint,
+        "metrics": metrics or {},
+        "params": params or {},
+        "artifacts": {},
+    }
+
+    for key, obj in artifacts.items():
+        if isinstance(obj, np.ndarray):
+            filename = f"{key}.npy"
+            np.save(tmp_dir / filename, obj, allow_pickle=False)
+            fmt = "npy"
+        elif _is_keras_model(obj):
+            filename = f"{key}.keras"
+            obj.save(tmp_dir / filename)
+            fmt = "keras"
+        else:
+            filename = f"{key}.joblib"
+            joblib.dump(obj, tmp_dir / filename)
+            fmt = "joblib"
+        manifest["artifacts"][key] = {"file": filename, "format": fmt}
+
+    with open(tmp_dir / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2, default=str)
+
+    os.replace(tmp_dir, _version_dir(name, version))
+
+    # ✅ Flip LATEST atomically so readers never see a half-written version
+    pointer_tmp = model_dir / f".LATEST.tmp-{os.getpid()}"
+    pointer_tmp.write_text(str(version))
+    os.replace(pointer_tmp, model_dir / "LATEST")
+    return version
+
+
+def load_manifest(name, version=None):
+    version = version or latest_version(name)
+    if version is None:
+        raise FileNotFoundError(f"No saved versions of model '{name}' in {MODELS_DIR}")
+    with open(_version_dir(name, version) / "manifest.json") as f:
+        return json.load(f)
+
+
+def load_artifact(name, key, version=None, mmap_mode=MMAP_MODE, manifest=None):
+    """
+    Load one artifact of model `name` (latest version unless `version` is given).
+    """
+    manifest = manifest or load_manifest(name, version)
+    entry = manifest["artifacts"].get(key)
+    if entry is None:
+        raise KeyError(f"Model '{name}' v{manifest['version']} has no artifact '{key}'")
+    path = _version_dir(name, manifest["version"]) / entry["file"]
+
+    if entry["format"] == "npy":
+        return np.load(path, mmap_mode=mmap_mode, allow_pickle=False)
+    if entry["format"] == "keras":
+        from tensorflow import keras
+        return keras.models.load_model(path)
+    import joblib
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+class LazyModel:
+    """
+    Handle on the latest version of a registered model.
+    Nothing is read from disk until an artifact is first requested; artifacts are then
+    cached. reload() re-reads the LATEST pointer so a newly trained version can be swapped in.
+    """
+
+    def __init__(self, name, mmap_mode=MMAP_MODE):
+        self.name = name
+        self.mmap_mode = mmap_mode
+        self._manifest = None
+        self._artifacts = {}
+        self._lock = threading.Lock()
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            with self._lock:
+                if self._manifest is None:
+                    self._manifest = load_manifest(self.name)
+        return self._manifest
+
+    @property
+    def version(self):
+        return self.manifest["version"]
+
+    @property
+    def feature_names(self):
+        return self.manifest["feature_names"]
+
+    @property
+    def available(self):
+        return self._manifest is not None or latest_version(self.name) is not None
+
+    @property
+    def loaded(self):
+        return self._manifest is not None and set(self._artifacts) == set(self._manifest["artifacts"])
+
+    def get(self, key):
+        artifact = self._artifacts.get(key)
+        if artifact is None:
+            self.manifest  # make sure the manifest is loaded before taking the lock
+            with self._lock:
+                artifact = self._artifacts.get(key)
+                if artifact is None:
+                    artifact = load_artifact(self.name, key, mmap_mode=self.mmap_mode, manifest=self._manifest)
+                    self._artifacts[key] = artifact
+        return artifact
+
+    def load_all(self):
+        for key in self.manifest["artifacts"]:
+            self.get(key)
+        return self
+
+    def reload(self):
+        """
+        Switch to the latest saved version. Already-loaded artifacts are re-read eagerly
+        and swapped in together, so callers never mix artifacts of two versions.
+        """
+        manifest = load_manifest(self.name)
+        keys = [key for key in self._artifacts if key in manifest["artifacts"]]
+        artifacts = {key: load_artifact(self.name, key, mmap_mode=self.mmap_mode, manifest=manifest) for key in keys}
+        with self._lock:
+            self._manifest, self._artifacts = manifest, artifacts
+        return self
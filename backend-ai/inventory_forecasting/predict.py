@@ -1,73 +1,133 @@
 import numpy as np
-import pandas as pd
-from sklearn.preprocessing import LabelEncoder
-from train_tft import train_tft
-from train_anomaly import train_anomaly_model
-from train_pricing import train_pricing_model
-from data_loader import load_data
-from feature_engineering import preprocess_data
-
-# ✅ Load Data
-users, suppliers, warehouses, products, transactions = load_data()
-time_series_data, time_series_scaled, scaler = preprocess_data(transactions)  # Returns 3 values
-
-# ✅ Load Models
-tft_model = train_tft(time_series_data)
-anomaly_model = train_anomaly_model(transactions)
-pricing_model = train_pricing_model(transactions, products, suppliers,warehouses)  # Pass additional data
-
-# ✅ Predict Future Demand
-future_days = 7
-predicted_demand = []
-
-# 🔹 Convert to NumPy (Ensure only numeric columns)
-time_series_scaled = time_series_scaled.select_dtypes(include=[np.number])
-
-# ✅ Check if enough data exists
-if time_series_scaled.shape[0] < 30:
-    raise ValueError("Insufficient time-series data for demand prediction.")
-
-# Convert to NumPy
-current_input = time_series_scaled[-30:].astype(np.float32).to_numpy()[np.newaxis, :, :]
-
-for _ in range(future_days):
-    next_day_demand = tft_model.predict(current_input)[0]  # Assuming model uses `.predict()`
-    predicted_demand.append(next_day_demand)
-    
-    # ✅ Ensure shifting is correct
-    current_input = np.roll(current_input, shift=-1, axis=1)
-    current_input[:, -1, :] = next_day_demand  # Update last position
-
-# ✅ Reshape for inverse transformation
-predicted_demand = np.array(predicted_demand).reshape(-1, 1)
-predicted_demand = scaler.inverse_transform(predicted_demand)
-
-# ✅ Select only trained features for fraud detection
-trained_features = anomaly_model.feature_names_in_
-transactions_filtered = transactions[trained_features].copy()
-
-# ✅ Handle categorical encoding properly
-label_encoders = {}  # Store encoders for reference
-for col in transactions_filtered.select_dtypes(include=["object"]).columns:
-    encoder = LabelEncoder()
-    transactions_filtered[col] = encoder.fit_transform(transactions_filtered[col])
-    label_encoders[col] = encoder  # Store for later use
-print("✅ 1")
-# ✅ Predict Fraud Anomalies
-transactions["fraud_prediction"] = anomaly_model.predict(transactions_filtered)
-
-# ✅ Optimize Pricing (Ensure feature alignment)
-pricing_features = list(pricing_model.feature_names_in_)  # Get trained feature names
-print("✅ 2")
-# 🔹 Check for missing features
-missing_features = [f for f in pricing_features if f not in transactions.columns]
-if missing_features:
-    raise ValueError(f"Missing required columns for pricing model: {missing_features}")
-print("✅ 3")
-# ✅ Handle missing values before prediction
-transactions[pricing_features] = transactions[pricing_features].fillna(0)
-print("✅ 4")
-# ✅ Predict optimized prices
-transactions["optimized_price"] = pricing_model.predict(transactions[pricing_features])
-
-print("✅ All Predictions Completed Successfully!")
+
+from model_registry import LazyModel
+from forecasting import DemandForecasts
+from recommender import Recommender
+from compiled_forest import load_predictor
+from instrumentation import span
+from encoding import Encoders, Vocabulary
+from chunked_pipeline import anomaly_encoders
+from fraud_scoring import lookup, read_scores
+
+# ✅ Lazily-loaded handles on the persisted models (written by train.py).
+# Importing this module reads nothing from disk and trains nothing.
+anomaly = LazyModel("anomaly")
+pricing = LazyModel("pricing")
+demand = LazyModel("demand")
+recommender = LazyModel("recommender")
+
+
+# ✅ Days returned by get_predicted_demand() (the old fixed 7-day forecast)
+DEFAULT_FORECAST_DAYS = 7
+
+_forecasts = None
+
+
+def get_demand_forecasts():
+    """
+    DemandForecasts view over the precomputed per-product forecast of the latest demand model.
+    """
+    global _forecasts
+    if _forecasts is None or _forecasts.version != demand.version:
+        _forecasts = DemandForecasts(demand.get("product_ids"), demand.get("forecast"), version=demand.version)
+    return _forecasts
+
+
+_recommender = None
+
+
+def get_recommender():
+    """
+    Recommender over the embeddings and product index of the latest recommender model.
+    """
+    global _recommender
+    if _recommender is None or _recommender.version != recommender.version:
+        _recommender = Recommender.from_model(recommender)
+    return _recommender
+
+
+_predictors = {}
+
+
+def get_predictor(model):
+    """
+    Predict function of the latest version of a forest model (compiled node tables when available).
+    """
+    version, predict = _predictors.get(model.name, (None, None))
+    if predict is None or version != model.version:
+        predict = load_predictor(model)
+        _predictors[model.name] = (model.version, predict)
+    return predict
+
+
+_anomaly_encoders = None
+
+
+def get_anomaly_encoders():
+    """
+    Encoders of the latest anomaly model's coded columns (the cache's vocabularies for models saved
+    before they were recorded).
+    """
+    global _anomaly_encoders
+    if _anomaly_encoders is None or _anomaly_encoders[0] != anomaly.version:
+        encoders = Encoders.from_params(anomaly.manifest["params"].get("encoders")) or anomaly_encoders()
+        _anomaly_encoders = (anomaly.version, encoders)
+    return _anomaly_encoders[1]
+
+
+def get_predicted_demand(days=DEFAULT_FORECAST_DAYS):
+    """
+    Total demand over all products for the next `days` days, as a (days, 1) array.
+    """
+    return get_demand_forecasts().total(days).reshape(-1, 1)
+
+
+def score_transactions(transactions):
+    """
+    Add fraud_prediction and optimized_price columns to `transactions` using the persisted models.
+    """
+    # ✅ Reuse the precomputed fraud scores (fraud_scoring.py); only unscored rows are scored here
+    fraud_prediction = np.full(len(transactions), -1, dtype=np.int64)
+    pending = np.ones(len(transactions), dtype=bool)
+    if "transaction_id" in transactions.columns:
+        with span("score.fraud_cache", rows_in=len(transactions)) as stage:
+            cached, _, found = lookup(read_scores(), transactions["transaction_id"].to_numpy())
+            fraud_prediction[found] = cached[found]
+            pending = ~found
+            stage.rows_out = int(found.sum())
+
+    if pending.any():
+        # ✅ Select only trained features for fraud detection
+        trained_features = anomaly.feature_names
+        transactions_filtered = transactions.loc[pending].reindex(columns=trained_features).copy()
+
+        # ✅ Encode categorical columns with the model's vocabularies (unseen values get the reserved code)
+        with span("score.encode", rows_in=len(transactions_filtered)):
+            encoders = get_anomaly_encoders()
+            for col in transactions_filtered.select_dtypes(include=["object", "string", "category"]).columns:
+                vocabulary = encoders[col] if col in encoders else Vocabulary.fit(transactions_filtered[col])
+                transactions_filtered[col] = vocabulary.encode(transactions_filtered[col])
+            transactions_filtered = transactions_filtered.fillna(0)
+
+        # ✅ Predict Fraud Anomalies
+        with span("score.fraud_predict", rows_in=len(transactions_filtered)) as stage:
+            fraud_prediction[pending] = get_predictor(anomaly)(anomaly.get("scaler").transform(transactions_filtered))
+            stage.rows_out = len(transactions_filtered)
+    transactions["fraud_prediction"] = fraud_prediction
+
+    # ✅ Optimize Pricing (Ensure feature alignment)
+    pricing_features = pricing.feature_names
+
+    # 🔹 Check for missing features
+    missing_features = [f for f in pricing_features if f not in transactions.columns]
+    if missing_features:
+        raise ValueError(f"Missing required columns for pricing model: {missing_features}")
+
+    # ✅ Handle missing values before prediction
+    transactions[pricing_features] = transactions[pricing_features].fillna(0)
+
+    # ✅ Predict optimized prices
+    with span("score.price_predict", rows_in=len(transactions)) as stage:
+        transactions["optimized_price"] = get_predictor(pricing)(pricing.get("scaler").transform(transactions[pricing_features]))
+        stage.rows_out = len(transactions)
+    return transactions
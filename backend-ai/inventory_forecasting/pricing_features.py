@@ -0,0 +1,157 @@
+"""
+Feature engine for the pricing model.
+
+The products -> suppliers -> warehouses dimension is joined once into an id-indexed Catalog (the
+same table the API prices from), and the transaction features are then built by array gathers:
+each partition of transactions maps its product ids to catalog rows and takes every attribute
+column at once. Partitions run on a process pool when there are enough rows; no DataFrame is
+merged, copied or modified along the way, so build time is linear in the number of transactions.
+
+    X, y = pricing_frame(transactions, products, suppliers, warehouses, workers=4)
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from catalog import Catalog, derive_pricing_features
+from instrumentation import span
+
+# ✅ Transactions per partition, and the size below which partitions are built in-process
+PARTITION_ROWS = 250_000
+PARALLEL_MIN_ROWS = 1_000_000
+
+# ✅ Columns 0-6 of PRICING_FEATURES are gathered, 7-9 derived from them
+BASE_FEATURES = 7
+N_FEATURES = 10
+
+_PRODUCT_COLUMNS = ["product_id", "cost_per_unit", "price_per_unit", "stock_level", "supplier_id", "warehouse_id"]
+
+
+def _numeric(frame, column):
+    return pd.to_numeric(frame[column], errors="coerce").to_numpy(dtype=np.float64)
+
+
+def _id_table(frame, id_column, value_columns):
+    """
+    {column: array} of the rows of `frame` with a valid id; missing values stay NaN (build_features
+    imputes them over the transactions). The frame itself is only read.
+    """
+    columns = {column: _numeric(frame, column) for column in [id_column] + value_columns}
+    valid = ~np.isnan(columns[id_column])
+    return {column: values[valid] for column, values in columns.items()}
+
+
+def catalog_from_frames(products, suppliers, warehouses):
+    """
+    Catalog joined from in-memory tables (e.g. load_data() frames) without modifying them. Missing
+    ids and attributes are left NaN, so a product without a supplier or warehouse misses the join.
+    """
+    product_table = _id_table(products, "product_id", _PRODUCT_COLUMNS[1:])
+    valid = ~np.isnan(_numeric(products, "product_id"))
+    names = products["product_name"].to_numpy()[valid] if "product_name" in products else \
+        np.full(len(product_table["product_id"]), "", dtype=object)
+    categories = products["category"] if "category" in products else pd.Series([""] * len(products))
+    product_table.update({"product_name": names, "category": pd.Categorical(categories.to_numpy()[valid])})
+    return Catalog(
+        product_table,
+        _id_table(suppliers, "supplier_id", ["reliability_score"]),
+        _id_table(warehouses, "warehouse_id", ["capacity"]),
+        impute=False,
+    )
+
+
+# ✅ Catalog of a pool worker, shipped once by the initializer instead of with every partition
+_worker_catalog = None
+
+
+def _init_worker(catalog):
+    global _worker_catalog
+    _worker_catalog = catalog
+
+
+def partition_features(product_ids, quantities, catalog=None):
+    """
+    PRICING_FEATURES matrix (column-major) of one partition; rows of unknown products are NaN in
+    columns 2-9, and so are missing catalog attributes (and the columns derived from them).
+    """
+    catalog = catalog or _worker_catalog
+    product_ids = np.asarray(product_ids, dtype=np.float64)
+    quantities = np.asarray(quantities, dtype=np.float64)
+    rows = np.full(len(product_ids), -1, dtype=np.int32)
+    valid = ~np.isnan(product_ids)
+    rows[valid] = catalog.product_rows(product_ids[valid].astype(np.int64))
+    known = rows >= 0
+    if known.all():
+        return catalog.pricing_features(rows, quantities, order="F")
+
+    features = np.full((len(product_ids), N_FEATURES), np.nan, dtype=np.float64, order="F")
+    features[known] = catalog.pricing_features(rows[known], quantities[known], order="F")
+    features[:, 0] = quantities
+    features[:, 1] = product_ids
+    return features
+
+
+def _partition_task(args):
+    return partition_features(*args)
+
+
+def build_features(product_ids, quantities, catalog, workers=None, partition_rows=PARTITION_ROWS):
+    """
+    PRICING_FEATURES matrix (float64, column-major) for all transactions. Values that cannot be joined (unknown
+    products, suppliers or warehouses, missing attributes or quantities) get the column median over the
+    transactions, and derived columns are recomputed from them.
+    """
+    product_ids = np.asarray(product_ids, dtype=np.float64)
+    quantities = np.asarray(quantities, dtype=np.float64)
+    n_rows = len(product_ids)
+    bounds = [(start, min(start + partition_rows, n_rows)) for start in range(0, n_rows, partition_rows)]
+    workers = workers or os.cpu_count() or 1
+
+    features = np.empty((n_rows, N_FEATURES), dtype=np.float64, order="F")
+    if workers > 1 and n_rows >= PARALLEL_MIN_ROWS and len(bounds) > 1:
+        tasks = [(product_ids[start:stop], quantities[start:stop]) for start, stop in bounds]
+        with ProcessPoolExecutor(max_workers=min(workers, len(bounds)), initializer=_init_worker,
+                                 initargs=(catalog,)) as pool:
+            for (start, stop), block in zip(bounds, pool.map(_partition_task, tasks)):
+                features[start:stop] = block
+    else:
+        for start, stop in bounds:
+            features[start:stop] = partition_features(product_ids[start:stop], quantities[start:stop], catalog)
+
+    # ✅ Gather first, then impute: a missing cell becomes its column's median over all transactions
+    # (what fillna(median) did after the old left merges)
+    incomplete = np.isnan(features[:, :BASE_FEATURES]).any(axis=1)
+    if incomplete.any():
+        base = features[:, :BASE_FEATURES]
+        medians = np.nanmedian(base, axis=0)
+        missing = np.isnan(base)
+        base[missing] = np.take(np.nan_to_num(medians), np.nonzero(missing)[1])
+        features[incomplete] = derive_pricing_features(features[incomplete])
+    return features
+
+
+def pricing_frame(transactions, products, suppliers, warehouses, workers=None):
+    """
+    (X, y): PRICING_FEATURES as a DataFrame and the log1p(total_price) target, built without
+    modifying any of the input frames.
+    """
+    from train_pricing import PRICING_FEATURES
+
+    with span("pricing.dimension", rows_in=len(products)):
+        catalog = catalog_from_frames(products, suppliers, warehouses)
+
+    with span("pricing.features", rows_in=len(transactions)) as stage:
+        features = build_features(_numeric(transactions, "product_id"), _numeric(transactions, "quantity"), catalog,
+                                  workers=workers)
+        stage.rows_out = len(features)
+
+    total_price = _numeric(transactions, "total_price")
+    missing = np.isnan(total_price)
+    if missing.any():
+        total_price = np.where(missing, np.nanmedian(total_price), total_price)
+
+    X = pd.DataFrame(features, columns=PRICING_FEATURES, index=transactions.index)
+    y = pd.Series(np.log1p(total_price), index=transactions.index, name="log_total_price")
+    return X, y
@@ -0,0 +1,305 @@
+"""
+Opt-in sampling profiler and event-loop watchdog for the API.
+
+SamplingProfiler samples the Python stack of every thread (sys._current_frames) from a background
+thread at a fixed interval. Samples taken on the event loop thread are tagged with the route of the
+request whose task was running, samples from other threads with the thread name (e.g. the
+inference pool), and the result is written as collapsed stacks (flamegraph.pl / speedscope input)
+and as a speedscope JSON file.
+
+LoopWatchdog notices when synchronous code holds the event loop longer than a threshold, logs the
+blocking stack with its route and counts the stalls in the event_loop_blocked_* metrics.
+
+Both are enabled by INVENTORY_PROFILER=1 (see api/app.py: POST /admin/profile, SIGUSR2).
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from pathlib import Path
+
+from instrumentation import Counter as MetricCounter, Histogram
+
+ENABLED = os.environ.get("INVENTORY_PROFILER", "0") == "1"
+PROFILES_DIR = Path(os.environ.get("INVENTORY_PROFILES_DIR", Path(__file__).resolve().parent.parent / "profiles"))
+
+# ✅ Defaults: sampling interval, capture window, and how long the loop may be held before it is flagged
+DEFAULT_INTERVAL_MS = 5.0
+DEFAULT_WINDOW_S = 10.0
+MAX_WINDOW_S = 300.0
+LOOP_BLOCK_MS = float(os.environ.get("INVENTORY_LOOP_BLOCK_MS", 100.0))
+
+# ✅ Threads of the profiling machinery itself, never sampled
+PROFILER_THREADS = {"sampling-profiler", "loop-watchdog"}
+
+log = logging.getLogger("inventory.profiler")
+
+LOOP_BLOCKED = MetricCounter("event_loop_blocked_total", "Times the event loop was held past the threshold",
+                             ["route"])
+LOOP_LAG_SECONDS = Histogram("event_loop_lag_seconds", "Delay of the event loop watchdog heartbeat")
+
+# ✅ Request task -> ASGI scope, so samples on the loop thread can be tagged with their route
+_task_scopes = weakref.WeakKeyDictionary()
+
+
+def track_request(scope):
+    """
+    Remember the scope of the request handled by the current task (called from the middleware).
+    """
+    task = asyncio.current_task()
+    if task is not None:
+        _task_scopes[task] = scope
+
+
+def _route_of(scope):
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path", "?")
+
+
+def loop_route(loop):
+    """
+    Route of the request whose task is running on `loop` right now (read from another thread).
+    """
+    try:
+        task = asyncio.tasks._current_tasks.get(loop)
+    except Exception:
+        return None
+    scope = _task_scopes.get(task) if task is not None else None
+    return _route_of(scope) if scope is not None else None
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})"
+
+
+def stack_of(frame, limit=200):
+    """
+    Frames from the outermost call to `frame`, as "function (file:line)" names.
+    """
+    stack = []
+    while frame is not None and len(stack) < limit:
+        stack.append(_frame_name(frame))
+        frame = frame.f_back
+    return stack[::-1]
+
+
+class SamplingProfiler:
+    """
+    Samples every thread's stack each `interval_ms` until stop(); stacks are counted per tag.
+    """
+
+    def __init__(self, interval_ms=DEFAULT_INTERVAL_MS, loop=None):
+        self.interval = interval_ms / 1000.0
+        self.loop = loop
+        self.loop_thread_id = None
+        self.samples = Counter()
+        self.n_samples = 0
+        self.started_at = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._caller = None
+
+    def start(self):
+        # ✅ The thread waiting for the capture window is not sampled either
+        self._caller = threading.get_ident()
+        if self.loop is not None:
+            self.loop_thread_id = getattr(self.loop, "_thread_id", None)
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def _tag(self, thread_id, names):
+        if thread_id == self.loop_thread_id:
+            route = loop_route(self.loop)
+            return f"route:{route}" if route else "loop:idle"
+        return f"thread:{names.get(thread_id, thread_id)}"
+
+    def _run(self):
+        start = time.perf_counter()
+        next_sample = start
+        while not self._stop.is_set():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self._caller or names.get(thread_id) in PROFILER_THREADS:
+                    continue
+                self.samples[(self._tag(thread_id, names), *stack_of(frame))] += 1
+            self.n_samples += 1
+            # ✅ Fixed-rate schedule (sleep drift does not accumulate)
+            next_sample += self.interval
+            self._stop.wait(max(0.0, next_sample - time.perf_counter()))
+        self.elapsed = time.perf_counter() - start
+
+    def collapsed(self):
+        """
+        Collapsed stacks ("tag;outer;...;inner count" per line), the input format of flamegraph.pl.
+        """
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+    def speedscope(self, name="inventory-api"):
+        """
+        speedscope file (https://www.speedscope.app) with one sampled profile per tag.
+        """
+        frames, frame_index, profiles = [], {}, {}
+        for (tag, *stack), count in self.samples.items():
+            indices = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame})
+                indices.append(frame_index[frame])
+            profile = profiles.setdefault(tag, {"samples": [], "weights": []})
+            profile["samples"].append(indices)
+            profile["weights"].append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "inventory_forecasting.profiler",
+            "shared": {"frames": frames},
+            "profiles": [
+                {"type": "sampled", "name": tag, "unit": "seconds", "startValue": 0,
+                 "endValue": sum(profile["weights"]), **profile}
+                for tag, profile in sorted(profiles.items())
+            ],
+        }
+
+    def summary(self, top=10):
+        """
+        Sample counts per tag and the hottest leaf frames.
+        """
+        tags, leaves = Counter(), Counter()
+        for (tag, *stack), count in self.samples.items():
+            tags[tag] += count
+            if stack:
+                leaves[stack[-1]] += count
+        return {
+            "seconds": round(self.elapsed, 3),
+            "samples": self.n_samples,
+            "interval_ms": self.interval * 1000,
+            "tags": dict(tags.most_common()),
+            "top_frames": leaves.most_common(top),
+        }
+
+    def dump(self, directory=PROFILES_DIR, prefix=None):
+        """
+        Write <prefix>.collapsed and <prefix>.speedscope.json; returns their paths.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        prefix = prefix or time.strftime("profile-%Y%m%d-%H%M%S", time.localtime(self.started_at))
+        collapsed = directory / f"{prefix}.collapsed"
+        speedscope = directory / f"{prefix}.speedscope.json"
+        collapsed.write_text(self.collapsed())
+        speedscope.write_text(json.dumps(self.speedscope(name=prefix)))
+        return {"collapsed": str(collapsed), "speedscope": str(speedscope)}
+
+
+# ✅ At most one capture at a time
+_capture_lock = threading.Lock()
+
+
+def capture(seconds=DEFAULT_WINDOW_S, interval_ms=DEFAULT_INTERVAL_MS, loop=None, directory=PROFILES_DIR):
+    """
+    Profile for `seconds` (blocking the calling thread, never the event loop) and dump the files.
+    Returns the summary with the file paths, or None if a capture is already running.
+    """
+    if not _capture_lock.acquire(blocking=False):
+        return None
+    try:
+        profiler = SamplingProfiler(interval_ms, loop=loop).start()
+        time.sleep(min(seconds, MAX_WINDOW_S))
+        profiler.stop()
+        return {**profiler.summary(), "files": profiler.dump(directory)}
+    finally:
+        _capture_lock.release()
+
+
+class LoopWatchdog:
+    """
+    Heartbeat task on the event loop plus a monitor thread. When the heartbeat is older than
+    `threshold_ms` the loop is blocked by synchronous code: the loop thread's stack and route are
+    logged once per stall, and the stall is counted.
+    """
+
+    def __init__(self, threshold_ms=LOOP_BLOCK_MS, history=100):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = self.threshold / 4
+        self.blocks = deque(maxlen=history)
+        self.loop = None
+        self._heartbeat = time.monotonic()
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self._heartbeat = time.monotonic()
+        self._task = self.loop.create_task(self._beat())
+        self._thread = threading.Thread(target=self._monitor, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        return self
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._thread is not None:
+            self._thread.join()
+
+    async def _beat(self):
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            LOOP_LAG_SECONDS.observe(max(0.0, now - before - self.interval))
+            self._heartbeat = now
+
+    def _monitor(self):
+        flagged = None
+        while not self._stop.wait(self.interval):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat
+            if stalled < self.threshold or flagged == heartbeat:
+                continue
+            # ✅ First check past the threshold for this stall: record where the loop is stuck
+            flagged = heartbeat
+            thread_id = getattr(self.loop, "_thread_id", None)
+            frame = sys._current_frames().get(thread_id)
+            route = loop_route(self.loop)
+            block = {"at": time.time(), "blocked_ms": round(stalled * 1000, 1), "route": route,
+                     "stack": stack_of(frame)[-25:] if frame is not None else []}
+            self.blocks.append(block)
+            LOOP_BLOCKED.inc(route=route or "none")
+            log.warning("Event loop blocked for %.0f ms (route %s) at:\n  %s", block["blocked_ms"], route,
+                        "\n  ".join(block["stack"][-8:]))
+
+
+class RouteTaggingMiddleware:
+    """
+    ASGI middleware that records which request each task serves (for route-tagged samples).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            track_request(scope)
+        await self.app(scope, receive, send)
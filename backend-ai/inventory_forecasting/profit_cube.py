@@ -0,0 +1,371 @@
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CACHE_DIR, source_fingerprint
+from catalog import get_catalog
+from chunked_pipeline import iter_transaction_chunks, DEFAULT_CHUNK_SIZE
+from feature_store import write_snapshot, read_snapshot, read_snapshot_meta, snapshot_matches
+
+# ✅ Snapshot location (derived data, lives next to the columnar cache)
+SNAPSHOT_DIR = CACHE_DIR / "profit_cube"
+
+# ✅ Where export_reports() writes the CSV reports
+REPORTS_DIR = Path(os.environ.get("INVENTORY_REPORTS_DIR", Path(__file__).resolve().parent.parent / "reports"))
+
+# ✅ Measures kept for every cell, in this order along the first axis of every rollup
+MEASURES = ["revenue", "cost", "profit", "quantity"]
+REVENUE, COST, PROFIT, QUANTITY = range(len(MEASURES))
+
+# ✅ Records buffered by record() before they are folded into the rollups in one batch
+FLUSH_EVERY = int(os.environ.get("PROFIT_CUBE_FLUSH_EVERY", 256))
+
+# ✅ Spare days allocated past the last day, so new days rarely reallocate the rollups
+DAY_SLACK = 32
+
+# ✅ Bumped when the snapshot layout changes (older snapshots are rebuilt)
+SNAPSHOT_FORMAT = 2
+
+
+def _grow(values, axis, size, mode="constant"):
+    """
+    Pad `values` along `axis` to at least `size`: zeros for new products / warehouses, the last value
+    (mode="edge") for new days of a prefix sum.
+    """
+    if size <= values.shape[axis]:
+        return values
+    pad = [(0, 0)] * values.ndim
+    pad[axis] = (0, size - values.shape[axis])
+    if mode == "edge" and values.shape[axis] == 0:
+        mode = "constant"
+    return np.pad(values, pad, mode=mode)
+
+
+class ProfitCube:
+    """
+    Revenue / cost / profit / quantity rolled up over (warehouse_id, category, product_id, day).
+
+    A product belongs to one warehouse and one category, so dense rollups answer every report:
+    product x day, warehouse x category x day and category x day. All are stored as prefix sums over days
+    (`*_cum[d]` = totals of the days before d, shape (days + 1, measures, ...)), so any date range is
+    two row reads: `cum[last] - cum[first]`. Nothing is rescanned and reads cost O(products) at most;
+    the price is memory, 32 bytes per product and day.
+
+    update() folds a batch in with bincount; record() only buffers the transaction, and the buffer is
+    folded in as one batch every FLUSH_EVERY records or before the next read. A new transaction
+    usually lands on the last day, where adding to a prefix sum touches just the spare days after it.
+    Every method takes the lock: readers run on run_blocking threads while updates fold in.
+    """
+
+    def __init__(self, start_date, categories):
+        self.start_date = np.datetime64(pd.Timestamp(start_date).date(), "D")
+        self.categories = list(categories)
+        n_measures, n_categories = len(MEASURES), len(self.categories)
+        self.product_cum = np.zeros((1, n_measures, 0))
+        self.group_cum = np.zeros((1, n_measures, 0, n_categories))
+        self.category_cum = np.zeros((1, n_measures, n_categories))
+        # ✅ Warehouse / category of every product id seen so far (-1 = never seen)
+        self.product_warehouse = np.full(0, -1, dtype=np.int32)
+        self.product_category = np.full(0, -1, dtype=np.int16)
+        self.days = 0
+        self.fingerprint = None
+        self.updates = 0
+        # ✅ Position in the transaction journal (transaction_log.py) these rollups include
+        self.log_offset = 0
+        self._pending = []
+        self._lock = threading.Lock()
+
+    @property
+    def n_days(self):
+        """
+        Days from start_date through the last day with a transaction (the arrays may be longer).
+        """
+        return self.days
+
+    def _day_index(self, dates):
+        days = (np.asarray(dates, dtype="datetime64[D]") - self.start_date).astype(np.int64)
+        if len(days) and days.min() < 0:
+            raise ValueError("Transactions before the cube start date cannot be added.")
+        return days
+
+    def update(self, product_ids, quantities, amounts, dates, catalog=None):
+        """
+        Fold a batch of transactions into the cube. Product cost, warehouse and category come from the
+        catalog as of now; transactions of products missing from the catalog are skipped.
+        """
+        self.update_many([(product_ids, quantities, amounts, dates)], catalog)
+
+    def update_many(self, batches, catalog=None):
+        """
+        Fold (product_ids, quantities, amounts, dates) batches in (e.g. the chunks of a bulk load); the
+        prefix sums are recomputed once for all of them, not once per batch.
+        """
+        with self._lock:
+            self._fold(batches, catalog)
+
+    def record(self, product_id, quantity, amount, date, catalog=None):
+        """
+        Buffer a single transaction; it is folded in with the next batch (at the latest before the next read).
+        """
+        with self._lock:
+            self._pending.append((product_id, quantity, amount, np.datetime64(date, "D")))
+            if len(self._pending) >= FLUSH_EVERY:
+                self._flush(catalog)
+
+    def flush(self, catalog=None):
+        with self._lock:
+            self._flush(catalog)
+
+    def _flush(self, catalog=None):
+        if self._pending:
+            product_ids, quantities, amounts, dates = zip(*self._pending)
+            self._pending = []
+            self._fold([(product_ids, quantities, amounts, np.array(dates, dtype="datetime64[D]"))], catalog)
+
+    def _fold(self, batches, catalog=None):
+        """
+        Fold batches into both rollups (call with the lock held). A sale on day d adds to the prefix
+        sums of days d + 1 onwards: cells of a batch that touches few of them (live records, on the
+        last days) are added in place; larger batches are collected as per-day totals and turned into
+        prefix sums with one cumsum at the end.
+        """
+        catalog = catalog or get_catalog()
+        daily = {}
+        for product_ids, quantities, amounts, dates in batches:
+            batch = self._prepare(product_ids, quantities, amounts, dates, catalog)
+            if batch is None:
+                continue
+            product_ids, warehouses, categories, days, measures = batch
+            n_categories = self.group_cum.shape[3]
+            for name, index in (("product_cum", product_ids), ("group_cum", warehouses * n_categories + categories),
+                                ("category_cum", categories)):
+                cum = getattr(self, name)
+                cum = cum.reshape(len(cum), len(MEASURES), -1)
+                if name in daily and daily[name].shape != cum.shape:
+                    daily[name] = np.pad(daily[name], [(0, full - now) for full, now in zip(cum.shape, daily[name].shape)])
+                self._add_cells(cum, daily, name, days, index, measures)
+            self.updates += len(days)
+
+        for name, values in daily.items():
+            cum = getattr(self, name)
+            cum.reshape(len(cum), len(MEASURES), -1)[:] += np.cumsum(values, axis=0, out=values)
+
+    def _prepare(self, product_ids, quantities, amounts, dates, catalog):
+        """
+        (product_ids, warehouses, categories, days, measures) of the batch's catalog products, with the
+        rollups grown to hold them.
+        """
+        rows = catalog.product_rows(np.asarray(product_ids, dtype=np.int64))
+        known = rows >= 0
+        rows = rows[known]
+        product_ids = np.asarray(product_ids, dtype=np.int64)[known]
+        quantities = np.asarray(quantities, dtype=np.float64)[known]
+        revenue = np.asarray(amounts, dtype=np.float64)[known]
+        days = self._day_index(np.asarray(dates)[known])
+        if not len(rows):
+            return None
+
+        cost = quantities * catalog.cost_per_unit[rows]
+        measures = np.stack([revenue, cost, revenue - cost, quantities])
+        warehouses = catalog.warehouse_id[rows].astype(np.int64)
+        categories = catalog.category_codes[rows].astype(np.int64)
+
+        self.days = max(self.days, int(days.max()) + 1)
+        if self.days + 1 > len(self.product_cum):
+            self.product_cum = _grow(self.product_cum, 0, self.days + 1 + DAY_SLACK, mode="edge")
+            self.group_cum = _grow(self.group_cum, 0, self.days + 1 + DAY_SLACK, mode="edge")
+            self.category_cum = _grow(self.category_cum, 0, self.days + 1 + DAY_SLACK, mode="edge")
+        n_products = int(product_ids.max()) + 1
+        if n_products > self.product_cum.shape[2]:
+            n_products = max(n_products, int(self.product_cum.shape[2] * 1.5))
+            self.product_cum = _grow(self.product_cum, 2, n_products)
+            pad = n_products - len(self.product_warehouse)
+            self.product_warehouse = np.concatenate([self.product_warehouse, np.full(pad, -1, dtype=np.int32)])
+            self.product_category = np.concatenate([self.product_category, np.full(pad, -1, dtype=np.int16)])
+        self.group_cum = _grow(self.group_cum, 2, int(warehouses.max()) + 1)
+        self.product_warehouse[product_ids] = warehouses
+        self.product_category[product_ids] = categories
+        return product_ids, warehouses, categories, days, measures
+
+    @staticmethod
+    def _add_cells(cum, daily, name, days, index, measures):
+        """
+        Add the batch's (day, index) cells to the (days + 1, measures, cells) prefix sum `cum`: in place
+        when that touches fewer values than a dense pass would, otherwise into daily[name].
+        """
+        n_rows, n_measures, n_cells = cum.shape
+        keys, inverse = np.unique(days * n_cells + index, return_inverse=True)
+        values = np.stack([np.bincount(inverse, weights=measures[m], minlength=len(keys)) for m in range(n_measures)])
+        key_days, key_index = keys // n_cells, keys % n_cells
+
+        # ✅ A scattered in-place update costs about a cache line per value, a dense pass one value per cell and day
+        if name not in daily and 8 * np.sum(n_rows - 1 - key_days) < (n_rows - 1) * n_cells:
+            for day in np.unique(key_days):
+                in_day = key_days == day
+                cum[day + 1:, :, key_index[in_day]] += values[:, in_day]
+            return
+        if name not in daily:
+            daily[name] = np.zeros(cum.shape)
+        daily[name][key_days + 1, :, key_index] += values.T
+
+    def day_range(self, start=None, end=None):
+        """
+        [first, last) day indices covering the inclusive date range [start, end].
+        """
+        first = 0 if start is None else int((np.datetime64(start, "D") - self.start_date).astype(np.int64))
+        last = self.n_days if end is None else int((np.datetime64(end, "D") - self.start_date).astype(np.int64)) + 1
+        return min(max(first, 0), self.n_days), min(max(last, 0), self.n_days)
+
+    def category_code(self, category):
+        return self.categories.index(category) if category in self.categories else None
+
+    def by_warehouse(self, start=None, end=None, category=None):
+        """
+        (warehouse_ids, measures[n, 4]) for warehouses with sales in the range.
+        """
+        code = self.category_code(category) if category is not None else None
+        if category is not None and code is None:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, len(MEASURES)))
+        with self._lock:
+            self._flush()
+            first, last = self.day_range(start, end)
+            totals = self.group_cum[last] - self.group_cum[first]
+        totals = totals.sum(axis=2).T if code is None else totals[:, :, code].T
+        ids = np.nonzero(totals[:, QUANTITY])[0]
+        return ids, totals[ids]
+
+    def by_category(self, start=None, end=None, warehouse_id=None):
+        """
+        (category names, measures[n, 4]) for categories with sales in the range.
+        """
+        with self._lock:
+            self._flush()
+            first, last = self.day_range(start, end)
+            if warehouse_id is None:
+                totals = (self.category_cum[last] - self.category_cum[first]).T
+            elif 0 <= warehouse_id < self.group_cum.shape[2]:
+                totals = (self.group_cum[last, :, warehouse_id] - self.group_cum[first, :, warehouse_id]).T
+            else:
+                return [], np.zeros((0, len(MEASURES)))
+        codes = np.nonzero(totals[:, QUANTITY])[0]
+        return [self.categories[code] for code in codes], totals[codes]
+
+    def by_product(self, start=None, end=None, warehouse_id=None, category=None):
+        """
+        (product_ids, measures[n, 4]) for products with sales in the range / warehouse / category.
+        """
+        code = None
+        if category is not None:
+            code = self.category_code(category)
+            if code is None:
+                return np.zeros(0, dtype=np.int64), np.zeros((0, len(MEASURES)))
+        with self._lock:
+            self._flush()
+            first, last = self.day_range(start, end)
+            totals = (self.product_cum[last] - self.product_cum[first]).T
+            mask = totals[:, QUANTITY] != 0
+            if warehouse_id is not None:
+                mask &= self.product_warehouse == warehouse_id
+            if code is not None:
+                mask &= self.product_category == code
+        ids = np.nonzero(mask)[0]
+        return ids, totals[ids]
+
+    def daily(self, start=None, end=None, warehouse_id=None, category=None):
+        """
+        (dates, measures[n_days, 4]) per day over the range, for everything / a warehouse / a category.
+        """
+        code = self.category_code(category) if category is not None else None
+        with self._lock:
+            self._flush()
+            first, last = self.day_range(start, end)
+            if category is not None and code is None:
+                cum = np.zeros((last - first + 1, len(MEASURES)))
+            elif warehouse_id is None:
+                cum = self.category_cum[first:last + 1]
+                cum = cum[:, :, code] if code is not None else cum.sum(axis=2)
+            elif 0 <= warehouse_id < self.group_cum.shape[2]:
+                cum = self.group_cum[first:last + 1, :, warehouse_id]
+                cum = cum[:, :, code] if code is not None else cum.sum(axis=2)
+            else:
+                cum = np.zeros((last - first + 1, len(MEASURES)))
+        dates = self.start_date + np.arange(first, last)
+        return dates, np.diff(cum, axis=0)
+
+    def export_reports(self, directory=REPORTS_DIR):
+        """
+        Rewrite the CSV reports in reports/ from the rollups.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        warehouse_ids, totals = self.by_warehouse()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            profitability = np.where(totals[:, REVENUE] != 0, totals[:, PROFIT] / totals[:, REVENUE], 0.0)
+        pd.DataFrame({
+            "warehouse_id": warehouse_ids,
+            "total_revenue": totals[:, REVENUE].round(2),
+            "total_cost": totals[:, COST].round(2),
+            "profit": totals[:, PROFIT].round(2),
+            "profitability": profitability,
+        }).to_csv(directory / "warehouse_profitability.csv", index=False)
+
+        categories, totals = self.by_category()
+        pd.DataFrame({"category": categories, "profit_margin": totals[:, PROFIT].round(2)}).to_csv(
+            directory / "category_profitability.csv", index=False)
+
+        product_ids, totals = self.by_product()
+        pd.DataFrame({"item_id": product_ids, "quantity": totals[:, QUANTITY].astype(np.int64)}).to_csv(
+            directory / "stock_performance.csv", index=False)
+
+    def snapshot(self, path=SNAPSHOT_DIR):
+        with self._lock:
+            self._flush()
+            arrays = {name: getattr(self, name).copy() for name in (
+                "product_cum", "group_cum", "category_cum", "product_warehouse", "product_category")}
+            meta = {"fingerprint": self.fingerprint, "updates": self.updates, "days": self.days,
+                    "start_date": str(self.start_date), "categories": self.categories, "format": SNAPSHOT_FORMAT,
+                    "log_offset": self.log_offset}
+        write_snapshot(path, arrays, meta)
+
+    @classmethod
+    def load(cls, path=SNAPSHOT_DIR):
+        arrays, meta = read_snapshot(path)
+        cube = cls(meta["start_date"], meta["categories"])
+        for name, values in arrays.items():
+            setattr(cube, name, values)
+        cube.fingerprint, cube.updates, cube.days = meta["fingerprint"], meta["updates"], meta["days"]
+        cube.log_offset = meta.get("log_offset", 0)
+        return cube
+
+
+def build_profit_cube(chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Build the cube from every transaction in the columnar cache, one chunk at a time.
+    """
+    from data_loader import load_arrays
+
+    catalog = get_catalog()
+    start_date = load_arrays("transactions", ["transaction_date"])["transaction_date"].min()
+    cube = ProfitCube(start_date, catalog.categories)
+    cube.fingerprint = source_fingerprint(["transactions", "products"])
+    columns = ["product_id", "quantity", "total_price", "transaction_date"]
+    chunks = iter_transaction_chunks(columns, chunk_size)
+    cube.update_many(((chunk["product_id"], chunk["quantity"], chunk["total_price"], chunk["transaction_date"])
+                      for _, chunk in chunks), catalog)
+    return cube
+
+
+def load_or_build_profit_cube(path=SNAPSHOT_DIR):
+    """
+    Restore the last snapshot if it was built from the current transactions and products, otherwise rebuild it.
+    """
+    if snapshot_matches(path, source_fingerprint(["transactions", "products"])) and \
+            read_snapshot_meta(path).get("format") == SNAPSHOT_FORMAT:
+        return ProfitCube.load(path)
+    cube = build_profit_cube()
+    cube.snapshot(path)
+    return cube
@@ -0,0 +1,60 @@
+import numpy as np
+
+from ann_index import IVFIndex, DEFAULT_N_PROBE
+from model_registry import save_artifacts
+
+# ✅ Recommendations returned when the request does not say
+DEFAULT_TOP_K = 10
+
+
+def export_recommender(user_ids, user_embeddings, product_ids, product_embeddings, product_bias=None, n_lists=None,
+                       fingerprint=None, metrics=None):
+    """
+    Save the learned embeddings as the "recommender" model: the user vectors plus an IVF index over
+    the product vectors. A per-product bias is folded in as an extra dimension (user side = 1), so the
+    model score user . product + bias is exactly the inner product the index searches.
+    """
+    user_vectors = np.asarray(user_embeddings, dtype=np.float32)
+    product_vectors = np.asarray(product_embeddings, dtype=np.float32)
+    if product_bias is not None:
+        product_vectors = np.hstack([product_vectors, np.asarray(product_bias, dtype=np.float32).reshape(-1, 1)])
+        user_vectors = np.hstack([user_vectors, np.ones((len(user_vectors), 1), dtype=np.float32)])
+
+    index = IVFIndex.build(product_vectors, product_ids, n_lists=n_lists)
+    return save_artifacts(
+        "recommender",
+        {"user_ids": np.asarray(user_ids, dtype=np.int64), "user_vectors": user_vectors, **index.to_arrays()},
+        fingerprint=fingerprint,
+        metrics=metrics,
+        params={"n_lists": index.n_lists, "dimensions": int(product_vectors.shape[1])},
+    )
+
+
+class Recommender:
+    """
+    Top-K products per user from the exported embeddings, with an id -> row index for the users.
+    """
+
+    def __init__(self, user_ids, user_vectors, index, version=None):
+        self.version = version
+        self.user_vectors = user_vectors
+        self.index = index
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.user_index = np.full(int(user_ids.max()) + 1 if len(user_ids) else 1, -1, dtype=np.int64)
+        self.user_index[user_ids] = np.arange(len(user_ids))
+
+    @classmethod
+    def from_model(cls, model):
+        """
+        Build from a LazyModel handle on the "recommender" model (arrays stay memory-mapped).
+        """
+        return cls(model.get("user_ids"), model.get("user_vectors"), IVFIndex.from_arrays(model.get),
+                   version=model.version)
+
+    def recommend(self, user_id, k=DEFAULT_TOP_K, n_probe=DEFAULT_N_PROBE, exclude=None):
+        """
+        (product_ids, scores) best first, or None for a user without an embedding.
+        """
+        if user_id < 0 or user_id >= len(self.user_index) or self.user_index[user_id] < 0:
+            return None
+        return self.index.search(self.user_vectors[self.user_index[user_id]], k, n_probe=n_probe, exclude=exclude)
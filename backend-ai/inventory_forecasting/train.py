@@ -0,0 +1,137 @@
+"""
+Training CLI: fits the demand, anomaly and pricing models and writes them to the model registry.
+
+    python train.py                      # train everything on the default 10k transactions
+    python train.py --models pricing     # only retrain the pricing model
+    python train.py --rows 0             # use every transaction
+    python train.py --chunked --rows 0   # stream every transaction through chunked_pipeline
+    python train.py --models pricing --compress --distill hgb   # register a compressed pricing model
+"""
+import argparse
+
+from data_loader import load_data, TRANSACTIONS_ROW_LIMIT
+from model_registry import save_artifacts, data_fingerprint
+from forecasting import DEFAULT_WINDOW, DEFAULT_HORIZON
+from compiled_forest import CompiledForest
+
+MODELS = ["demand", "anomaly", "pricing"]
+
+
+def save_forest(name, model, scaler, feature_names, fingerprint, params=None):
+    """
+    Register a fitted forest together with its compiled node tables (served by compiled_forest).
+    """
+    forest = CompiledForest.from_sklearn(model)
+    return save_artifacts(
+        name,
+        {"model": model, "scaler": scaler, **forest.to_arrays()},
+        feature_names=feature_names,
+        fingerprint=fingerprint,
+        params={**(params or {}), **forest.params()},
+    )
+
+
+def train_demand(users, suppliers, warehouses, products, transactions, fingerprint, chunked=False, nrows=None,
+                 horizon=DEFAULT_HORIZON, **_):
+    from feature_engineering import build_demand_tensor, build_demand_series
+    from train_tft import train_tft
+    from forecasting import forecast_all
+
+    # ✅ Chunked: aggregate the daily series straight from the columnar cache
+    source = build_demand_series(nrows=nrows) if chunked else transactions
+    product_ids, start_date, demand = build_demand_tensor(source)
+    tft_model = train_tft(demand, window=DEFAULT_WINDOW, horizon=horizon)
+
+    # ✅ Forecast every product once; the API serves straight from this array
+    forecast = forecast_all(tft_model, demand, window=DEFAULT_WINDOW, horizon=horizon)
+    return save_artifacts(
+        "demand",
+        {"model": tft_model, "product_ids": product_ids, "forecast": forecast},
+        feature_names=["quantity"],
+        fingerprint=fingerprint,
+        params={"window": DEFAULT_WINDOW, "horizon": horizon, "start_date": str(start_date.date()),
+                "n_days": int(demand.shape[1])},
+    )
+
+
+def train_anomaly(users, suppliers, warehouses, products, transactions, fingerprint, chunked=False, nrows=None,
+                  **_):
+    from train_anomaly import train_anomaly_model, fit_anomaly_model
+    from chunked_pipeline import anomaly_encoders
+
+    if chunked:
+        import pandas as pd
+        from chunked_pipeline import build_anomaly_matrix, ANOMALY_FEATURES
+
+        X, y = build_anomaly_matrix(nrows=nrows)
+        model, scaler = fit_anomaly_model(pd.DataFrame(X, columns=ANOMALY_FEATURES), y)
+    else:
+        from chunked_pipeline import scan_transactions
+
+        # ✅ User totals over every transaction, not just the `nrows` trained on: the batch scorer and
+        # the API's feature store compute them over all transactions too
+        aggregates, _, _ = scan_transactions()
+        model, scaler = train_anomaly_model(transactions.copy(), users, products, user_aggregates=aggregates)
+
+    # ✅ The vocabularies of the coded columns travel with the model (scoring and the API encode with them)
+    return save_forest("anomaly", model, scaler, list(scaler.feature_names_in_), fingerprint,
+                       params={"encoders": anomaly_encoders().to_params(), "user_aggregates": "all_transactions"})
+
+
+def train_pricing(users, suppliers, warehouses, products, transactions, fingerprint, chunked=False, nrows=None,
+                  compress=False, distill=(), **_):
+    from train_pricing import build_pricing_frame, fit_pricing_model, PRICING_FEATURES
+
+    if chunked:
+        import pandas as pd
+        from chunked_pipeline import build_pricing_matrix
+
+        X, y = build_pricing_matrix(nrows=nrows)
+        X = pd.DataFrame(X, columns=PRICING_FEATURES)
+    else:
+        X, y = build_pricing_frame(transactions, products, suppliers, warehouses)
+    model, scaler, _ = fit_pricing_model(X, y)
+
+    # ✅ Optionally register a pruned / distilled variant instead of the full forest (which is kept
+    # when no variant is within the tolerance)
+    if compress:
+        from forest_compression import compress_pricing
+
+        version = compress_pricing(model, scaler, X, y, fingerprint=fingerprint, distill_kinds=distill)
+        if version is not None:
+            return version
+    return save_forest("pricing", model, scaler, PRICING_FEATURES, fingerprint)
+
+
+TRAINERS = {"demand": train_demand, "anomaly": train_anomaly, "pricing": train_pricing}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train models and save them to the model registry")
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=MODELS)
+    parser.add_argument("--rows", type=int, default=TRANSACTIONS_ROW_LIMIT,
+                        help="transactions to train on (0 = all)")
+    parser.add_argument("--chunked", action="store_true",
+                        help="build the features in bounded-memory chunks")
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON,
+                        help="days of demand forecast per product")
+    parser.add_argument("--compress", action="store_true",
+                        help="register the smallest pricing variant within the MAE tolerance (forest_compression)")
+    parser.add_argument("--distill", nargs="*", choices=["hgb", "mlp"], default=[],
+                        help="with --compress, also try distilling the pricing forest into these models")
+    args = parser.parse_args(argv)
+
+    nrows = args.rows or None
+    # ✅ The chunked pipeline reads transactions itself, so only load them when needed
+    needs_frames = not args.chunked
+    data = load_data(nrows=nrows) if needs_frames else load_data(nrows=0)
+    fingerprint = data_fingerprint(rows=nrows)
+
+    for name in args.models:
+        version = TRAINERS[name](*data, fingerprint=fingerprint, chunked=args.chunked, nrows=nrows,
+                                 horizon=args.horizon, compress=args.compress, distill=args.distill)
+        print(f"✅ Saved {name} model v{version:04d}")
+
+
+if __name__ == "__main__":
+    main()
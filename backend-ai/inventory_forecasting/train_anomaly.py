@@ -1,94 +1,121 @@
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.model_selection import train_test_split, GridSearchCV, StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+from sklearn.model_selection import train_test_split
 from imblearn.over_sampling import SMOTE
 import pandas as pd
 import numpy as np
+from tuning import successive_halving
+from instrumentation import span
+from encoding import Vocabulary
 
-def preprocess_transactions(transactions, users, products):
+def preprocess_transactions(transactions, users, products, user_aggregates=None):
     """
     Preprocess transactions by merging with users and products data,
     encoding categorical columns, handling missing values, and feature engineering.
+    With `user_aggregates` (chunked_pipeline.UserAggregates) the user totals come from it instead of
+    from the given rows, e.g. totals over every transaction as the scorer and the API use them.
     """
 
     # ✅ Merge transactions with users and products
-    transactions = transactions.merge(users, on="user_id", how="left")
-    transactions = transactions.merge(products, on="product_id", how="left")
+    with span("anomaly.merge", rows_in=len(transactions)) as stage:
+        transactions = transactions.merge(users, on="user_id", how="left")
+        transactions = transactions.merge(products, on="product_id", how="left")
+        stage.rows_out = len(transactions)
 
     # ✅ Feature Engineering: Creating useful new features
-    transactions["user_total_transactions"] = transactions.groupby("user_id")["transaction_id"].transform("count")
-    transactions["user_total_spent"] = transactions.groupby("user_id")["amount"].transform("sum")
-    transactions["avg_spent_per_transaction"] = transactions["user_total_spent"] / transactions["user_total_transactions"]
-    
-    # ✅ Creating a user credibility score (basic formula)
-    transactions["user_credibility"] = (transactions["user_total_transactions"] / transactions["user_total_spent"]).fillna(0)
+    with span("anomaly.user_features", rows_in=len(transactions)):
+        if user_aggregates is not None:
+            (transactions["user_total_transactions"], transactions["user_total_spent"],
+             transactions["avg_spent_per_transaction"], transactions["user_credibility"]) = \
+                user_aggregates.features(transactions["user_id"].to_numpy())
+        else:
+            transactions["user_total_transactions"] = transactions.groupby("user_id")["transaction_id"].transform("count")
+            transactions["user_total_spent"] = transactions.groupby("user_id")["total_price"].transform("sum")
+            transactions["avg_spent_per_transaction"] = transactions["user_total_spent"] / transactions["user_total_transactions"]
+
+            # ✅ Creating a user credibility score (basic formula)
+            transactions["user_credibility"] = (transactions["user_total_transactions"] / transactions["user_total_spent"]).fillna(0)
 
     # ✅ Drop unnecessary columns
-    drop_columns = ["transaction_id", "transaction_date", "user_name", "product_name"]
+    drop_columns = ["transaction_id", "transaction_date", "user_name", "product_name", "email", "location"]
     transactions = transactions.drop(columns=[col for col in drop_columns if col in transactions.columns], errors="ignore")
 
-    # ✅ Encode categorical columns
-    categorical_columns = ["user_id", "product_id", "payment_method", "category"]
-    for col in categorical_columns:
-        if col in transactions.columns:
-            transactions[col] = LabelEncoder().fit_transform(transactions[col].astype(str))
+    # ✅ Encode categorical columns (numeric ids are kept as-is, matching chunked_pipeline) with the
+    # cache's vocabularies, the ones saved with the model; other text columns get a fitted vocabulary
+    from chunked_pipeline import anomaly_encoders
+
+    with span("anomaly.encode", rows_in=len(transactions)):
+        encoders = anomaly_encoders()
+        categorical_columns = ["user_id", "product_id", "payment_method", "category"]
+        for col in categorical_columns:
+            if col not in transactions.columns or pd.api.types.is_numeric_dtype(transactions[col]):
+                continue
+            vocabulary = encoders[col] if col in encoders else Vocabulary.fit(transactions[col])
+            transactions[col] = vocabulary.encode(transactions[col])
 
     # ✅ Handle missing values separately for numeric and categorical columns
-    for col in transactions.select_dtypes(include=["number"]).columns:
-        transactions[col] = transactions[col].fillna(transactions[col].median())
+    with span("anomaly.fill_missing", rows_in=len(transactions)):
+        for col in transactions.select_dtypes(include=["number"]).columns:
+            transactions[col] = transactions[col].fillna(transactions[col].median())
 
-    for col in transactions.select_dtypes(include=["object"]).columns:
-        transactions[col] = transactions[col].fillna(transactions[col].mode()[0])
+        for col in transactions.select_dtypes(include=["object"]).columns:
+            transactions[col] = transactions[col].fillna(transactions[col].mode()[0])
 
     return transactions
 
-def train_anomaly_model(transactions, users, products):
+def train_anomaly_model(transactions, users, products, user_aggregates=None):
     """
     Train an optimized RandomForest model to detect fraudulent transactions.
     Uses transactions merged with users and products, handles class imbalance,
     and applies feature selection and tuning.
     """
-    print("✅ 1")
     # ✅ Mark transactions with extremely high quantity as anomalies (Top 1%)
     transactions["is_fraud"] = (transactions["quantity"] > transactions["quantity"].quantile(0.99)).astype(int)
-    print("✅ 2")
     # ✅ Preprocess transactions
-    transactions = preprocess_transactions(transactions, users, products)
-    print("✅ 3")
+    with span("anomaly.preprocess", rows_in=len(transactions)) as stage:
+        transactions = preprocess_transactions(transactions, users, products, user_aggregates)
+        stage.rows_out = len(transactions)
     # ✅ Define features and labels
     X = transactions.drop(columns=["is_fraud"])
     y = transactions["is_fraud"]
-    print("✅ 4")
+    return fit_anomaly_model(X, y)
+
+def fit_anomaly_model(X, y):
+    """
+    Fit the fraud model on an already-built feature matrix
+    (from preprocess_transactions or chunked_pipeline.build_anomaly_matrix).
+    """
     # ✅ Handle Class Imbalance using SMOTE
-    smote = SMOTE(sampling_strategy=0.5, random_state=42)
-    X_resampled, y_resampled = smote.fit_resample(X, y)
-    print("✅ 5")
+    with span("anomaly.smote", rows_in=len(X)) as stage:
+        smote = SMOTE(sampling_strategy=0.5, random_state=42)
+        X_resampled, y_resampled = smote.fit_resample(X, y)
+        stage.rows_out = len(X_resampled)
     # ✅ Feature Scaling
-    scaler = StandardScaler()
-    X_resampled = scaler.fit_transform(X_resampled)
-    print("✅ 6")
+    with span("anomaly.scale", rows_in=len(X_resampled)):
+        scaler = StandardScaler()
+        X_resampled = scaler.fit_transform(X_resampled)
     # ✅ Split into train and test sets
     X_train, X_test, y_train, y_test = train_test_split(X_resampled, y_resampled, test_size=0.2, random_state=42, stratify=y_resampled)
-    print("✅ 7")
-    # ✅ Hyperparameter tuning using GridSearchCV
+    # ✅ Hyperparameter tuning using successive halving (n_estimators and rows are the budget)
     param_grid = {
-        "n_estimators": [100, 200, 300],
         "max_depth": [None, 10, 20, 30],
         "min_samples_split": [2, 5, 10],
         "min_samples_leaf": [1, 2, 4]
     }
-    print("✅ 8")
     rf = RandomForestClassifier(random_state=42)
-    grid_search = GridSearchCV(rf, param_grid, cv=StratifiedKFold(n_splits=5), scoring="accuracy", n_jobs=-1)
-    grid_search.fit(X_train, y_train)
-    print("✅ 9")
-    # ✅ Train best model
-    best_model = grid_search.best_estimator_
-    best_model.fit(X_train, y_train)
+    with span("anomaly.fit", rows_in=len(X_train)):
+        search = successive_halving(
+            rf, param_grid, X_train, y_train, scoring="accuracy",
+            resources={"n_estimators": (100, 300), "n_samples": (max(len(X_train) // 9, 100), len(X_train))},
+            cv=5, stratified=True, name="anomaly",
+        )
+    # ✅ Best model (refit once on the full training set by the search)
+    best_model = search.best_estimator_
 
-    print(f"Best Model Parameters: {grid_search.best_params_}")
-    print(f"Training Accuracy: {best_model.score(X_train, y_train):.4f}")
-    print(f"Test Accuracy: {best_model.score(X_test, y_test):.4f}")
+    print(f"Best Model Parameters: {search.best_params_}")
+    with span("anomaly.evaluate", rows_in=len(X_train) + len(X_test)):
+        print(f"Training Accuracy: {best_model.score(X_train, y_train):.4f}")
+        print(f"Test Accuracy: {best_model.score(X_test, y_test):.4f}")
 
     return best_model, scaler  # Returning scaler for consistent transformation in future
 
@@ -1,64 +1,57 @@
-import pandas as pd
-import numpy as np
 from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor
-from sklearn.model_selection import RandomizedSearchCV, train_test_split, cross_val_score
+from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import RobustScaler
 from sklearn.metrics import mean_absolute_error
+from tuning import successive_halving
+from instrumentation import span
+
+# ✅ Features the pricing model is trained on (and must be served with), in order
+PRICING_FEATURES = ["quantity", "product_id", "cost_per_unit", "price_per_unit", "stock_level",
+                    "reliability_score", "capacity", "cost_reliability", "price_stock_ratio", "warehouse_utilization"]
+
+# ✅ Held-out share of the rows and the split seed (compression re-creates the same split)
+TEST_SIZE = 0.2
+SPLIT_SEED = 42
+
 
 def train_pricing_model(transactions, products, suppliers, warehouses):
     print("✅ Starting Pricing Model Training...")
+    X, y = build_pricing_frame(transactions, products, suppliers, warehouses)
+    return fit_pricing_model(X, y)
+
+
+def build_pricing_frame(transactions, products, suppliers, warehouses, workers=None):
+    """
+    Pricing features (PRICING_FEATURES) and the log total price target from the raw tables.
+    The input frames are left untouched (see pricing_features.py).
+    """
+    from pricing_features import pricing_frame
 
-    # Convert IDs to numeric
-    transactions["product_id"] = pd.to_numeric(transactions["product_id"], errors="coerce")
-    products["product_id"] = pd.to_numeric(products["product_id"], errors="coerce")
-    suppliers["supplier_id"] = pd.to_numeric(suppliers["supplier_id"], errors="coerce")
-    warehouses["warehouse_id"] = pd.to_numeric(warehouses["warehouse_id"], errors="coerce")
-
-    # Merge transactions with products, suppliers, and warehouses
-    transactions = transactions.merge(
-        products[["product_id", "supplier_id", "cost_per_unit", "price_per_unit", "stock_level", "warehouse_id"]],
-        on="product_id", how="left"
-    ).merge(
-        suppliers[["supplier_id", "reliability_score"]],
-        on="supplier_id", how="left"
-    ).merge(
-        warehouses[["warehouse_id", "capacity"]],
-        on="warehouse_id", how="left"
-    )
-
-    print("✅ 1 - Data Merged")
-
-    # Handle missing values
-    transactions.fillna(transactions.select_dtypes(include=['number']).median(), inplace=True)
-    for col in transactions.select_dtypes(include=['object']).columns:
-        transactions[col] = transactions[col].fillna(transactions[col].mode()[0])
-    print("✅ 2 - Missing Value Handling Done")
-
-    # Feature Engineering
-    transactions["cost_reliability"] = transactions["cost_per_unit"] * transactions["reliability_score"]
-    transactions["price_stock_ratio"] = transactions["price_per_unit"] / (transactions["stock_level"] + 1)
-    transactions["warehouse_utilization"] = transactions["quantity"] / (transactions["capacity"] + 1)
-    transactions["log_total_price"] = np.log1p(transactions["total_price"])  # Log transform for skewness
-
-    # Feature selection
-    features = ["quantity", "product_id", "cost_per_unit", "price_per_unit", "stock_level", 
-                "reliability_score", "capacity", "cost_reliability", "price_stock_ratio", "warehouse_utilization"]
-    target = "log_total_price"
-
-    X = transactions[features]
-    y = transactions[target]
+    return pricing_frame(transactions, products, suppliers, warehouses, workers=workers)
 
+
+def split_pricing(X_scaled, y):
+    """
+    Train/test split used by fit_pricing_model.
+    """
+    return train_test_split(X_scaled, y, test_size=TEST_SIZE, random_state=SPLIT_SEED)
+
+
+def fit_pricing_model(X, y, compare_extra_trees=False):
+    """
+    Fit the pricing model on an already-built feature matrix
+    (from train_pricing_model or chunked_pipeline.build_pricing_matrix).
+    """
     # Normalize features using RobustScaler
-    scaler = RobustScaler()
-    X_scaled = scaler.fit_transform(X)
-    print("✅ 3 - Feature Scaling Done")
+    with span("pricing.scale", rows_in=len(X)):
+        scaler = RobustScaler()
+        X_scaled = scaler.fit_transform(X)
 
     # Train-Test Split
-    X_train, X_test, y_train, y_test = train_test_split(X_scaled, y, test_size=0.2, random_state=42)
+    X_train, X_test, y_train, y_test = split_pricing(X_scaled, y)
 
-    # Expanded hyperparameter tuning space
+    # Expanded hyperparameter tuning space (n_estimators is the halving budget below)
     param_grid = {
-        "n_estimators": [100, 300, 500, 700],  # Increased upper range
         "max_depth": [10, 20, 30, 40, None],  # Added deeper trees
         "min_samples_split": [2, 5, 10, 20],  # More granularity
         "min_samples_leaf": [1, 2, 4, 8],  # More variations
@@ -66,39 +59,38 @@ def train_pricing_model(transactions, products, suppliers, warehouses):
         "bootstrap": [True, False],
         "criterion": ["squared_error", "absolute_error", "poisson"],  # Different loss functions
     }
-    print("✅ 4 - Hyperparameter Grid Defined")
 
     model = RandomForestRegressor(random_state=42)
 
-    # Increased `n_iter` for a better search
-    search = RandomizedSearchCV(
-        model, param_distributions=param_grid, n_iter=5, cv=3, n_jobs=-1, 
-        scoring="neg_mean_absolute_error", random_state=42
-    )
-    print("✅ 5 - Hyperparameter Tuning Started")
-    
-    search.fit(X_train, y_train)
-    print("✅ 6 - Hyperparameter Tuning Completed")
-
-    # Best model
+    # Successive halving: candidates start on 100 trees and 1/9 of the rows, survivors get more of both
+    with span("pricing.fit", rows_in=len(X_train)):
+        search = successive_halving(
+            model, param_grid, X_train, y_train, scoring="neg_mean_absolute_error",
+            resources={"n_estimators": (100, 700), "n_samples": (max(len(X_train) // 9, 100), len(X_train))},
+            cv=3, n_candidates=9, name="pricing",
+        )
+
+    # Best model (already refit once on the full training set by the search)
     best_model = search.best_estimator_
     print(f"🔥 Best Model: {best_model}")
 
-    # Cross-validation score
-    cv_score = cross_val_score(best_model, X_train, y_train, cv=5, scoring="neg_mean_absolute_error").mean()
-    print(f"📊 Cross-Validation MAE: {-cv_score:.4f}")
+    # Cross-validation score of the winning candidate, reused from the search
+    print(f"📊 Cross-Validation MAE: {-search.best_score_:.4f}")
 
     # Evaluate on test set
-    y_pred = best_model.predict(X_test)
+    with span("pricing.predict", rows_in=len(X_test)):
+        y_pred = best_model.predict(X_test)
     test_mae = mean_absolute_error(y_test, y_pred)
     print(f"📈 Test MAE: {test_mae:.4f}")
 
-    # Try ExtraTreesRegressor for comparison
-    extra_trees = ExtraTreesRegressor(n_estimators=500, random_state=42)
-    extra_trees.fit(X_train, y_train)
-    y_pred_extra = extra_trees.predict(X_test)
-    extra_mae = mean_absolute_error(y_test, y_pred_extra)
-    print(f"⚡ Extra Trees Regressor MAE: {extra_mae:.4f}")
+    # Try ExtraTreesRegressor for comparison (opt-in, it is another 500-tree fit)
+    extra_trees = None
+    if compare_extra_trees:
+        extra_trees = ExtraTreesRegressor(n_estimators=500, random_state=42, n_jobs=-1)
+        extra_trees.fit(X_train, y_train)
+        y_pred_extra = extra_trees.predict(X_test)
+        extra_mae = mean_absolute_error(y_test, y_pred_extra)
+        print(f"⚡ Extra Trees Regressor MAE: {extra_mae:.4f}")
 
     print("✅ Pricing Model Training Completed Successfully! 🚀")
 
@@ -1,12 +1,44 @@
+import numpy as np
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense
+from tensorflow.keras.layers import LSTM, Dense, Input
 
-def train_tft(time_series_data):
+from forecasting import product_scale, DEFAULT_WINDOW, DEFAULT_HORIZON
+
+
+def make_windows(demand, window=DEFAULT_WINDOW, horizon=DEFAULT_HORIZON, max_samples=200_000, seed=42):
+    """
+    Sample (history, next `horizon` days) training pairs from every product series,
+    scaled per product. Returns X of shape (n, window, 1) and Y of shape (n, horizon).
+    """
+    n_products, n_days = demand.shape
+    n_starts = n_days - window - horizon + 1
+    if n_starts < 1:
+        raise ValueError(f"Need at least {window + horizon} days of history, got {n_days}.")
+
+    rng = np.random.default_rng(seed)
+    n_samples = min(max_samples, n_products * n_starts)
+    products = rng.integers(0, n_products, n_samples)
+    starts = rng.integers(0, n_starts, n_samples)
+
+    scaled = demand / product_scale(demand)[:, None]
+    offsets = np.arange(window + horizon)
+    windows = scaled[products[:, None], starts[:, None] + offsets]
+    return windows[:, :window, np.newaxis].astype(np.float32), windows[:, window:].astype(np.float32)
+
+
+def train_tft(demand, window=DEFAULT_WINDOW, horizon=DEFAULT_HORIZON, epochs=5, batch_size=1024):
+    """
+    Train a direct multi-horizon model: (window days of history) -> (next `horizon` days),
+    shared across all products.
+    """
+    X, Y = make_windows(demand, window, horizon)
     model = Sequential([
-        LSTM(64, return_sequences=True, input_shape=(1, 2)),
+        Input(shape=(window, 1)),
+        LSTM(64, return_sequences=True),
         LSTM(32, return_sequences=False),
-        Dense(1)
+        Dense(horizon)
     ])
     model.compile(optimizer="adam", loss="mse")
+    model.fit(X, Y, epochs=epochs, batch_size=batch_size, validation_split=0.1, verbose=2)
     return model
@@ -0,0 +1,126 @@
+"""
+Shared journal of the transactions recorded through the API.
+
+POST /transactions/ appends each transaction to one append-only file next to the columnar cache,
+and every API process folds in the entries it has not applied yet (its own and other workers')
+before it reads the feature store or the profit cube. The workers of api/serve.py therefore all
+converge on the same online aggregates, and a worker forked later (a SIGHUP hot-swap, a replaced
+worker) replays whatever was recorded since the parent loaded them. Snapshots store the journal
+offset they include, so a restart restores the snapshot and replays only the rest: it does not
+matter which worker's snapshot was written last.
+
+Aggregates rebuilt from the source data (a new data fingerprint) replay the whole journal, since
+transactions recorded through the API are not part of the source files.
+
+    online = OnlineAggregates(feature_store, profit_cube)
+    online.record(user_id, product_id, quantity, total_price, date)
+    online.sync()                        # before reading feature_store / profit_cube
+"""
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from data_loader import CACHE_DIR
+from feature_store import SNAPSHOT_EVERY
+
+# ✅ Journal location (derived data, lives next to the columnar cache and the snapshots)
+LOG_PATH = CACHE_DIR / "transaction_log.bin"
+
+# ✅ One fixed-size binary record per transaction
+RECORD = np.dtype([("user_id", "<i8"), ("product_id", "<i8"), ("quantity", "<i8"), ("amount", "<f8"),
+                   ("date", "<M8[D]")])
+
+
+class TransactionLog:
+    """
+    Append-only file of RECORD entries. Each append is a single O_APPEND write, so records of
+    concurrent processes never interleave; readers only consume whole records.
+    """
+
+    def __init__(self, path=LOG_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def append(self, user_id, product_id, quantity, amount, date):
+        record = np.array([(user_id, product_id, quantity, amount, np.datetime64(date, "D"))], dtype=RECORD)
+        os.write(self._fd, record.tobytes())
+
+    def size(self):
+        return os.fstat(self._fd).st_size
+
+    def read(self, offset):
+        """
+        (records, next offset): the whole records from byte `offset` to the current end.
+        """
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        count = len(data) // RECORD.itemsize
+        return np.frombuffer(data, dtype=RECORD, count=count), offset + count * RECORD.itemsize
+
+
+class OnlineAggregates:
+    """
+    The API's feature store and profit cube, kept in step with the transaction journal. Each store
+    carries `log_offset`, the journal position it includes.
+    """
+
+    def __init__(self, feature_store, profit_cube, log=None):
+        self.feature_store = feature_store
+        self.profit_cube = profit_cube
+        self.log = log or TransactionLog()
+        self._since_snapshot = 0
+        self._lock = threading.Lock()
+
+    @property
+    def stores(self):
+        return self.feature_store, self.profit_cube
+
+    def record(self, user_id, product_id, quantity, amount, date):
+        """
+        Append one transaction to the journal, then fold in everything new (this one included).
+        """
+        self.log.append(user_id, product_id, quantity, amount, date)
+        self.sync()
+
+    def sync(self):
+        """
+        Fold the journal entries this process has not applied yet into both stores; returns their number.
+        """
+        with self._lock:
+            # ✅ A store ahead of the journal means the journal was replaced: replay it from the start
+            size = self.log.size()
+            for store in self.stores:
+                if store.log_offset > size:
+                    store.log_offset = 0
+            start = min(store.log_offset for store in self.stores)
+            records, end = self.log.read(start)
+            if not len(records):
+                return 0
+
+            for store in self.stores:
+                new = records[(store.log_offset - start) // RECORD.itemsize:]
+                if len(new) and store is self.feature_store:
+                    store.update_batch(new["user_id"], new["product_id"], new["quantity"], new["amount"])
+                elif len(new):
+                    # ✅ Skipped like unknown products, so one such entry cannot stall every worker's sync
+                    new = new[new["date"] >= store.start_date]
+                    store.update(new["product_id"], new["quantity"], new["amount"], new["date"])
+                store.log_offset = end
+            self._since_snapshot += len(records)
+            due = SNAPSHOT_EVERY and self._since_snapshot >= SNAPSHOT_EVERY
+        if due:
+            self.snapshot()
+        return len(records)
+
+    def snapshot(self):
+        """
+        Snapshot both stores together with the journal offset they include.
+        """
+        with self._lock:
+            self._since_snapshot = 0
+            for store in self.stores:
+                store.snapshot()
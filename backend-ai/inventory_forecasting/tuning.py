@@ -0,0 +1,225 @@
+import hashlib
+import json
+import math
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import KFold, StratifiedKFold, ParameterGrid, ParameterSampler
+
+from model_registry import MODELS_DIR
+
+# ✅ Fold splits and per-candidate scores are cached here, keyed by the data fingerprint
+TUNING_CACHE_DIR = Path(os.environ.get("INVENTORY_TUNING_CACHE", MODELS_DIR / "tuning_cache"))
+
+
+def array_fingerprint(X, y):
+    """
+    Hash of the training data itself, so cached results are only reused for identical data.
+    """
+    digest = hashlib.sha1()
+    for values in (X, y):
+        values = np.ascontiguousarray(np.asarray(values))
+        digest.update(str((values.shape, values.dtype)).encode())
+        digest.update(values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _candidate_key(params, budget, search_id):
+    payload = json.dumps({"params": params, "budget": budget, "search": search_id}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def _json_safe(params):
+    return {k: (v.item() if isinstance(v, np.generic) else v) for k, v in params.items()}
+
+
+class TuningResult:
+    """
+    Outcome of a search, exposing the same attributes as sklearn's *SearchCV objects.
+    """
+
+    def __init__(self, best_estimator, best_params, best_score, cv_results, rungs):
+        self.best_estimator_ = best_estimator
+        self.best_params_ = best_params
+        self.best_score_ = best_score
+        self.cv_results_ = cv_results
+        self.rungs_ = rungs
+
+
+class _ResultCache:
+    """
+    Append-only JSON-lines file of evaluated (candidate, budget) pairs plus the cached fold splits.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.results = {}
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            results_path = self.cache_dir / "results.jsonl"
+            if results_path.exists():
+                with open(results_path) as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            self.results[entry["key"]] = entry
+
+    def folds(self, cv, X, y):
+        """
+        Train/validation indices for every fold, loaded from disk when already computed.
+        """
+        if self.cache_dir is not None:
+            folds_path = self.cache_dir / f"folds-{type(cv).__name__}-{cv.get_n_splits()}.npz"
+            if folds_path.exists():
+                with np.load(folds_path) as saved:
+                    return [(saved[f"train_{i}"], saved[f"test_{i}"]) for i in range(len(saved.files) // 2)]
+        folds = [(train.astype(np.int32), test.astype(np.int32)) for train, test in cv.split(X, y)]
+        if self.cache_dir is not None:
+            arrays = {}
+            for i, (train, test) in enumerate(folds):
+                arrays[f"train_{i}"], arrays[f"test_{i}"] = train, test
+            np.savez(self.cache_dir / f"folds-{type(cv).__name__}-{cv.get_n_splits()}.npz", **arrays)
+        return folds
+
+    def add(self, entry):
+        self.results[entry["key"]] = entry
+        if self.cache_dir is not None:
+            with open(self.cache_dir / "results.jsonl", "a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+
+
+def _fit_and_score(estimator, params, budget, X, y, train, test, scorer, random_state):
+    """
+    Fit one candidate on one fold at the given budget; returns (score, wall seconds, cpu seconds).
+    """
+    started_wall, started_cpu = time.perf_counter(), time.process_time()
+    params = dict(params)
+    n_samples = budget.get("n_samples")
+    params.update({k: v for k, v in budget.items() if k != "n_samples"})
+
+    if n_samples is not None and n_samples < len(train):
+        train = np.random.default_rng(random_state).choice(train, size=n_samples, replace=False)
+
+    model = clone(estimator).set_params(**params)
+    model.fit(X[train], y[train])
+    score = scorer(model, X[test], y[test])
+    return float(score), time.perf_counter() - started_wall, time.process_time() - started_cpu
+
+
+def _budget_at(resources, rung, factor):
+    """
+    Budget of every resource at a rung: min * factor**rung, capped at max.
+    """
+    budget = {}
+    for name, (low, high) in resources.items():
+        budget[name] = int(min(high, low * factor ** rung))
+    return budget
+
+
+def _is_max_budget(resources, budget):
+    return all(budget[name] >= high for name, (_, high) in resources.items())
+
+
+def successive_halving(estimator, param_space, X, y, scoring, resources, cv=5, stratified=False,
+                       factor=3, n_candidates=None, random_state=42, n_jobs=-1, name="search",
+                       cache_dir=None, fingerprint=None, verbose=True):
+    """
+    Successive-halving search over `param_space`.
+
+    Every candidate starts on a small budget (e.g. few trees and/or a subsample of rows, given by
+    `resources` as {name: (min, max)} where name is "n_samples" or an estimator parameter such as
+    "n_estimators"). After each rung only the best 1/`factor` survive and their budget grows by
+    `factor`, until one candidate is left or the budget is maxed out. The winner is refit once on
+    all of X/y, so no separate cross_val_score or second fit is needed.
+
+    Fold splits and per-(candidate, budget) scores are cached under
+    TUNING_CACHE_DIR/name/<fingerprint>, so a rerun on the same data resumes instead of starting over.
+    Wall-clock and CPU seconds are recorded for every candidate evaluation.
+    """
+    X = np.asarray(X)
+    y = np.asarray(y)
+    scorer = get_scorer(scoring)
+    if isinstance(cv, int):
+        cv = (StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state) if stratified
+              else KFold(n_splits=cv, shuffle=True, random_state=random_state))
+
+    # ✅ cache_dir=False disables the on-disk cache
+    fingerprint = fingerprint or array_fingerprint(X, y)
+    if cache_dir is None:
+        cache_dir = TUNING_CACHE_DIR / name / fingerprint
+    cache = _ResultCache(cache_dir if cache_dir is not False else None)
+    folds = cache.folds(cv, X, y)
+    search_id = {"estimator": type(estimator).__name__, "scoring": scoring}
+
+    if n_candidates is None:
+        candidates = list(ParameterGrid(param_space))
+    else:
+        candidates = list(ParameterSampler(param_space, n_iter=n_candidates, random_state=random_state))
+    candidates = [_json_safe(params) for params in candidates]
+
+    # ✅ Estimators run single-threaded; parallelism is across (candidate, fold) pairs
+    if "n_jobs" in estimator.get_params():
+        estimator = clone(estimator).set_params(n_jobs=1)
+
+    cv_results = []
+    rungs = []
+    rung = 0
+    while True:
+        budget = _budget_at(resources, rung, factor)
+        pending = []
+        for params in candidates:
+            key = _candidate_key(params, budget, search_id)
+            if key not in cache.results:
+                pending.append((key, params))
+
+        tasks = [(key, params, fold) for key, params in pending for fold in range(len(folds))]
+        outputs = Parallel(n_jobs=n_jobs)(
+            delayed(_fit_and_score)(estimator, params, budget, X, y, folds[fold][0], folds[fold][1], scorer, random_state)
+            for key, params, fold in tasks
+        )
+        by_key = {}
+        for (key, params, fold), output in zip(tasks, outputs):
+            by_key.setdefault(key, (params, []))[1].append(output)
+        for key, (params, fold_outputs) in by_key.items():
+            scores = [score for score, _, _ in fold_outputs]
+            cache.add({
+                "key": key,
+                "params": params,
+                "budget": budget,
+                "mean_score": float(np.mean(scores)),
+                "fold_scores": scores,
+                "wall_seconds": float(sum(wall for _, wall, _ in fold_outputs)),
+                "cpu_seconds": float(sum(cpu for _, _, cpu in fold_outputs)),
+            })
+
+        evaluated = [cache.results[_candidate_key(params, budget, search_id)] for params in candidates]
+        cv_results.extend({**entry, "rung": rung} for entry in evaluated)
+        rungs.append({"rung": rung, "budget": budget, "candidates": len(candidates),
+                      "evaluated": len(pending), "cached": len(candidates) - len(pending)})
+        if verbose:
+            for entry in evaluated:
+                print(f"⏱️ [{name}] rung {rung} {entry['params']} score={entry['mean_score']:.4f} "
+                      f"wall={entry['wall_seconds']:.2f}s cpu={entry['cpu_seconds']:.2f}s")
+
+        ranked = sorted(evaluated, key=lambda entry: entry["mean_score"], reverse=True)
+        survivors = ranked[:max(1, math.ceil(len(ranked) / factor))]
+        if len(survivors) == 1 or _is_max_budget(resources, budget):
+            best = ranked[0]
+            break
+        candidates = [entry["params"] for entry in survivors]
+        rung += 1
+
+    # ✅ Single refit of the winner on all the data at the full budget
+    final_budget = {name: high for name, (_, high) in resources.items() if name != "n_samples"}
+    best_params = {**best["params"], **final_budget}
+    best_estimator = clone(estimator).set_params(**best_params)
+    if "n_jobs" in best_estimator.get_params():
+        best_estimator.set_params(n_jobs=n_jobs)
+    best_estimator.fit(X, y)
+
+    return TuningResult(best_estimator, best_params, best["mean_score"], cv_results, rungs)
@@ -1,72 +1,302 @@
-import pandas as pd
+"""
+Synthetic users / suppliers / warehouses / products / transactions for scale tests.
+
+    python scripts/data.py                                     # 1M transactions -> columnar cache
+    python scripts/data.py --transactions 50000000 --workers 8 # 50M rows, 8 processes
+    python scripts/data.py --format csv                        # the original data/*.csv files
+    python scripts/data.py --zipf 1.1 --fraud-rate 0.01        # hot products and fraud bursts
+
+Every column is generated with vectorised NumPy; Faker is only used to build small vocabularies
+(names, cities, words) that rows index into. Transactions are produced in fixed-size chunks, each
+by a pool worker seeded from (seed, chunk index), so the output is identical for any --workers.
+In columnar mode each worker writes its slice straight into preallocated memory-mapped .npy files
+in the data_loader layout, so no chunk ever passes back through the parent process.
+"""
+import argparse
+import math
+import os
+import sys
+from datetime import date
+from multiprocessing import Pool
+from pathlib import Path
+
 import numpy as np
+import pandas as pd
 from faker import Faker
-from datetime import datetime, timedelta
-from random import randint, choice
-
-fake = Faker()
-np.random.seed(42)
-
-# ✅ Number of records
-num_users = 50_000
-num_products = 10_000
-num_suppliers = 500
-num_warehouses = 200
-num_transactions = 1_000_000
-
-# ✅ Generate Users
-users = pd.DataFrame({
-    "user_id": range(1, num_users + 1),
-    "user_name": [fake.name() for _ in range(num_users)],
-    "email": [fake.email() for _ in range(num_users)],
-    "location": [fake.city() for _ in range(num_users)],
-})
-
-# ✅ Generate Suppliers
-suppliers = pd.DataFrame({
-    "supplier_id": range(1, num_suppliers + 1),
-    "supplier_name": [fake.company() for _ in range(num_suppliers)],
-    "contact_email": [fake.company_email() for _ in range(num_suppliers)],
-    "reliability_score": np.random.uniform(50, 100, num_suppliers),
-})
-
-# ✅ Generate Warehouses (Linked to Suppliers)
-warehouses = pd.DataFrame({
-    "warehouse_id": range(1, num_warehouses + 1),
-    "warehouse_name": [f"WH-{i}" for i in range(1, num_warehouses + 1)],
-    "location": [fake.city() for _ in range(num_warehouses)],
-    "capacity": np.random.randint(1000, 10000, num_warehouses),
-    "supplier_id": np.random.randint(1, num_suppliers + 1, num_warehouses),  # 🔗 Linked to suppliers
-})
-
-# ✅ Generate Products (Linked to Suppliers & Warehouses)
-products = pd.DataFrame({
-    "product_id": range(1, num_products + 1),
-    "product_name": [fake.word() for _ in range(num_products)],
-    "category": np.random.choice(["Electronics", "Clothing", "Food", "Furniture", "Books"], num_products),
-    "cost_per_unit": np.random.uniform(10, 1000, num_products),
-    "price_per_unit": np.random.uniform(50, 2000, num_products),
-    "stock_level": np.random.randint(1, 500, num_products),
-    "supplier_id": np.random.randint(1, num_suppliers + 1, num_products),  # 🔗 Linked to suppliers
-    "warehouse_id": np.random.randint(1, num_warehouses + 1, num_products),  # 🔗 Linked to warehouses
-})
-
-# ✅ Generate Transactions (Linked to Users & Products)
-transactions = pd.DataFrame({
-    "transaction_id": [f"T{fake.random_int(10000, 99999)}" for _ in range(num_transactions)],
-    "user_id": np.random.randint(1, num_users + 1, num_transactions),  # 🔗 Linked to users
-    "product_id": np.random.randint(1, num_products + 1, num_transactions),  # 🔗 Linked to products
-    "quantity": np.random.randint(1, 10, num_transactions),
-    "total_price": np.random.uniform(100, 5000, num_transactions),
-    "payment_method": np.random.choice(["Credit Card", "PayPal", "Cash", "UPI"], num_transactions),
-    "transaction_date": [datetime.now() - timedelta(days=randint(1, 365)) for _ in range(num_transactions)],
-})
-
-# ✅ Save as CSV
-users.to_csv("./data/users.csv", index=False)
-suppliers.to_csv("./data/suppliers.csv", index=False)
-warehouses.to_csv("./data/warehouses.csv", index=False)
-products.to_csv("./data/products.csv", index=False)
-transactions.to_csv("./data/transactions.csv", index=False)
-
-print("✅ Interlinked datasets with warehouses created successfully! 🎉")
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "inventory_forecasting"))
+
+# ✅ Default scale (the original 1M-transaction dataset)
+NUM_USERS = 50_000
+NUM_PRODUCTS = 10_000
+NUM_SUPPLIERS = 500
+NUM_WAREHOUSES = 200
+NUM_TRANSACTIONS = 1_000_000
+
+CHUNK_SIZE = 1_000_000
+HISTORY_DAYS = 365
+VOCABULARY_SIZE = 1000
+
+CATEGORIES = ["Electronics", "Clothing", "Food", "Furniture", "Books"]
+# ✅ Sorted, so the codes match what pd.Categorical would assign on ingest
+PAYMENT_METHODS = sorted(["Credit Card", "PayPal", "Cash", "UPI"])
+
+# ✅ dtype of every transactions column as stored in the columnar cache
+TRANSACTION_COLUMNS = {
+    "transaction_id": None,  # fixed-width unicode, sized from the row count
+    "user_id": np.int32,
+    "product_id": np.int32,
+    "quantity": np.int32,
+    "total_price": np.float64,
+    "payment_method": np.int16,
+    "transaction_date": "datetime64[ns]",
+}
+
+
+def vocabularies(seed, size=VOCABULARY_SIZE):
+    """
+    Small pools of fake strings; rows pick from these by index instead of calling Faker per row.
+    """
+    Faker.seed(seed)
+    fake = Faker()
+    return {
+        "first_name": np.array([fake.first_name() for _ in range(size)]),
+        "last_name": np.array([fake.last_name() for _ in range(size)]),
+        "city": np.array([fake.city() for _ in range(size)]),
+        "word": np.array([fake.word() for _ in range(size)]),
+        "company": np.array([fake.company() for _ in range(size)]),
+        "domain": np.array([fake.domain_name() for _ in range(size)]),
+    }
+
+
+def _pick(rng, pool, n):
+    return pool[rng.integers(0, len(pool), n)]
+
+
+def build_dimensions(args, vocab):
+    """
+    users, suppliers, warehouses and products as DataFrames (same columns and ranges as before).
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(args.seed, spawn_key=(0,)))
+    user_ids = np.arange(1, args.users + 1)
+    first, last = _pick(rng, vocab["first_name"], args.users), _pick(rng, vocab["last_name"], args.users)
+    users = pd.DataFrame({
+        "user_id": user_ids,
+        "user_name": pd.Series(first) + " " + pd.Series(last),
+        "email": (pd.Series(np.char.lower(first)) + "." + pd.Series(np.char.lower(last)) + user_ids.astype(str)
+                  + "@example.org"),
+        "location": _pick(rng, vocab["city"], args.users),
+    })
+
+    supplier_ids = np.arange(1, args.suppliers + 1)
+    suppliers = pd.DataFrame({
+        "supplier_id": supplier_ids,
+        "supplier_name": _pick(rng, vocab["company"], args.suppliers),
+        "contact_email": "contact" + pd.Series(supplier_ids.astype(str)) + "@" + _pick(rng, vocab["domain"], args.suppliers),
+        "reliability_score": rng.uniform(50, 100, args.suppliers),
+    })
+
+    warehouse_ids = np.arange(1, args.warehouses + 1)
+    warehouses = pd.DataFrame({
+        "warehouse_id": warehouse_ids,
+        "warehouse_name": "WH-" + pd.Series(warehouse_ids.astype(str)),
+        "location": _pick(rng, vocab["city"], args.warehouses),
+        "capacity": rng.integers(1000, 10000, args.warehouses),
+        "supplier_id": rng.integers(1, args.suppliers + 1, args.warehouses),  # 🔗 Linked to suppliers
+    })
+
+    products = pd.DataFrame({
+        "product_id": np.arange(1, args.products + 1),
+        "product_name": _pick(rng, vocab["word"], args.products),
+        "category": pd.Categorical(_pick(rng, np.array(CATEGORIES), args.products)),
+        "cost_per_unit": rng.uniform(10, 1000, args.products),
+        "price_per_unit": rng.uniform(50, 2000, args.products),
+        "stock_level": rng.integers(1, 500, args.products),
+        "supplier_id": rng.integers(1, args.suppliers + 1, args.products),  # 🔗 Linked to suppliers
+        "warehouse_id": rng.integers(1, args.warehouses + 1, args.products),  # 🔗 Linked to warehouses
+    })
+    return {"users": users, "suppliers": suppliers, "warehouses": warehouses, "products": products}
+
+
+def product_popularity(n_products, zipf, seed):
+    """
+    (cdf, order): sampling `order[searchsorted(cdf, u)]` draws product rows with Zipf(zipf) skew,
+    so a few hot products get most of the traffic. zipf=0 is uniform.
+    """
+    weights = 1.0 / np.arange(1, n_products + 1) ** zipf
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+    order = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(1,))).permutation(n_products)
+    return cdf, order
+
+
+def transaction_ids(start, stop, width):
+    """
+    "T000000001"-style ids for rows [start, stop): unique and monotonic, built digit by digit
+    as UCS-4 code points instead of formatting one string per row.
+    """
+    ids = np.arange(start + 1, stop + 1, dtype=np.int64)
+    chars = np.empty((len(ids), width + 1), dtype=np.uint32)
+    chars[:, 0] = ord("T")
+    for position in range(width):
+        chars[:, width - position] = ids // 10 ** position % 10 + ord("0")
+    return chars.view(f"<U{width + 1}").ravel()
+
+
+def generate_chunk(config, chunk_index, start, stop):
+    """
+    Transactions [start, stop) as {column: array}; depends only on (seed, chunk_index).
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(config["seed"], spawn_key=(2, chunk_index)))
+    n = stop - start
+    cdf, order = config["popularity"]
+
+    product_rows = np.minimum(np.searchsorted(cdf, rng.random(n), side="right"), len(order) - 1)
+    seconds = rng.integers(1, config["days"] + 1, n) * 86400 - rng.integers(0, 86400, n)
+    chunk = {
+        "transaction_id": transaction_ids(start, stop, config["id_width"]),
+        "user_id": rng.integers(1, config["users"] + 1, n).astype(np.int32),  # 🔗 Linked to users
+        "product_id": (order[product_rows] + 1).astype(np.int32),  # 🔗 Linked to products
+        "quantity": rng.integers(1, 10, n).astype(np.int32),
+        "total_price": rng.uniform(100, 5000, n),
+        "payment_method": rng.integers(0, len(PAYMENT_METHODS), n).astype(np.int16),
+        "transaction_date": config["end"] - seconds.astype("timedelta64[s]"),
+    }
+
+    # ✅ Fraud bursts: runs of consecutive rows where one user buys large quantities within minutes
+    burst_size = config["fraud_burst"]
+    n_bursts = math.ceil(rng.binomial(n, config["fraud_rate"]) / burst_size) if config["fraud_rate"] else 0
+    if n_bursts and n > burst_size:
+        starts = rng.integers(0, n - burst_size, n_bursts)
+        rows = (starts[:, None] + np.arange(burst_size)).ravel()
+        burst_of_row = np.repeat(np.arange(n_bursts), burst_size)
+        burst_seconds = rng.integers(1, config["days"] + 1, n_bursts) * 86400
+        chunk["user_id"][rows] = rng.integers(1, config["users"] + 1, n_bursts)[burst_of_row]
+        chunk["quantity"][rows] = rng.integers(10, 50, len(rows))
+        chunk["total_price"][rows] = rng.uniform(5000, 20000, len(rows))
+        chunk["transaction_date"][rows] = config["end"] - (
+            burst_seconds[burst_of_row] - rng.integers(0, 600, len(rows))).astype("timedelta64[s]")
+    chunk["transaction_date"] = chunk["transaction_date"].astype("datetime64[ns]")
+    return chunk
+
+
+# ✅ Per-process state set by the pool initializer (avoids pickling the popularity table per chunk)
+_worker = {}
+
+
+def _init_worker(config, table_dir):
+    _worker["config"] = config
+    _worker["table_dir"] = table_dir
+
+
+def _write_chunk(task):
+    """
+    Pool task: generate one chunk and write it into the preallocated column files.
+    """
+    chunk_index, start, stop = task
+    chunk = generate_chunk(_worker["config"], chunk_index, start, stop)
+    for column, values in chunk.items():
+        target = np.load(os.path.join(_worker["table_dir"], f"{column}.npy"), mmap_mode="r+")
+        target[start:stop] = values
+        target.flush()
+        del target
+    return stop - start
+
+
+def _csv_chunk(task):
+    chunk_index, start, stop = task
+    chunk = generate_chunk(_worker["config"], chunk_index, start, stop)
+    chunk["payment_method"] = np.asarray(PAYMENT_METHODS)[chunk["payment_method"]]
+    return pd.DataFrame(chunk)
+
+
+def chunk_tasks(total, chunk_size):
+    return [(i, start, min(start + chunk_size, total)) for i, start in enumerate(range(0, total, chunk_size))]
+
+
+def write_transactions_columnar(config, total, chunk_size, workers):
+    from data_loader import CACHE_VERSION, staging_dir, publish_table
+
+    tmp_dir = staging_dir("transactions")
+    meta = {"version": CACHE_VERSION, "table": "transactions", "rows": total, "columns": {}, "source": None}
+    for column, dtype in TRANSACTION_COLUMNS.items():
+        dtype = np.dtype(dtype or f"<U{config['id_width'] + 1}")
+        np.lib.format.open_memmap(tmp_dir / f"{column}.npy", mode="w+", dtype=dtype, shape=(total,)).flush()
+        column_meta = {"kind": "numeric", "dtype": str(dtype)}
+        if column == "payment_method":
+            column_meta.update({"kind": "category", "categories": PAYMENT_METHODS})
+        elif column == "transaction_date":
+            column_meta["kind"] = "datetime"
+        elif column == "transaction_id":
+            column_meta["kind"] = "str"
+        meta["columns"][column] = column_meta
+
+    written = 0
+    with Pool(workers, initializer=_init_worker, initargs=(config, str(tmp_dir))) as pool:
+        for rows in pool.imap_unordered(_write_chunk, chunk_tasks(total, chunk_size)):
+            written += rows
+            print(f"✅ {written:,}/{total:,} transactions")
+    publish_table("transactions", tmp_dir, meta)
+
+
+def write_transactions_csv(config, total, chunk_size, workers, path):
+    with Pool(workers, initializer=_init_worker, initargs=(config, None)) as pool:
+        # ✅ imap keeps chunk order, so the file is identical to a single-process run
+        for i, chunk in enumerate(pool.imap(_csv_chunk, chunk_tasks(total, chunk_size))):
+            chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+            print(f"✅ {min((i + 1) * chunk_size, total):,}/{total:,} transactions")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate interlinked synthetic datasets")
+    parser.add_argument("--users", type=int, default=NUM_USERS)
+    parser.add_argument("--products", type=int, default=NUM_PRODUCTS)
+    parser.add_argument("--suppliers", type=int, default=NUM_SUPPLIERS)
+    parser.add_argument("--warehouses", type=int, default=NUM_WAREHOUSES)
+    parser.add_argument("--transactions", type=int, default=NUM_TRANSACTIONS)
+    parser.add_argument("--days", type=int, default=HISTORY_DAYS, help="days of transaction history")
+    parser.add_argument("--end-date", default=str(date.today()), help="last day of history (YYYY-MM-DD)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--zipf", type=float, default=0.0,
+                        help="product popularity skew (0 = uniform, ~1 = a few hot products)")
+    parser.add_argument("--fraud-rate", type=float, default=0.0, help="fraction of transactions in fraud bursts")
+    parser.add_argument("--fraud-burst", type=int, default=20, help="transactions per fraud burst")
+    parser.add_argument("--format", choices=["columnar", "csv"], default="columnar")
+    parser.add_argument("--data-dir", help="output directory (default: data_loader.DATA_DIR)")
+    args = parser.parse_args(argv)
+
+    # ✅ data_loader reads the data directory when it is imported
+    if args.data_dir:
+        os.environ["INVENTORY_DATA_DIR"] = str(Path(args.data_dir).resolve())
+    from data_loader import DATA_DIR, write_table
+
+    vocab = vocabularies(args.seed)
+    tables = build_dimensions(args, vocab)
+    config = {
+        "seed": args.seed,
+        "users": args.users,
+        "days": args.days,
+        "end": np.datetime64(args.end_date, "s") + np.timedelta64(1, "D"),
+        "id_width": max(9, len(str(args.transactions))),
+        "popularity": product_popularity(args.products, args.zipf, args.seed),
+        "fraud_rate": args.fraud_rate,
+        "fraud_burst": args.fraud_burst,
+    }
+
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    if args.format == "csv":
+        for name, df in tables.items():
+            df.to_csv(DATA_DIR / f"{name}.csv", index=False)
+        write_transactions_csv(config, args.transactions, args.chunk_size, args.workers, DATA_DIR / "transactions.csv")
+    else:
+        for name, df in tables.items():
+            write_table(name, df)
+        write_transactions_columnar(config, args.transactions, args.chunk_size, args.workers)
+
+    print("✅ Interlinked datasets with warehouses created successfully! 🎉")
+
+
+if __name__ == "__main__":
+    main()
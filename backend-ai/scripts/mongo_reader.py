@@ -0,0 +1,136 @@
+"""
+Read MongoDB collections straight into typed NumPy arrays.
+
+Only the requested fields are projected, the filter / date range is evaluated by the server, and
+documents arrive through a cursor with a large batch_size. Rows are copied field by field into
+preallocated arrays, so no DataFrame or list of every document is ever built.
+
+    arrays = read_arrays(db.transactions, {"user_id": np.int32, "product_id": np.int32})
+    for batch in iter_batches(db.transactions, fields, rows=65536): ...
+    dataset = make_dataset(db.transactions, fields, rows=65536)   # tf.data pipeline
+"""
+import numpy as np
+
+# ✅ Documents per server round trip, and rows per yielded batch
+CURSOR_BATCH_SIZE = 50_000
+BATCH_ROWS = 65_536
+
+# ✅ Value used when a document lacks a field
+MISSING = {"i": -1, "u": 0, "f": np.nan, "M": np.datetime64("NaT"), "U": "", "b": False}
+
+
+def build_query(filter=None, date_field=None, start=None, end=None):
+    """
+    Server-side filter: `filter` plus an optional [start, end) range on `date_field`.
+    """
+    query = dict(filter or {})
+    if date_field and (start is not None or end is not None):
+        date_range = {}
+        if start is not None:
+            date_range["$gte"] = start
+        if end is not None:
+            date_range["$lt"] = end
+        query[date_field] = date_range
+    return query
+
+
+def _cursor(collection, fields, query, cursor_batch_size):
+    projection = {name: 1 for name in fields}
+    projection["_id"] = 0
+    return collection.find(query, projection, batch_size=cursor_batch_size)
+
+
+def _fill(arrays, position, documents):
+    """
+    Copy a list of documents into `arrays` starting at `position`, one field at a time.
+    """
+    for name, values in arrays.items():
+        missing = MISSING.get(values.dtype.kind)
+        values[position:position + len(documents)] = [doc.get(name, missing) for doc in documents]
+
+
+def iter_batches(collection, fields, filter=None, date_field=None, start=None, end=None, rows=BATCH_ROWS,
+                 cursor_batch_size=CURSOR_BATCH_SIZE, limit=0):
+    """
+    Yield {field: array} batches of up to `rows` documents; `fields` maps field name -> dtype.
+    The same preallocated buffers are refilled for every batch, so copy a batch you keep.
+    """
+    query = build_query(filter, date_field, start, end)
+    buffers = {name: np.empty(rows, dtype=dtype) for name, dtype in fields.items()}
+    cursor = _cursor(collection, fields, query, cursor_batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    pending = []
+    for document in cursor:
+        pending.append(document)
+        if len(pending) == rows:
+            _fill(buffers, 0, pending)
+            pending = []
+            yield buffers
+    if pending:
+        _fill(buffers, 0, pending)
+        yield {name: values[:len(pending)] for name, values in buffers.items()}
+
+
+def read_arrays(collection, fields, filter=None, date_field=None, start=None, end=None,
+                cursor_batch_size=CURSOR_BATCH_SIZE, chunk_rows=BATCH_ROWS):
+    """
+    Whole result as {field: array}, preallocated from a server-side count_documents.
+    """
+    query = build_query(filter, date_field, start, end)
+    total = collection.count_documents(query)
+    arrays = {name: np.empty(total, dtype=dtype) for name, dtype in fields.items()}
+
+    filled = 0
+    pending = []
+    for document in _cursor(collection, fields, query, cursor_batch_size):
+        pending.append(document)
+        if len(pending) == chunk_rows:
+            arrays = _ensure_capacity(arrays, filled + len(pending))
+            _fill(arrays, filled, pending)
+            filled += len(pending)
+            pending = []
+    arrays = _ensure_capacity(arrays, filled + len(pending))
+    _fill(arrays, filled, pending)
+    filled += len(pending)
+    # ✅ Documents deleted between the count and the scan leave the arrays shorter
+    return {name: values[:filled] for name, values in arrays.items()}
+
+
+def _ensure_capacity(arrays, size):
+    """
+    Grow the arrays if documents were inserted after the count was taken.
+    """
+    current = len(next(iter(arrays.values())))
+    if size <= current:
+        return arrays
+    size = max(size, int(current * 1.5))
+    return {name: np.concatenate([values, np.empty(size - current, dtype=values.dtype)])
+            for name, values in arrays.items()}
+
+
+def make_dataset(collection, fields, features, label=None, filter=None, date_field=None, start=None, end=None,
+                 rows=BATCH_ROWS, transform=None):
+    """
+    tf.data.Dataset of (features, label) batches streamed from the cursor; the query is re-run on every
+    epoch. `features` is a list of field names (or a single name); `label` is a field name, or None for
+    an all-ones label. `transform(batch) -> batch` can map raw fields (e.g. ids to embedding rows) first.
+    """
+    import tensorflow as tf
+
+    single = isinstance(features, str)
+    names = [features] if single else list(features)
+    dtypes = {name: np.dtype(fields[name]) for name in names}
+
+    def generator():
+        for batch in iter_batches(collection, fields, filter, date_field, start, end, rows):
+            batch = transform(dict(batch)) if transform else batch
+            x = tuple(np.array(batch[name], dtype=dtypes[name]) for name in names)
+            y = (np.ones(len(x[0]), dtype=np.float32) if label is None
+                 else np.asarray(batch[label], dtype=np.float32))
+            yield (x[0] if single else x), y
+
+    x_spec = tuple(tf.TensorSpec(shape=(None,), dtype=tf.as_dtype(dtypes[name])) for name in names)
+    signature = (x_spec[0] if single else x_spec, tf.TensorSpec(shape=(None,), dtype=tf.float32))
+    return tf.data.Dataset.from_generator(generator, output_signature=signature).prefetch(tf.data.AUTOTUNE)
@@ -1,49 +1,170 @@
-import pandas as pd
+"""
+Clean the datasets and load them into MongoDB.
+
+    python scripts/preprocess.py                          # every collection
+    python scripts/preprocess.py --tables products users  # only these
+    python scripts/preprocess.py --batch-size 5000 --workers 8
+
+Tables are read from the memory-mapped columnar cache and streamed in bounded batches of native
+Python documents (no JSON round trip). Each batch is an unordered bulk_write of upserts keyed on the
+table's natural key, spread over a thread pool. Every collection is loaded into a staging collection
+and renamed over the live one when complete, so readers never see it empty or half-loaded.
+"""
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
 import numpy as np
-import json
-from pymongo import MongoClient
-
-# ✅ MongoDB Connection
-client = MongoClient("mongodb://localhost:27017/")  # Change this if using MongoDB Atlas
-db = client["InventoryDB"]  # Database name
-
-# ✅ Load CSV Data
-users = pd.read_csv("./data/users.csv")
-suppliers = pd.read_csv("./data/suppliers.csv")
-warehouses = pd.read_csv("./data/warehouses.csv")
-products = pd.read_csv("./data/products.csv")
-transactions = pd.read_csv("./data/transactions.csv")
-
-# ✅ Handle Missing Values
-users.fillna("Unknown", inplace=True)
-suppliers.fillna({"reliability_score": suppliers["reliability_score"].mean()}, inplace=True)
-warehouses.fillna({"capacity": warehouses["capacity"].median()}, inplace=True)
-products.fillna({"stock_level": 0}, inplace=True)
-transactions.fillna({"total_price": transactions["total_price"].median()}, inplace=True)
-
-# ✅ Convert Data Types
-transactions["transaction_date"] = pd.to_datetime(transactions["transaction_date"])
-
-# ✅ Normalize Price Fields
-products["cost_per_unit"] = (products["cost_per_unit"] - products["cost_per_unit"].min()) / (products["cost_per_unit"].max() - products["cost_per_unit"].min())
-products["price_per_unit"] = (products["price_per_unit"] - products["price_per_unit"].min()) / (products["price_per_unit"].max() - products["price_per_unit"].min())
-
-# ✅ Convert to JSON Format for MongoDB
-def df_to_json(df):
-    return json.loads(df.to_json(orient="records"))
-
-# ✅ Upload to MongoDB
-collections = {
-    "users": users,
-    "suppliers": suppliers,
-    "warehouses": warehouses,
-    "products": products,
-    "transactions": transactions
+import pandas as pd
+from pymongo import ASCENDING, MongoClient, UpdateOne
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+sys.path.append(str(Path(__file__).resolve().parent.parent / "inventory_forecasting"))
+
+from config import MONGO_URI, DB_NAME
+from data_loader import TABLES, load_arrays, table_meta
+
+# ✅ Documents per bulk_write and concurrent writers
+BATCH_SIZE = 10_000
+WORKERS = 4
+
+# ✅ Upserts match on these keys (unique index on the staging collection)
+NATURAL_KEYS = {
+    "users": "user_id",
+    "suppliers": "supplier_id",
+    "warehouses": "warehouse_id",
+    "products": "product_id",
+    "transactions": "transaction_id",
+}
+
+# ✅ Lookup indexes, built once after the bulk load
+SECONDARY_INDEXES = {
+    "warehouses": ["supplier_id"],
+    "products": ["category", "supplier_id", "warehouse_id"],
+    "transactions": ["user_id", "product_id", "transaction_date"],
 }
 
-for collection_name, df in collections.items():
-    db[collection_name].delete_many({})  # Clear existing data
-    db[collection_name].insert_many(df_to_json(df))
-    print(f"✅ Uploaded {collection_name} to MongoDB!")
 
-print("🎉 Data preprocessing and upload completed successfully!")
+def table_stats(table, arrays):
+    """
+    Whole-table statistics the per-batch cleaning needs (computed on the memory-mapped columns).
+    """
+    if table == "suppliers":
+        return {"reliability_score": float(np.nanmean(arrays["reliability_score"]))}
+    if table == "warehouses":
+        return {"capacity": float(np.nanmedian(arrays["capacity"]))}
+    if table == "transactions":
+        return {"total_price": float(np.nanmedian(arrays["total_price"]))}
+    if table == "products":
+        return {column: (float(np.nanmin(arrays[column])), float(np.nanmax(arrays[column])))
+                for column in ("cost_per_unit", "price_per_unit")}
+    return {}
+
+
+def clean_batch(table, df, stats):
+    """
+    Missing-value handling and price normalisation, applied to one batch.
+    """
+    # ✅ Handle Missing Values
+    if table == "users":
+        df = df.fillna("Unknown")
+    elif table in ("suppliers", "warehouses", "transactions"):
+        df = df.fillna(stats)
+    elif table == "products":
+        df = df.fillna({"stock_level": 0})
+
+        # ✅ Normalize Price Fields (min/max over the whole table)
+        for column, (low, high) in stats.items():
+            df[column] = (df[column] - low) / (high - low)
+    return df
+
+
+def to_documents(df):
+    """
+    Native-typed dicts for a batch: each column is converted once with tolist(), not per cell.
+    """
+    columns = []
+    for name in df.columns:
+        values = df[name]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            # ✅ BSON dates have millisecond precision; tolist() yields datetime objects
+            columns.append(values.to_numpy().astype("datetime64[ms]").tolist())
+        elif isinstance(values.dtype, pd.CategoricalDtype):
+            columns.append(values.astype(object).tolist())
+        else:
+            columns.append(values.to_numpy().tolist())
+    names = list(df.columns)
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def iter_batches(table, batch_size=BATCH_SIZE):
+    """
+    Yield cleaned documents for `table` in batches of at most `batch_size`.
+    """
+    arrays = load_arrays(table)
+    stats = table_stats(table, arrays)
+    rows = table_meta(table)["rows"]
+    for start in range(0, rows, batch_size):
+        stop = min(start + batch_size, rows)
+        df = pd.DataFrame({column: values[start:stop] for column, values in arrays.items()})
+        yield to_documents(clean_batch(table, df, stats))
+
+
+def _write_batch(collection, key, documents):
+    operations = [UpdateOne({key: doc[key]}, {"$set": doc}, upsert=True) for doc in documents]
+    result = collection.bulk_write(operations, ordered=False)
+    return result.upserted_count + result.modified_count
+
+
+def load_collection(db, table, batch_size=BATCH_SIZE, workers=WORKERS):
+    """
+    Stream `table` into db[table] through a staging collection and swap it in atomically.
+    At most 2 * workers batches are in memory at once.
+    """
+    key = NATURAL_KEYS[table]
+    staging = db[f"{table}__staging"]
+    staging.drop()
+    # ✅ The natural-key index has to exist during the load, or every upsert scans the collection
+    staging.create_index([(key, ASCENDING)], unique=True)
+
+    written = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for documents in iter_batches(table, batch_size):
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                written += sum(future.result() for future in done)
+            pending.add(pool.submit(_write_batch, staging, key, documents))
+        written += sum(future.result() for future in pending)
+
+    # ✅ Lookup indexes are cheaper to build once over the loaded data than to maintain per insert
+    for column in SECONDARY_INDEXES.get(table, []):
+        staging.create_index([(column, ASCENDING)])
+    staging.rename(table, dropTarget=True)
+    return written
+
+
+def load_all(db, tables=None, batch_size=BATCH_SIZE, workers=WORKERS):
+    for table in tables or TABLES:
+        written = load_collection(db, table, batch_size, workers)
+        print(f"✅ Uploaded {table} to MongoDB! ({written:,} documents)")
+
+
+def main(argv=None, client=None):
+    parser = argparse.ArgumentParser(description="Clean the datasets and load them into MongoDB")
+    parser.add_argument("--tables", nargs="+", choices=TABLES, default=TABLES)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--uri", default=MONGO_URI)
+    parser.add_argument("--db", default=DB_NAME)
+    args = parser.parse_args(argv)
+
+    # ✅ MongoDB Connection (a client can be passed in, e.g. mongomock in tests)
+    client = client or MongoClient(args.uri)
+    load_all(client[args.db], args.tables, args.batch_size, args.workers)
+    print("🎉 Data preprocessing and upload completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,116 @@
-import pandas as pd
+"""
+Implicit-feedback recommendation model: every purchase is a positive (user, product) pair and each
+positive is paired with sampled non-purchased products as negatives. The user and product embeddings
+are scored by their dot product (+ a product bias), so after training the product embeddings are
+exported into an IVF index (inventory_forecasting/ann_index.py) that serves /recommend/{user_id}.
+
+    python scripts/train_analytics_model.py
+"""
+import sys
+from pathlib import Path
+
 import numpy as np
-import tensorflow as tf
 from tensorflow import keras
-from tensorflow.keras.layers import Embedding, Flatten, Dense, Input, Concatenate
-from sklearn.model_selection import train_test_split
-from pymongo import MongoClient
+from tensorflow.keras.layers import Embedding, Flatten, Input, Dot, Add
+from pymongo import MongoClient, ASCENDING, DESCENDING
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+sys.path.append(str(Path(__file__).resolve().parent.parent / "inventory_forecasting"))
+
+from config import MONGO_URI, DB_NAME
+from mongo_reader import read_arrays, iter_batches, make_dataset
+from recommender import export_recommender
+
+# ✅ Positives per batch (each batch holds POSITIVES_PER_BATCH * (1 + NEGATIVES_PER_POSITIVE) examples)
+POSITIVES_PER_BATCH = 8192
+NEGATIVES_PER_POSITIVE = 4
+# ✅ Negatives are drawn from product popularity ** this (0 = uniform, 1 = as often as they sell)
+NEGATIVE_SAMPLING_POWER = 0.75
+EMBEDDING_SIZE = 50
+EPOCHS = 5
 
 # ✅ Connect to MongoDB
-client = MongoClient("mongodb://localhost:27017/")
-db = client["InventoryDB"]
+client = MongoClient(MONGO_URI)
+db = client[DB_NAME]
 
-# ✅ Load Transactions Data from MongoDB
-transactions = pd.DataFrame(list(db.transactions.find({}, {"_id": 0})))
-products = pd.DataFrame(list(db.products.find({}, {"_id": 0})))
+# ✅ Id vocabularies (small collections, only the id field is fetched)
+users = read_arrays(db.users, {"user_id": np.int64})
+products = read_arrays(db.products, {"product_id": np.int64})
 
-# ✅ Merge with Product Data
-transactions = transactions.merge(products[["product_id", "category"]], on="product_id", how="left")
+# ✅ Encode Users & Products: id -> dense embedding row, as arrays indexed by id
+user_index = np.full(int(users["user_id"].max()) + 1, 0, dtype=np.int32)
+user_index[users["user_id"]] = np.arange(len(users["user_id"]), dtype=np.int32)
+product_index = np.full(int(products["product_id"].max()) + 1, 0, dtype=np.int32)
+product_index[products["product_id"]] = np.arange(len(products["product_id"]), dtype=np.int32)
+n_users, n_products = len(users["user_id"]), len(products["product_id"])
 
-# ✅ Encode Users & Products
-transactions["user_id"] = transactions["user_id"].astype("category").cat.codes
-transactions["product_id"] = transactions["product_id"].astype("category").cat.codes
+# ✅ Product popularity in one streamed pass, for the negative sampling distribution
+popularity = np.zeros(n_products, dtype=np.float64)
+for batch in iter_batches(db.transactions, {"product_id": np.int64}):
+    popularity += np.bincount(product_index[np.clip(batch["product_id"], 0, len(product_index) - 1)],
+                              minlength=n_products)
+negative_cdf = np.cumsum((popularity + 1) ** NEGATIVE_SAMPLING_POWER)
+negative_cdf /= negative_cdf[-1]
+rng = np.random.default_rng(42)
 
-# ✅ Split Data
-train, test = train_test_split(transactions, test_size=0.2, random_state=42)
 
-# ✅ Model Architecture
-embedding_size = 50  # Size of embeddings
+def with_negatives(batch):
+    """
+    Positives of one batch followed by NEGATIVES_PER_POSITIVE sampled products for each of their users.
+    """
+    users_pos = user_index[np.clip(batch["user_id"], 0, len(user_index) - 1)]
+    products_pos = product_index[np.clip(batch["product_id"], 0, len(product_index) - 1)]
+    n_negatives = len(users_pos) * NEGATIVES_PER_POSITIVE
+    products_neg = np.minimum(np.searchsorted(negative_cdf, rng.random(n_negatives)), n_products - 1)
+    return {
+        "user_id": np.concatenate([users_pos, np.repeat(users_pos, NEGATIVES_PER_POSITIVE)]),
+        "product_id": np.concatenate([products_pos, products_neg]),
+        "label": np.concatenate([np.ones(len(users_pos)), np.zeros(n_negatives)]),
+    }
 
+
+# ✅ Split Data by time: the last 20% of the date range is held out (the server applies the range)
+first = db.transactions.find_one({}, {"transaction_date": 1}, sort=[("transaction_date", ASCENDING)])
+last = db.transactions.find_one({}, {"transaction_date": 1}, sort=[("transaction_date", DESCENDING)])
+cutoff = first["transaction_date"] + (last["transaction_date"] - first["transaction_date"]) * 0.8
+
+# ✅ Stream (user, product) batches from the cursor; negatives are added per batch
+fields = {"user_id": np.int64, "product_id": np.int64}
+train = make_dataset(db.transactions, fields, ["user_id", "product_id"], label="label", date_field="transaction_date",
+                     end=cutoff, rows=POSITIVES_PER_BATCH, transform=with_negatives)
+test = make_dataset(db.transactions, fields, ["user_id", "product_id"], label="label", date_field="transaction_date",
+                    start=cutoff, rows=POSITIVES_PER_BATCH, transform=with_negatives)
+
+# ✅ Inputs and labels are (batch, 1)
+train = train.map(lambda x, y: ((x[0][:, None], x[1][:, None]), y[:, None]))
+test = test.map(lambda x, y: ((x[0][:, None], x[1][:, None]), y[:, None]))
+
+# ✅ Model Architecture: score = user . product + product bias
 user_input = Input(shape=(1,))
 product_input = Input(shape=(1,))
 
-user_embedding = Embedding(input_dim=transactions["user_id"].nunique(), output_dim=embedding_size)(user_input)
-product_embedding = Embedding(input_dim=transactions["product_id"].nunique(), output_dim=embedding_size)(product_input)
-
-user_vec = Flatten()(user_embedding)
-product_vec = Flatten()(product_embedding)
+user_embedding = Embedding(input_dim=n_users, output_dim=EMBEDDING_SIZE, name="user_embedding")
+product_embedding = Embedding(input_dim=n_products, output_dim=EMBEDDING_SIZE, name="product_embedding")
+product_bias = Embedding(input_dim=n_products, output_dim=1, name="product_bias")
 
-concat = Concatenate()([user_vec, product_vec])
-dense1 = Dense(128, activation="relu")(concat)
-dense2 = Dense(64, activation="relu")(dense1)
-output = Dense(1, activation="sigmoid")(dense2)
+user_vec = Flatten()(user_embedding(user_input))
+product_vec = Flatten()(product_embedding(product_input))
+score = Add()([Dot(axes=1)([user_vec, product_vec]), Flatten()(product_bias(product_input))])
 
-model = keras.Model([user_input, product_input], output)
+model = keras.Model([user_input, product_input], score)
 
 # ✅ Compile Model
-model.compile(optimizer="adam", loss="binary_crossentropy", metrics=["accuracy"])
+model.compile(optimizer=keras.optimizers.Adam(learning_rate=0.005),
+              loss=keras.losses.BinaryCrossentropy(from_logits=True),
+              metrics=[keras.metrics.AUC(from_logits=True, name="auc")])
 
 # ✅ Train Model
-model.fit([train["user_id"], train["product_id"]], np.ones(len(train)), epochs=5, batch_size=32, validation_split=0.1)
+history = model.fit(train, epochs=EPOCHS, validation_data=test)
 
-# ✅ Save Model
-model.save("recommendation_model.h5")
-print("🎉 Model trained and saved successfully!")
+# ✅ Export the embeddings into the serving index (registered as the "recommender" model)
+version = export_recommender(
+    users["user_id"], user_embedding.get_weights()[0],
+    products["product_id"], product_embedding.get_weights()[0], product_bias.get_weights()[0][:, 0],
+    metrics={"val_auc": float(history.history["val_auc"][-1])},
+)
+print(f"🎉 Model trained and saved successfully! (recommender v{version:04d})")
@@ -0,0 +1,54 @@
+"""
+Shared test setup. The pipeline modules read INVENTORY_* at import time, so every session gets its
+own data, cache and model directories before anything is imported; the modules are importable the
+way api/app.py imports them.
+
+    cd backend-ai && python -m pytest -q tests
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+WORK_DIR = Path(tempfile.mkdtemp(prefix="inventory-tests-"))
+
+os.environ["INVENTORY_DATA_DIR"] = str(WORK_DIR / "data")
+os.environ["INVENTORY_MODELS_DIR"] = str(WORK_DIR / "models")
+os.environ["INVENTORY_TUNING_CACHE"] = str(WORK_DIR / "tuning")
+os.environ["FEATURE_STORE_SNAPSHOT_EVERY"] = "0"
+sys.path[:0] = [str(ROOT / "inventory_forecasting"), str(ROOT / "api")]
+
+
+# ✅ Size of the synthetic dataset shared by the tests that need data (scripts/data.py)
+DATASET = {"users": 300, "products": 120, "suppliers": 12, "warehouses": 6, "transactions": 6000, "days": 90}
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def dataset():
+    """
+    Columnar cache of a small synthetic dataset in INVENTORY_DATA_DIR, generated once per session.
+    """
+    args = [f"--{option}={value}" for option, value in DATASET.items()]
+    subprocess.run([sys.executable, str(ROOT / "scripts" / "data.py"), *args, "--workers=1", "--fraud-rate=0.02"],
+                   check=True, capture_output=True)
+    return Path(os.environ["INVENTORY_DATA_DIR"])
+
+
+@pytest.fixture
+def models_dir(tmp_path, monkeypatch):
+    """
+    Empty model registry for one test.
+    """
+    import model_registry
+
+    monkeypatch.setattr(model_registry, "MODELS_DIR", tmp_path / "models")
+    return model_registry.MODELS_DIR
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from catalog import Catalog
+
+
+def make_catalog():
+    products = {
+        "product_id": np.array([1, 2]), "product_name": np.array(["desk", "lamp"], dtype=object),
+        "category": pd.Categorical(["Furniture", None], categories=["Electronics", "Furniture"]),
+        "cost_per_unit": np.array([5.0, 2.0]), "price_per_unit": np.array([9.0, 4.0]),
+        "stock_level": np.array([3, 4]), "supplier_id": np.array([1, 1]), "warehouse_id": np.array([1, 1]),
+    }
+    return Catalog(products, {"supplier_id": np.array([1]), "reliability_score": np.array([0.9])},
+                   {"warehouse_id": np.array([1]), "capacity": np.array([100.0])})
+
+
+def test_describe_reports_the_category():
+    catalog = make_catalog()
+    assert catalog.describe(catalog.product_row(1))["category"] == "Furniture"
+
+
+def test_product_without_category_is_not_labelled_with_the_last_one():
+    catalog = make_catalog()
+    row = catalog.product_row(2)
+    assert catalog.category_codes[row] == -1
+    assert catalog.category(row) is None
+    assert catalog.describe(row)["category"] is None
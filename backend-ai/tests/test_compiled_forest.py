@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+from compiled_forest import COMPILED_MAX_ROWS, CompiledForest, load_predictor, load_proba
+from model_registry import LazyModel, save_artifacts
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 6))
+    y = X[:, 0] * 2 + np.sin(X[:, 1]) + rng.normal(scale=0.1, size=len(X))
+    return X, y
+
+
+@pytest.fixture(scope="module")
+def regressor(data):
+    X, y = data
+    return RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0).fit(X, y)
+
+
+@pytest.fixture(scope="module")
+def classifier(data):
+    X, y = data
+    return RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0).fit(X, (y > 0).astype(int))
+
+
+def test_compiled_regressor_matches_sklearn(data, regressor):
+    X, _ = data
+    forest = CompiledForest.from_sklearn(regressor)
+    np.testing.assert_allclose(forest.predict(X), regressor.predict(X), rtol=1e-6, atol=1e-6)
+
+
+def test_compiled_classifier_matches_sklearn(data, classifier):
+    X, _ = data
+    forest = CompiledForest.from_sklearn(classifier)
+    np.testing.assert_allclose(forest.predict_proba(X), classifier.predict_proba(X), atol=1e-6)
+    np.testing.assert_array_equal(forest.predict(X), classifier.predict(X))
+
+
+@pytest.mark.parametrize("rows", [1, COMPILED_MAX_ROWS + 1])
+def test_node_tables_only_version_serves_every_batch_size(models_dir, data, regressor, classifier, rows):
+    # 🔹 Compressed versions are saved without the sklearn pickle
+    X, _ = data
+    for name, model in [("pricing", regressor), ("anomaly", classifier)]:
+        forest = CompiledForest.from_sklearn(model)
+        save_artifacts(name, {"scaler": None, **forest.to_arrays()}, params=forest.params())
+        assert "model" not in LazyModel(name).manifest["artifacts"]
+
+    predict = load_predictor(LazyModel("pricing"))
+    np.testing.assert_allclose(predict(X[:rows]), regressor.predict(X[:rows]), rtol=1e-6, atol=1e-6)
+
+    predict_proba, classes = load_proba(LazyModel("anomaly"))
+    np.testing.assert_array_equal(classes, classifier.classes_)
+    np.testing.assert_allclose(predict_proba(X[:rows]), classifier.predict_proba(X[:rows]), atol=1e-6)
+
+
+def test_full_version_uses_sklearn_for_large_batches(models_dir, data, regressor):
+    X, _ = data
+    forest = CompiledForest.from_sklearn(regressor)
+    save_artifacts("pricing", {"model": regressor, **forest.to_arrays()}, params=forest.params())
+    predict = load_predictor(LazyModel("pricing"))
+    np.testing.assert_allclose(predict(X), regressor.predict(X), rtol=1e-6, atol=1e-6)
@@ -0,0 +1,71 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_loader
+from data_loader import load_arrays, write_table
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_loader, "CACHE_DIR", tmp_path / ".columnar")
+    monkeypatch.setattr(data_loader, "DATA_DIR", tmp_path)
+    return data_loader.CACHE_DIR
+
+
+def frame(version, rows=1000):
+    return pd.DataFrame({"value": np.full(rows, version, dtype=np.int64), "other": np.arange(rows, dtype=np.float64)})
+
+
+def test_readers_always_see_a_complete_table(cache_dir):
+    write_table("numbers", frame(0))
+    errors, seen, done = [], set(), threading.Event()
+
+    def read():
+        while not done.is_set():
+            try:
+                values = np.asarray(load_arrays("numbers")["value"])
+                assert len(values) == 1000 and (values == values[0]).all()
+                seen.add(int(values[0]))
+            except Exception as e:  # noqa: BLE001 - any failure is what the test looks for
+                errors.append(e)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for version in range(1, 60):
+            write_table("numbers", frame(version))
+    finally:
+        done.set()
+        reader.join()
+    assert not errors
+    assert np.asarray(load_arrays("numbers")["value"])[0] == 59
+    assert len(seen) > 1
+
+
+def test_superseded_versions_are_removed(cache_dir, monkeypatch):
+    monkeypatch.setattr(data_loader, "VERSION_GRACE_S", 0)
+    for version in range(5):
+        write_table("numbers", frame(version))
+    versions = list(cache_dir.glob(".numbers.v*"))
+    assert (cache_dir / "numbers").resolve() in [version.resolve() for version in versions]
+    assert len(versions) <= 2
+
+
+def test_table_written_before_versioning_is_replaced(cache_dir):
+    legacy = cache_dir / "numbers"
+    staged = data_loader.staging_dir("numbers")
+    np.save(staged / "value.npy", np.zeros(3, dtype=np.int64))
+    data_loader.publish_table("numbers", staged, {"version": data_loader.CACHE_VERSION, "table": "numbers",
+                                                  "rows": 3, "source": None,
+                                                  "columns": {"value": {"kind": "numeric", "dtype": "int64"}}})
+    # 🔹 Recreate the old layout: a plain directory in place of the link
+    target = legacy.resolve()
+    legacy.unlink()
+    target.rename(legacy)
+
+    write_table("numbers", frame(7))
+    assert legacy.is_symlink()
+    assert np.asarray(load_arrays("numbers")["value"])[0] == 7
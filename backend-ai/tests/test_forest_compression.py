@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import RobustScaler
+
+import forest_compression
+import predict
+from forest_compression import compress_pricing
+from model_registry import latest_version, save_artifacts
+from train_pricing import PRICING_FEATURES, split_pricing
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.uniform(1, 10, size=(3000, len(PRICING_FEATURES))), columns=PRICING_FEATURES)
+    y = np.log1p(X["quantity"] * X["price_per_unit"]).to_numpy()
+    scaler = RobustScaler().fit(X)
+    X_train, _, y_train, _ = split_pricing(scaler.transform(X), y)
+    model = RandomForestRegressor(n_estimators=40, random_state=0).fit(X_train, y_train)
+    return model, scaler, X, y
+
+
+@pytest.fixture
+def serving(models_dir, monkeypatch):
+    """
+    predict's "pricing" handle and predictor cache, reset for the test's registry.
+    """
+    monkeypatch.setattr(predict, "_predictors", {})
+    monkeypatch.setattr(predict, "pricing", predict.LazyModel("pricing"))
+    return predict
+
+
+def test_compressed_version_is_served(serving, fitted):
+    model, scaler, X, y = fitted
+    version = compress_pricing(model, scaler, X, y, tolerance=1.0)
+    assert version == latest_version("pricing")
+    manifest = serving.pricing.manifest
+    assert manifest["params"]["variant"] != "forest"
+
+    predict_price = serving.get_predictor(serving.pricing)
+    X_scaled = scaler.transform(X)
+    for rows in (1, len(X)):
+        prices = predict_price(X_scaled[:rows])
+        assert prices.shape == (rows,)
+        assert np.isfinite(prices).all()
+    mae = np.abs(predict_price(X_scaled) - y).mean()
+    assert mae <= np.abs(model.predict(X_scaled) - y).mean() * 2 + 0.05
+
+
+def test_uncompressed_forest_is_not_registered(serving, fitted, monkeypatch):
+    model, scaler, X, y = fitted
+    save_artifacts("pricing", {"model": model, "scaler": scaler}, feature_names=PRICING_FEATURES)
+    build_variants = forest_compression.build_variants
+    monkeypatch.setattr(forest_compression, "build_variants", lambda *args, **kwargs: build_variants(*args, **kwargs)[:1])
+
+    assert compress_pricing(model, scaler, X, y) is None
+    assert latest_version("pricing") == 1
+    np.testing.assert_allclose(serving.get_predictor(serving.pricing)(scaler.transform(X)),
+                               model.predict(scaler.transform(X)))
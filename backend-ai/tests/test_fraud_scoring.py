@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from chunked_pipeline import ANOMALY_FEATURES, anomaly_encoders, build_anomaly_matrix
+from data_loader import load_arrays
+from fraud_scoring import lookup, read_scores, score_transactions
+from model_registry import LazyModel
+from train import save_forest
+
+
+@pytest.fixture(scope="module")
+def anomaly_model(dataset):
+    """
+    Small anomaly forest registered the way train.py registers it, with its training matrix.
+    """
+    X, y = build_anomaly_matrix()
+    X = pd.DataFrame(X, columns=ANOMALY_FEATURES)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=10, max_depth=8, random_state=0).fit(scaler.transform(X), y)
+    save_forest("anomaly", model, scaler, ANOMALY_FEATURES, None,
+                params={"encoders": anomaly_encoders().to_params(), "user_aggregates": "all_transactions"})
+    return model, scaler, X
+
+
+@pytest.fixture(scope="module")
+def scores(anomaly_model):
+    assert score_transactions(full=True, chunk_size=2500, workers=2) == len(anomaly_model[2])
+    return read_scores()
+
+
+def test_batch_scores_match_the_model(anomaly_model, scores):
+    model, scaler, X = anomaly_model
+    transaction_ids = np.asarray(load_arrays("transactions", ["transaction_id"])["transaction_id"])
+    prediction, probability, found = lookup(scores, transaction_ids)
+    assert found.all()
+    assert scores["meta"]["model_version"] == LazyModel("anomaly").version
+
+    proba = model.predict_proba(scaler.transform(X))[:, 1]
+    np.testing.assert_allclose(probability, proba, atol=1e-6)
+    np.testing.assert_array_equal(prediction, model.predict(scaler.transform(X)))
+
+
+def test_rescoring_only_scores_new_transactions(scores):
+    assert score_transactions(chunk_size=2500, workers=1) == 0
+
+
+def test_score_lookup_endpoint(scores):
+    import app
+
+    transaction_id = str(scores["transaction_id"][0])
+
+    async def get(path):
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path)
+
+    response = asyncio.run(get(f"/fraud/scores/{transaction_id}"))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["transaction_id"] == transaction_id
+    assert body["fraud_prediction"] == int(scores["fraud_prediction"][0])
+    assert body["fraud_probability"] == pytest.approx(float(scores["fraud_probability"][0]))
+
+    assert asyncio.run(get("/fraud/scores/not-a-transaction")).status_code == 404
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from feature_store import FeatureStore, load_or_build_feature_store
+from profit_cube import QUANTITY, REVENUE, ProfitCube, load_or_build_profit_cube
+from transaction_log import RECORD, OnlineAggregates, TransactionLog
+
+
+@pytest.fixture
+def worker(dataset, tmp_path):
+    """
+    Factory of API workers: each restores its own stores from the snapshots in tmp_path (built on
+    first use) and shares the journal in tmp_path.
+    """
+    def start():
+        stores = load_or_build_feature_store(tmp_path / "feature_store"), load_or_build_profit_cube(tmp_path / "profit_cube")
+        return OnlineAggregates(*stores, log=TransactionLog(tmp_path / "transaction_log.bin"))
+    return start
+
+
+def product_totals(cube, product_id):
+    product_ids, totals = cube.by_product()
+    return totals[np.searchsorted(product_ids, product_id)]
+
+
+def test_workers_converge_on_each_others_writes(worker):
+    first, second = worker(), worker()
+    user_id, product_id = 5, int(first.profit_cube.by_product()[0][0])
+    before = first.feature_store.user_features(user_id)["user_total_transactions"]
+    revenue = product_totals(first.profit_cube, product_id)[REVENUE]
+
+    first.record(user_id, product_id, 2, 10.0, datetime.now())
+    second.record(user_id, product_id, 3, 5.0, datetime.now())
+    assert first.sync() == 1
+    assert second.sync() == 0
+
+    for online in (first, second):
+        features = online.feature_store.user_features(user_id)
+        assert features["user_total_transactions"] == before + 2
+        assert product_totals(online.profit_cube, product_id)[REVENUE] == pytest.approx(revenue + 15.0)
+        assert online.feature_store.log_offset == online.profit_cube.log_offset == 2 * RECORD.itemsize
+
+
+def test_restart_replays_only_what_the_snapshot_lacks(worker, tmp_path):
+    first = worker()
+    user_id, product_id = 7, int(first.profit_cube.by_product()[0][0])
+    base = first.feature_store.user_features(user_id)["user_total_transactions"]
+    first.record(user_id, product_id, 1, 4.0, datetime.now())
+
+    # 🔹 A worker forked from the parent's stores (loaded before the write) replays it
+    forked = worker()
+    assert forked.sync() == 1
+
+    FeatureStore.snapshot(first.feature_store, tmp_path / "feature_store")
+    ProfitCube.snapshot(first.profit_cube, tmp_path / "profit_cube")
+    first.record(user_id, product_id, 1, 4.0, datetime.now())
+
+    restarted = worker()
+    assert restarted.feature_store.log_offset == RECORD.itemsize
+    assert restarted.sync() == 1
+    assert restarted.feature_store.user_features(user_id)["user_total_transactions"] == base + 2
+    assert product_totals(restarted.profit_cube, product_id)[QUANTITY] == product_totals(first.profit_cube, product_id)[QUANTITY]
+
+
+def test_entries_before_the_cube_do_not_stall_sync(worker):
+    online = worker()
+    product_id = int(online.profit_cube.by_product()[0][0])
+    online.record(1, product_id, 1, 1.0, online.profit_cube.start_date - np.timedelta64(30, "D"))
+    online.record(1, product_id, 1, 1.0, datetime.now())
+    assert online.feature_store.user_features(1)["user_total_transactions"] >= 2
+    assert online.profit_cube.log_offset == 2 * RECORD.itemsize